@@ -0,0 +1,85 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Decodes the Amount column of the PTR tables into a small integer code plus
+# min / max dollar values, in one vectorized pass over a Series of raw strings.
+#
+# PTRs report amounts as one of a fixed set of ranges ("$1,001 - $15,000"), but
+# the text pdfplumber gives back comes in many shapes: split over two lines,
+# with escaped dollars, the upper bound glued to digits of the next cells, only
+# the lower bound left ("15001.0"), "Spouse/DC Over $1,000,000" cut short, or an
+# exact dollar amount. The lower bound is enough to identify the range, so only
+# that is read.
+
+# code: (min_amount, max_amount, label)
+AMOUNT_UNKNOWN = 0
+AMOUNT_EXACT = 12
+AMOUNT_CODES = {
+    AMOUNT_UNKNOWN: (np.nan, np.nan, ''),
+    1: (1001, 15000, '$1,001 - $15,000'),
+    2: (15001, 50000, '$15,001 - $50,000'),
+    3: (50001, 100000, '$50,001 - $100,000'),
+    4: (100001, 250000, '$100,001 - $250,000'),
+    5: (250001, 500000, '$250,001 - $500,000'),
+    6: (500001, 1000000, '$500,001 - $1,000,000'),
+    7: (1000001, 5000000, '$1,000,001 - $5,000,000'),
+    8: (5000001, 25000000, '$5,000,001 - $25,000,000'),
+    9: (25000001, 50000000, '$25,000,001 - $50,000,000'),
+    10: (50000001, np.nan, 'Over $50,000,000'),
+    11: (1000001, np.nan, 'Spouse/DC Over $1,000,000'),
+    AMOUNT_EXACT: (np.nan, np.nan, ''),
+}
+
+# Optional "Spouse/DC Over" wording, then the first dollar figure of the cell
+AMOUNT_PATTERN = re.compile(r'^\W*(?:spouse\W*dc\s*)?(?P<over>over)?\W*(?P<low>\d[\d,]*(?:\.\d+)?)?', re.IGNORECASE)
+
+_RANGE_CODES = {AMOUNT_CODES[code][0]: code for code in range(1, 10)}
+# "Over $X" figure -> code, a truncated "Spouse/DC Over" with no figure being the $1,000,000 one
+_OVER_CODES = {50000000: 10, 1000000: 11}
+
+_MIN_AMOUNTS = np.array([AMOUNT_CODES[code][0] for code in range(len(AMOUNT_CODES))], dtype=float)
+_MAX_AMOUNTS = np.array([AMOUNT_CODES[code][1] for code in range(len(AMOUNT_CODES))], dtype=float)
+_LABELS = np.array([AMOUNT_CODES[code][2] for code in range(len(AMOUNT_CODES))], dtype=object)
+
+
+def decode_amounts(raw_amounts):
+    """Decode a Series of raw amount strings.
+
+    Returns a frame on the same index with amount_code (int8), min_amount,
+    max_amount and invested_amount, the canonical range label (or the exact
+    amount). Amounts that cannot be read get AMOUNT_UNKNOWN and keep their raw
+    text, so they can be counted and looked at instead of silently becoming NaN.
+    """
+    raw_amounts = raw_amounts.astype('string').fillna('')
+    parts = raw_amounts.str.extract(AMOUNT_PATTERN)
+    low = pd.to_numeric(parts['low'].str.replace(',', '', regex=False), errors='coerce')
+    over = parts['over'].notna()
+
+    codes = low.map(_RANGE_CODES)
+    codes = codes.mask(over, low.fillna(1000000).map(_OVER_CODES))
+    codes = codes.mask(codes.isna() & ~over & low.notna(), AMOUNT_EXACT)
+    codes = codes.fillna(AMOUNT_UNKNOWN).astype('int8').to_numpy()
+
+    exact = codes == AMOUNT_EXACT
+    min_amounts = np.where(exact, low, _MIN_AMOUNTS[codes])
+    max_amounts = np.where(exact, low, _MAX_AMOUNTS[codes])
+    labels = _LABELS[codes]
+    labels = np.where(exact, low.map('${:,.2f}'.format), labels)
+    labels = np.where(codes == AMOUNT_UNKNOWN, raw_amounts.str.split('\n').str[0].str.strip(), labels)
+
+    return pd.DataFrame({
+        'invested_amount': labels,
+        'amount_code': codes,
+        'min_amount': min_amounts,
+        'max_amount': max_amounts,
+    }, index=raw_amounts.index)
+
+
+def amount_midpoint(amounts):
+    """Mid-point dollar amount of decoded amounts (any frame with min_amount / max_amount,
+    e.g. decode_amounts output or a trades frame). The open-ended "Over $X" ranges (codes
+    10 and 11) have no max_amount and count at their lower bound; unknown amounts stay NaN."""
+    return (amounts['min_amount'] + amounts['max_amount'].fillna(amounts['min_amount'])) / 2
@@ -0,0 +1,225 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# Backtest of the congressional trading strategy, moved out of us_congress_strat.ipynb.
+#
+# Every week's target weights (weights_pivot, week x ticker) are applied on the
+# first trading day on or after the start of the week: the whole portfolio is
+# sold, then each ticker with a positive weight and a known price is bought for
+# weight x portfolio value. Between rebalances the holdings do not change.
+#
+# run_backtest works on a dense date x ticker price matrix: rebalance days are
+# found with one searchsorted over the price dates, the (short) sequence of
+# rebalances updates holdings and cash as vector operations, and the daily
+# values of every day are then a single matrix product. reference_backtest is
+# the day by day loop of the notebook, kept to check the engine against
+# (check_parity, or `python backtest.py`).
+
+RESULT_COLUMNS = ['portfolio_value', 'cash', 'positions_value', 'total_return_pct']
+
+
+def _naive_dates(index):
+    """Timezone-naive DatetimeIndex, converting through UTC as the notebook did"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index
+
+
+def _week_start_dates(weeks_index):
+    """Start date (midnight) of every week of the weights index, weekly periods or dates"""
+    if isinstance(weeks_index, pd.PeriodIndex):
+        starts = weeks_index.start_time
+    else:
+        starts = _naive_dates(weeks_index)
+    return starts.normalize()
+
+
+def _align(weights_pivot, price_data):
+    tickers = sorted(set(weights_pivot.columns) & set(price_data.columns))
+    prices = price_data[tickers].copy()
+    prices.index = _naive_dates(prices.index)
+    return tickers, weights_pivot[tickers], prices
+
+
+def rebalance_schedule(weeks_index, price_dates):
+    """(week positions, price row positions) of every rebalance, in date order.
+
+    Each week rebalances on the first price date on or after its start. Weeks
+    starting after the last price date are dropped, and when several weeks land
+    on the same day the first of them in the weights index is used.
+    """
+    rows = np.searchsorted(price_dates.values, _week_start_dates(weeks_index).values, side='left')
+    weeks = np.flatnonzero(rows < len(price_dates))
+    rows = rows[weeks]
+    # np.unique returns the first occurrence of every row, in row (date) order
+    rows, first = np.unique(rows, return_index=True)
+    return weeks[first], rows
+
+
+def run_backtest(weights_pivot, price_data, initial_capital=100000, verbose=True):
+    """Vectorized backtest, returning the daily RESULT_COLUMNS indexed by date"""
+    if weights_pivot.empty or price_data.empty:
+        print("No weights or price data for backtesting!")
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    tickers, weights_pivot, prices = _align(weights_pivot, price_data)
+    if not tickers:
+        print("❌ No common tickers found!")
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    price_matrix = prices.to_numpy(dtype=float)
+    weight_matrix = weights_pivot.to_numpy(dtype=float)
+    weeks, rows = rebalance_schedule(weights_pivot.index, prices.index)
+    if verbose:
+        print(f"🚀 Backtest with ${initial_capital:,.2f} on {len(tickers)} tickers, "
+              f"{len(prices)} trading days, {len(rows)} rebalances")
+
+    # Holdings (shares) and cash right after each rebalance
+    holdings = np.zeros((len(rows), len(tickers)))
+    cash_after = np.zeros(len(rows))
+    positions = np.zeros(len(tickers))
+    cash = float(initial_capital)
+    for i, (week, row) in enumerate(zip(weeks, rows)):
+        price = price_matrix[row]
+        priced = ~np.isnan(price)
+        total_value = cash + np.dot(positions[priced], price[priced])
+
+        sold = priced & (positions > 0)
+        cash += np.dot(positions[sold], price[sold])
+        positions[sold] = 0
+
+        target = weight_matrix[week]
+        bought = priced & (target > 0)
+        target_values = total_value * target[bought]
+        positions[bought] = target_values / price[bought]
+        cash -= target_values.sum()
+
+        holdings[i] = positions
+        cash_after[i] = cash
+
+    # Every day takes the holdings of the last rebalance on or before it
+    segment = np.searchsorted(rows, np.arange(len(prices)), side='right') - 1
+    invested = segment >= 0
+    daily_holdings = np.zeros_like(price_matrix)
+    daily_holdings[invested] = holdings[segment[invested]]
+    daily_cash = np.where(invested, cash_after[np.maximum(segment, 0)], float(initial_capital))
+
+    positions_value = np.nansum(daily_holdings * price_matrix, axis=1)
+    portfolio_value = daily_cash + positions_value
+    results_df = pd.DataFrame({
+        'portfolio_value': portfolio_value,
+        'cash': daily_cash,
+        'positions_value': positions_value,
+        'total_return_pct': (portfolio_value / initial_capital - 1) * 100,
+    }, index=prices.index.rename('date'))
+
+    if verbose:
+        print(f"🎉 Backtest completed: ${initial_capital:,.2f} → ${portfolio_value[-1]:,.2f} "
+              f"({results_df['total_return_pct'].iloc[-1]:.2f}%)")
+    return results_df
+
+
+def reference_backtest(weights_pivot, price_data, initial_capital=100000):
+    """The notebook's original day by day loop (backtest_strategy_final_clean), without its logging"""
+    tickers, weights_filtered, price_filtered = _align(weights_pivot, price_data)
+
+    rebalance_dates = []
+    for week_period, week_start_date in zip(weights_filtered.index, _week_start_dates(weights_filtered.index)):
+        available_dates = price_filtered.index[price_filtered.index >= week_start_date]
+        if len(available_dates) > 0:
+            rebalance_dates.append((week_period, available_dates[0]))
+
+    portfolio_history = []
+    cash = initial_capital
+    positions = {ticker: 0.0 for ticker in tickers}
+    for date in price_filtered.index:
+        current_rebalance = None
+        for week_period, rebalance_date in rebalance_dates:
+            if date.date() == rebalance_date.date():
+                current_rebalance = week_period
+                break
+
+        if current_rebalance is not None:
+            target_weights = weights_filtered.loc[current_rebalance]
+            positions_value = 0
+            for ticker in tickers:
+                if not pd.isna(price_filtered.loc[date, ticker]):
+                    positions_value += positions[ticker] * price_filtered.loc[date, ticker]
+            total_portfolio_value = cash + positions_value
+
+            for ticker in tickers:
+                if positions[ticker] > 0 and not pd.isna(price_filtered.loc[date, ticker]):
+                    cash += positions[ticker] * price_filtered.loc[date, ticker]
+                    positions[ticker] = 0
+
+            for ticker in tickers:
+                weight = target_weights[ticker]
+                if weight > 0 and not pd.isna(price_filtered.loc[date, ticker]):
+                    target_value = total_portfolio_value * weight
+                    positions[ticker] = target_value / price_filtered.loc[date, ticker]
+                    cash -= target_value
+
+        positions_value = 0
+        for ticker in tickers:
+            if not pd.isna(price_filtered.loc[date, ticker]):
+                positions_value += positions[ticker] * price_filtered.loc[date, ticker]
+        total_value = cash + positions_value
+        portfolio_history.append({
+            'date': date,
+            'portfolio_value': total_value,
+            'cash': cash,
+            'positions_value': positions_value,
+            'total_return_pct': ((total_value / initial_capital) - 1) * 100
+        })
+
+    return pd.DataFrame(portfolio_history).set_index('date')
+
+
+def check_parity(weights_pivot, price_data, initial_capital=100000, rtol=1e-9):
+    """Largest relative difference between run_backtest and reference_backtest, raising if above rtol"""
+    fast = run_backtest(weights_pivot, price_data, initial_capital, verbose=False)
+    slow = reference_backtest(weights_pivot, price_data, initial_capital)
+    if not fast.index.equals(slow.index):
+        raise AssertionError('run_backtest and reference_backtest disagree on the trading days')
+    scale = np.maximum(np.abs(slow[RESULT_COLUMNS].to_numpy()), 1.0)
+    difference = np.max(np.abs(fast[RESULT_COLUMNS].to_numpy() - slow[RESULT_COLUMNS].to_numpy()) / scale)
+    if difference > rtol:
+        raise AssertionError(f'run_backtest differs from reference_backtest by {difference:.3g}')
+    return difference
+
+
+def synthetic_inputs(n_tickers=50, start='2022-01-01', end='2024-12-31', seed=0):
+    """Random weekly weights and FixtureProvider prices, some tickers listing late, for parity checks"""
+    from price_providers import FixtureProvider
+    rng = np.random.default_rng(seed)
+    tickers = [f'T{i:03d}' for i in range(n_tickers)]
+    prices = pd.DataFrame({ticker: FixtureProvider.fixture_bars(ticker, pd.Timestamp(start), pd.Timestamp(end))['Close']
+                           for ticker in tickers})
+    for ticker in tickers[::7]:
+        prices.loc[:prices.index[rng.integers(len(prices))], ticker] = np.nan
+
+    weeks = pd.period_range(start, end, freq='W')
+    weights = pd.DataFrame(rng.random((len(weeks), n_tickers)) * (rng.random((len(weeks), n_tickers)) < 0.1),
+                           index=weeks, columns=tickers)
+    weights = weights.div(weights.sum(axis=1).replace(0, 1), axis=0)
+    return weights, prices
+
+
+if __name__ == '__main__':
+    # python backtest.py [n_tickers]
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    weights, prices = synthetic_inputs(n_tickers)
+
+    start = time.perf_counter()
+    run_backtest(weights, prices, verbose=False)
+    fast_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    difference = check_parity(weights, prices)
+    print(f"✅ Parity with the notebook loop on {n_tickers} tickers x {len(prices)} days: "
+          f"max relative difference {difference:.2e}")
+    print(f"⏱️ run_backtest: {fast_seconds * 1000:.1f} ms, parity check (both engines): {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,124 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+# End to end download and parse throughput against a local clerk server:
+# a synthetic corpus is generated (synthetic_corpus.py), served with the
+# requested latency and faults (clerk_server.py), and the daily_run steps run
+# against it in a scratch folder: FD.zip index, PTR downloads, PDF parsing.
+#
+#   python benchmarks/load_test.py --filings 20000 --latency 0.02 --server-errors 0.01 --rate 200
+#
+# The settings read by the pipeline at import time (clerk_base_url,
+# download_rate, download_concurrency, parse_workers) are set from the
+# arguments before any pipeline module is imported.
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Download and parse a synthetic corpus from a local clerk server')
+    parser.add_argument('--year', type=int, default=2025)
+    parser.add_argument('--filings', type=int, default=2000, help='index entries (real volume is a few thousand)')
+    parser.add_argument('--ptr-share', type=float, default=0.6)
+    parser.add_argument('--malformed-share', type=float, default=0.05)
+    parser.add_argument('--irregular-share', type=float, default=0.05,
+                        help='share of PTRs only the table extractor reads in full')
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--not-found', type=float, default=0.0)
+    parser.add_argument('--server-errors', type=float, default=0.0)
+    parser.add_argument('--rate', type=float, default=100.0, help='download_rate, requests per second')
+    parser.add_argument('--concurrency', type=int, default=16, help='download_concurrency')
+    parser.add_argument('--workers', type=int, default=None, help='parse_workers')
+    return parser.parse_args()
+
+
+def main(args, scratch):
+    corpus = os.path.join(scratch, 'corpus')
+    work = os.path.join(scratch, 'work')
+    os.makedirs(os.path.join(work, 'mappings'), exist_ok=True)
+
+    # The server only reads the corpus folder per request, so it can start first and the
+    # settings be set before synthetic_corpus imports the pipeline modules
+    os.makedirs(corpus, exist_ok=True)
+    from clerk_server import start_server
+    server, base_url = start_server(corpus, port=0, latency=args.latency, jitter=args.jitter,
+                                    not_found_share=args.not_found, server_error_share=args.server_errors)
+    os.environ['clerk_base_url'] = base_url
+    os.environ['download_rate'] = str(args.rate)
+    os.environ['download_concurrency'] = str(args.concurrency)
+    if args.workers:
+        os.environ['parse_workers'] = str(args.workers)
+
+    os.chdir(REPO_ROOT)
+    from synthetic_corpus import generate_corpus
+    start = time.perf_counter()
+    counts = generate_corpus(corpus, [args.year], args.filings, args.ptr_share, args.malformed_share,
+                             args.irregular_share)
+    print(f"🏭 Generated {sum(counts.values())} PDFs in {time.perf_counter() - start:.1f}s: {counts}")
+
+    import fd_index
+    import http_cache
+    import load_trades
+    import pdf_downloader
+    import pipeline_metrics
+
+    os.chdir(work)
+    try:
+        # Step 1 of daily_run: the FD.zip index
+        start = time.perf_counter()
+        response = http_cache.conditional_get(f'{fd_index.FINANCIAL_PDFS_URL}/{args.year}FD.zip')
+        index_folder = os.path.join('financial_disclosures', str(args.year))
+        txt_file = fd_index.extract_index(response.path, index_folder)
+        entries = fd_index.select_entries(fd_index.read_fd_index(os.path.join(index_folder, txt_file)))
+        print(f"📥 Index: {len(entries)} PTRs to download, {time.perf_counter() - start:.2f}s")
+
+        # Step 2: the PTRs
+        stock_folder = os.path.join('stock_purchases', str(args.year))
+        os.makedirs(stock_folder, exist_ok=True)
+        jobs = [pdf_downloader.DownloadJob(entry.doc_id, [fd_index.document_url(entry, args.year)],
+                                           os.path.join(stock_folder, fd_index.pdf_file_name(entry)))
+                for entry in entries]
+        start = time.perf_counter()
+        results = pdf_downloader.download_pdfs(jobs)
+        seconds = time.perf_counter() - start
+        n_downloaded = sum(result.status == 'downloaded' for result in results)
+        n_bytes = sum(result.n_bytes for result in results)
+        print(f"📄 Downloads: {n_downloaded}/{len(jobs)} PDFs in {seconds:.1f}s, "
+              f"{n_downloaded / seconds:.1f} PDFs/s, {n_bytes / 1e6 / seconds:.2f} MB/s")
+
+        # Step 3: parsing
+        paths = sorted(glob.glob(os.path.join(stock_folder, '*.pdf')))
+        start = time.perf_counter()
+        frames = list(load_trades.iter_trades(paths, workers=args.workers))
+        seconds = time.perf_counter() - start
+        n_rows = sum(len(frame) for frame in frames)
+        print(f"🔄 Parsing: {len(frames)}/{len(paths)} PDFs with trades, {n_rows} rows in {seconds:.1f}s, "
+              f"{len(paths) / seconds:.1f} PDFs/s, {n_rows / seconds:.0f} rows/s")
+
+        # Irregular PTRs have to go through the table fallback, scanned ones to be quarantined by triage
+        counters = Counter()
+        for record in pipeline_metrics.stage_records():
+            counters.update(record['counters'])
+        n_fallback = counters['pdfs_by_extractor{extractor=table}']
+        n_image_only = counters['parse_failures{reason=image only}']
+        print(f"🧾 Table fallback: {n_fallback} PDFs, quarantined as image only: {n_image_only} PDFs")
+        if not args.not_found:
+            assert n_fallback or not counts['irregular'], 'no irregular PTR went through the table fallback'
+            assert n_image_only or not counts['scanned'], 'no scanned PTR was quarantined as image only'
+    finally:
+        server.shutdown()
+        os.chdir(REPO_ROOT)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    with tempfile.TemporaryDirectory() as scratch_folder:
+        main(arguments, scratch_folder)
@@ -0,0 +1,210 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Benchmarks run from the repository root, like the rest of the pipeline
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.chdir(REPO_ROOT)
+
+import pandas as pd
+import load_trades
+import ticker_resolver
+from amount_codec import amount_midpoint, decode_amounts
+from backtest import run_backtest
+from read_pdf import format_table_rows, read_pdf
+from strategy_sweep import StrategyParams, build_weights
+from synthetic_data import TABLE_HEADER, synthetic_prices, synthetic_trades, write_fixture_pdfs
+
+
+# Offline benchmarks of the ingestion and backtest hot paths, on fixture PDFs
+# and synthetic trades / prices written by synthetic_data:
+#
+#   python benchmarks/run_benchmarks.py            run and compare with baseline.json
+#   python benchmarks/run_benchmarks.py --save     run and make the results the new baseline
+#   python benchmarks/run_benchmarks.py --only backtest
+#
+# Every case reports its median wall time over REPEAT runs (after a warm-up
+# run), the throughput (PDFs/s, rows/s, ...) and the peak Python memory of one
+# run (tracemalloc, numpy and pandas buffers included). A case slower than the
+# baseline by more than --tolerance is reported as a regression and the exit
+# code is 1, so the suite can be run before and after a commit. Slowdowns under
+# --noise-floor seconds are timer and scheduler noise on the millisecond cases
+# and never count as regressions.
+
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+TRADE_SIZES = [1000, 10000, 100000]
+TICKER_SIZES = [50, 500, 2000]
+N_FIXTURE_PDFS = 20
+ROWS_PER_PDF = 20
+# Timed runs per case, and for the read_pdf cases, that take seconds per run
+REPEAT = 7
+READ_PDF_REPEAT = 3
+# Slowdowns (seconds) below which a case is never a regression
+NOISE_FLOOR = 0.005
+
+
+def measure(function, repeat=REPEAT):
+    """(median seconds, peak MiB) of function() over repeat runs after a warm-up one, peak memory
+    taken on an extra traced run"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak / 2 ** 20
+
+
+def bench_read_pdf(fixture_folder):
+    paths = write_fixture_pdfs(fixture_folder, N_FIXTURE_PDFS, ROWS_PER_PDF)
+    for extractor in ('text', 'table'):
+        seconds, peak = measure(lambda: [read_pdf(path, extractors=(extractor,)) for path in paths],
+                                repeat=READ_PDF_REPEAT)
+        yield f'read_pdf[{extractor}]', seconds, len(paths) / seconds, 'PDFs/s', peak
+        yield f'read_pdf[{extractor}] rows', seconds, len(paths) * ROWS_PER_PDF / seconds, 'rows/s', peak
+
+
+def _pdfplumber_table(trades_df):
+    """The table pdfplumber extracts from a PTR page, for the trades of trades_df"""
+    rows = [['', '', name, flag, date, notified, amount.replace(' - ', ' -\n'), '']
+            for name, flag, date, notified, amount in trades_df[
+                ['stock_name', 'buy_sell_flag', 'purchase_date', 'notification_date', 'invested_amount']
+            ].itertuples(index=False)]
+    return [TABLE_HEADER] + rows
+
+
+def bench_format_table(n_trades):
+    table = _pdfplumber_table(synthetic_trades(n_trades))
+    seconds, peak = measure(lambda: format_table_rows(table, 1))
+    yield f'format_table_rows[{n_trades}]', seconds, n_trades / seconds, 'rows/s', peak
+
+
+def bench_amounts(n_trades):
+    amounts = synthetic_trades(n_trades)['invested_amount']
+    seconds, peak = measure(lambda: decode_amounts(amounts))
+    yield f'decode_amounts[{n_trades}]', seconds, n_trades / seconds, 'rows/s', peak
+
+
+def bench_add_tickers(n_trades, learned_path):
+    trades_df = synthetic_trades(n_trades)
+
+    def run():
+        # A fresh resolver each run, so fuzzy matches are not served from the previous run's cache
+        ticker_resolver.reset_resolver(learned_path=learned_path)
+        load_trades.add_tickers(trades_df)
+
+    seconds, peak = measure(run)
+    yield f'add_tickers[{n_trades}]', seconds, n_trades / seconds, 'rows/s', peak
+
+
+def _buys(n_trades, tickers):
+    trades_df = synthetic_trades(n_trades)
+    codes = decode_amounts(trades_df['invested_amount'])
+    return pd.DataFrame({
+        'ticker': pd.Series(tickers).sample(n_trades, replace=True, random_state=0).to_numpy(),
+        'avg_investment': amount_midpoint(codes),
+        'purchase_date': pd.to_datetime(trades_df['purchase_date'], format='%m/%d/%Y'),
+    })
+
+
+def bench_build_weights(n_trades):
+    buys = _buys(n_trades, [f'T{i:04d}' for i in range(500)])
+    seconds, peak = measure(lambda: build_weights(buys, StrategyParams()))
+    yield f'build_weights[{n_trades}]', seconds, n_trades / seconds, 'rows/s', peak
+
+
+def bench_backtest(n_tickers):
+    prices = synthetic_prices(n_tickers)
+    weights = build_weights(_buys(10000, list(prices.columns)), StrategyParams())
+    seconds, peak = measure(lambda: run_backtest(weights, prices, verbose=False))
+    yield f'run_backtest[{n_tickers} tickers]', seconds, len(prices) / seconds, 'days/s', peak
+
+
+def run_benchmarks(only=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        learned_path = os.path.join(tmp, 'learned_stocks.csv')
+        cases = [('read_pdf', lambda: bench_read_pdf(os.path.join(tmp, 'pdfs')))]
+        for n in TRADE_SIZES:
+            cases += [('format_table_rows', lambda n=n: bench_format_table(n)),
+                      ('decode_amounts', lambda n=n: bench_amounts(n)),
+                      ('add_tickers', lambda n=n: bench_add_tickers(n, learned_path)),
+                      ('build_weights', lambda n=n: bench_build_weights(n))]
+        cases += [('run_backtest', lambda n=n: bench_backtest(n)) for n in TICKER_SIZES]
+
+        results = {}
+        for label, case in cases:
+            if only and not any(word in label for word in only):
+                continue
+            for name, seconds, throughput, unit, peak in case():
+                results[name] = {'seconds': round(seconds, 6), 'throughput': round(throughput, 1),
+                                 'unit': unit, 'peak_mib': round(peak, 2)}
+                print(f"⏱️ {name:<34} {seconds * 1000:10.1f} ms {throughput:14,.0f} {unit:<7} {peak:9.1f} MiB")
+    return results
+
+
+def compare(results, baseline, tolerance, noise_floor=NOISE_FLOOR):
+    """Names of the cases slower than the baseline by more than tolerance (0.25 = 25%),
+    and by more than noise_floor seconds"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['seconds'] / baseline[name]['seconds']
+        if ratio > 1 + tolerance and result['seconds'] - baseline[name]['seconds'] > noise_floor:
+            regressions.append(name)
+            print(f"   🐢 {name}: {ratio:.2f}x the baseline time")
+    return regressions
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the ingestion and backtest hot paths')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--only', nargs='+', help='run the cases whose name contains one of these words')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='slowdown reported as a regression')
+    parser.add_argument('--noise-floor', type=float, default=NOISE_FLOOR,
+                        help='slowdowns under this many seconds are never regressions')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only)
+    baseline = {'results': {}}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    if args.save:
+        # Cases left out with --only keep their previous baseline
+        baseline = {'commit': _commit(), 'python': sys.version.split()[0],
+                    'results': {**baseline['results'], **results}}
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as baseline_file:
+            json.dump(baseline, baseline_file, indent=1)
+            baseline_file.write('\n')
+        print(f"💾 Saved baseline to {BASELINE_PATH}")
+    elif baseline['results']:
+        print(f"\n📊 Compared with the baseline of commit {baseline.get('commit')}:")
+        if compare(results, baseline['results'], args.tolerance, args.noise_floor):
+            sys.exit(1)
+        print("   ✅ No regressions")
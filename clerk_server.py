@@ -0,0 +1,105 @@
+import argparse
+import functools
+import random
+import threading
+import time
+import zlib
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local stand-in for disclosures-clerk.house.gov, serving a corpus written by
+# synthetic_corpus.py under the same ptr-pdfs/ and financial-pdfs/ paths.
+# Point the pipeline at it with the clerk_base_url setting:
+#
+#   python synthetic_corpus.py corpus --filings 20000
+#   python clerk_server.py corpus --port 8765 --latency 0.05 --not-found 0.01 --server-errors 0.02
+#   clerk_base_url=http://127.0.0.1:8765 python daily_run.py 2025
+#
+# Every request waits latency (+ up to jitter) seconds. A fixed share of the
+# documents always answers 404 (chosen from a hash of the path, like filings
+# that were withdrawn), and a share of all requests fails with a 5xx at random,
+# like a busy server. Last-Modified / If-Modified-Since work as on the real
+# site, so conditional downloads of the FD.zip index get their 304.
+
+SERVER_ERRORS = [500, 502, 503]
+
+
+class ClerkRequestHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+    not_found_share = 0.0
+    server_error_share = 0.0
+    verbose = False
+    random = random.Random(0)
+
+    def _always_missing(self):
+        # Stable per path, so retries of a missing document keep missing
+        return zlib.crc32(self.path.encode('utf-8')) % 10000 < self.not_found_share * 10000
+
+    def _fault(self):
+        time.sleep(self.latency + self.jitter * self.random.random())
+        if self.path.endswith('.pdf') and self._always_missing():
+            return 404
+        if self.random.random() < self.server_error_share:
+            return self.random.choice(SERVER_ERRORS)
+        return None
+
+    def do_GET(self):
+        status = self._fault()
+        if status is not None:
+            self.send_error(status)
+            return
+        super().do_GET()
+
+    def do_HEAD(self):
+        status = self._fault()
+        if status is not None:
+            self.send_error(status)
+            return
+        super().do_HEAD()
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(root, host='127.0.0.1', port=8765, latency=0.0, jitter=0.0, not_found_share=0.0,
+                server_error_share=0.0, seed=0, verbose=False):
+    """ThreadingHTTPServer serving root with the given faults (port=0 picks a free port)"""
+    handler = type('ConfiguredClerkRequestHandler', (ClerkRequestHandler,), {
+        'latency': latency, 'jitter': jitter, 'not_found_share': not_found_share,
+        'server_error_share': server_error_share, 'verbose': verbose, 'random': random.Random(seed),
+    })
+    return ThreadingHTTPServer((host, port), functools.partial(handler, directory=root))
+
+
+def start_server(root, **kwargs):
+    """Serve root from a background thread, returning (server, base URL). Stop it with server.shutdown()."""
+    server = make_server(root, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve a synthetic corpus like the clerk disclosure website')
+    parser.add_argument('root', help='corpus folder written by synthetic_corpus.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many more seconds, at random')
+    parser.add_argument('--not-found', type=float, default=0.0, help='share of documents answering 404')
+    parser.add_argument('--server-errors', type=float, default=0.0, help='share of requests failing with a 5xx')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    server = make_server(args.root, args.host, args.port, args.latency, args.jitter, args.not_found,
+                         args.server_errors, args.seed, args.verbose)
+    print(f"🏛️ Serving {args.root} at http://{args.host}:{args.port} (set clerk_base_url to that address)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,9 +1,12 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 
-import io
 import os
 import requests
-import zipfile
+
+import disclosure_state
+import fd_index
+import http_cache
+import pipeline_metrics
 
 # MULTI-YEAR DATA DOWNLOAD CONFIGURATION
 # Years to download for comprehensive backtesting (oldest to newest)
@@ -12,20 +15,29 @@ CURRENT_YEAR = 2024  # Current year for daily operations
 
 
 def download_today_public_data():
-    """Download current year's data for daily operations"""
-    financial_disclosures_report_url = f"https://disclosures-clerk.house.gov/public_disc/financial-pdfs/{CURRENT_YEAR}FD.zip"
-    response = requests.get(financial_disclosures_report_url)
+    """Download current year's data for daily operations
+
+    The zip is fetched with a conditional GET, so an unchanged index costs a single 304 response.
+    Returns the path of the cached zip, also on a 304 as the body may have been downloaded by
+    another caller sharing the cache, or None if the download failed.
+    """
+    financial_disclosures_report_url = f"{fd_index.FINANCIAL_PDFS_URL}/{CURRENT_YEAR}FD.zip"
+    response = http_cache.conditional_get(financial_disclosures_report_url)
 
-    if response.status_code == 200:
-        # Extraction of today's zip file
-        z = zipfile.ZipFile(io.BytesIO(response.content))
+    if response.status_code in (200, 304):
+        # Extraction of the txt index of today's zip file, the only member we read
         today = datetime.today()
         today_folder_name = "disclosures_" + today.strftime("%m_%d_%Y")
         path_to_folder = os.path.join('financial_disclosures', today_folder_name)
-        z.extractall(path_to_folder)
-        print(f"✅ Downloaded {CURRENT_YEAR} data to {path_to_folder}")
+        fd_index.extract_index(response.path, path_to_folder)
+        if response.changed:
+            print(f"✅ Downloaded {CURRENT_YEAR} data to {path_to_folder}")
+        else:
+            print(f"ℹ️ {CURRENT_YEAR} data unchanged since last download, extracted to {path_to_folder}")
+        return response.path
     else:
         print(f'❌ Failed to download {CURRENT_YEAR} data - Status code: {response.status_code}')
+        return None
 
 
 def download_historical_data():
@@ -51,20 +63,23 @@ def download_historical_data():
             os.makedirs(path_to_folder)
         
         # Download year's data
-        financial_disclosures_url = f"https://disclosures-clerk.house.gov/public_disc/financial-pdfs/{year}FD.zip"
+        financial_disclosures_url = f"{fd_index.FINANCIAL_PDFS_URL}/{year}FD.zip"
         
         try:
-            response = requests.get(financial_disclosures_url, timeout=30)
+            response = http_cache.conditional_get(financial_disclosures_url)
             
-            if response.status_code == 200:
-                # Extract zip file directly to stock_purchases/{year}/
-                z = zipfile.ZipFile(io.BytesIO(response.content))
-                z.extractall(path_to_folder)
+            if response.status_code in (200, 304):
+                # Extract the txt index directly to stock_purchases/{year}/, also on a 304:
+                # the cached zip may have been downloaded by another caller sharing the cache
+                fd_index.extract_index(response.path, path_to_folder)
                 
                 # Count extracted files
                 extracted_files = len([f for f in os.listdir(path_to_folder) if f.endswith('.pdf')])
                 
-                print(f"   ✅ {year}: Downloaded {extracted_files} PDF files to {path_to_folder}")
+                if response.changed:
+                    print(f"   ✅ {year}: Downloaded {extracted_files} PDF files to {path_to_folder}")
+                else:
+                    print(f"   ℹ️ {year}: Unchanged since last download, {extracted_files} PDF files in {path_to_folder}")
                 successful_downloads.append((year, extracted_files))
                 
             else:
@@ -95,57 +110,66 @@ def download_historical_data():
     return successful_downloads, failed_downloads
 
 
-def compare_today_yesterday():
-    today = datetime.today()
-    today_folder_name = "disclosures_" + today.strftime("%m_%d_%Y")
-    file_name = f'{CURRENT_YEAR}FD.txt'  # Uses current year
-    path_today_txt_file = os.path.join("financial_disclosures", today_folder_name, file_name)
-    download_today_public_data()
+def compare_today_yesterday(state_db=disclosure_state.STATE_DB):
+    """Find the filings of the current year that were never seen before.
 
-    # Reading today and yesterday's txt files
-    yesterday = today - timedelta(1)
-    yesterday_folder_name = "disclosures_" + yesterday.strftime("%m_%d_%Y")
-    path_yesterday_txt_file = os.path.join("financial_disclosures", yesterday_folder_name, file_name)
+    New filings are detected against the persistent disclosure state rather than
+    yesterday's index, so missed days or restarts never re-announce old filings.
+    """
+    # Recorded even when the server says the index has not changed: the zip may have
+    # been downloaded by another caller sharing the cache, and recording is idempotent
+    zip_path = download_today_public_data()
+    if zip_path is None:
+        return ['No new congressional shenanigans'], list()
 
-    # Comparing the contents and extracting the difference
-    if not os.path.exists(path_yesterday_txt_file):
-        with open(path_today_txt_file) as today_txt_file:
-            differences = set(today_txt_file.readlines())
-    else:
-        with open(path_today_txt_file) as today_txt_file, open(path_yesterday_txt_file) as yesterday_txt_file:
-            differences = set(today_txt_file.readlines()) - set(yesterday_txt_file.readlines())
+    conn = disclosure_state.connect(state_db)
+    try:
+        new_entries_list = disclosure_state.record_entries(conn, fd_index.iter_zip_index(zip_path), CURRENT_YEAR)
+    finally:
+        conn.close()
 
-    # Comparing today and yesterday
-    if differences != set():
-        new_entries_list = [diff.split("\t") for diff in differences]
+    if new_entries_list:
         messages_list = [
-            "New entry from {0} {1} {2} on {3}, disclosure_id: {4}".format(entry[0], entry[1], entry[2], entry[7],
-                                                                           entry[8][:-1])
+            "New entry from {0} {1} {2} on {3}, disclosure_id: {4}".format(entry.prefix, entry.last, entry.first,
+                                                                           entry.filing_date, entry.doc_id)
             for entry in new_entries_list]
         return messages_list, new_entries_list
     else:
         return ['No new congressional shenanigans'], list()
 
 
-def get_response(disclosure_id, max_retries=3, timeout=30):
+def get_response(disclosure_id, filing_type=None, max_retries=3, timeout=30):
     """
     There are two different base URLs on the disclosures-clerk website corresponding
     to two types of files:
     https://disclosures-clerk.house.gov/public_disc/ptr-pdfs/2025/ => for new stock purchases
     https://disclosures-clerk.house.gov/public_disc/financial-pdfs/2025/ => for other documents
+    When the FilingType of the disclosure is known, only the URL it lives at is requested,
+    otherwise both are tried in turn.
     """
     import time
     
-    urls_to_try = [
-        (f'https://disclosures-clerk.house.gov/public_disc/ptr-pdfs/{CURRENT_YEAR}/' + disclosure_id + '.pdf', 'stock_purchases'),
-        (f'https://disclosures-clerk.house.gov/public_disc/financial-pdfs/{CURRENT_YEAR}/' + disclosure_id + '.pdf', 'other_documents')
-    ]
+    ptr_url = (f'{fd_index.PTR_PDFS_URL}/{CURRENT_YEAR}/' + disclosure_id + '.pdf', 'stock_purchases')
+    financial_url = (f'{fd_index.FINANCIAL_PDFS_URL}/{CURRENT_YEAR}/' + disclosure_id + '.pdf', 'other_documents')
+    if filing_type is None:
+        urls_to_try = [ptr_url, financial_url]
+    elif filing_type == fd_index.PTR_FILING_TYPE:
+        urls_to_try = [ptr_url]
+    else:
+        urls_to_try = [financial_url]
     
     for disclosure_url, document_type in urls_to_try:
         for attempt in range(max_retries):
             try:
                 print(f"   📥 Downloading {disclosure_id} (attempt {attempt + 1}/{max_retries})...")
-                response = requests.get(disclosure_url, timeout=timeout)
+                start = time.perf_counter()
+                try:
+                    response = requests.get(disclosure_url, timeout=timeout)
+                except requests.exceptions.RequestException as e:
+                    pipeline_metrics.record_request(time.perf_counter() - start, type(e).__name__)
+                    raise
+                pipeline_metrics.record_request(time.perf_counter() - start, response.status_code,
+                                                len(response.content))
                 
                 if response.status_code == 200:
                     print(f"   ✅ Success: {disclosure_id}")
@@ -183,36 +207,64 @@ def get_disclosure(response, document_type, full_name, disclosure_id):
     with open(path_to_file, 'wb') as disclosure:
         disclosure.write(response.content)
     print("File was written to: ", path_to_file)
+    return path_to_file
 
 
-def run():
-    """Standard daily run - downloads current year data and compares"""
-    download_today_public_data()
-    messages_list, new_entries_list = compare_today_yesterday()
-    
+def run(filing_types=None, state_db=disclosure_state.STATE_DB):
+    """Standard daily run - downloads current year data and compares
+
+    Every filing still pending in the disclosure state is downloaded, not only today's
+    new ones, so downloads that failed on a previous run are retried. Only filings of
+    the given FilingTypes are downloaded, PTRs by default (see fd_index).
+    """
+    # compare_today_yesterday downloads today's data itself
+    pipeline_metrics.start_run('compare_dates')
+    try:
+        with pipeline_metrics.stage('download_index'):
+            messages_list, new_entries_list = compare_today_yesterday(state_db)
+        with pipeline_metrics.stage('download_pdfs'):
+            download_pending(filing_types, state_db)
+    finally:
+        pipeline_metrics.write_metrics()
+
+    for message in messages_list:
+        print(message)
+
+    return messages_list
+
+
+def download_pending(filing_types=None, state_db=disclosure_state.STATE_DB):
+    """Download every filing still pending in the disclosure state.
+    Returns the paths of the downloaded PTRs (the stock_purchases documents)."""
     successful_downloads = 0
     failed_downloads = 0
+    ptr_paths = []
     
-    for entry in new_entries_list:
-        disclosure_id = entry[8][:-1]
-        response, document_type = get_response(disclosure_id)
-        
-        if response is not None and document_type is not None:
-            full_name = entry[1] + entry[2]
-            get_disclosure(response, document_type, full_name, disclosure_id)
-            successful_downloads += 1
-        else:
-            failed_downloads += 1
-            print(f"⚠️ Skipping {disclosure_id} due to download failure")
+    conn = disclosure_state.connect(state_db)
+    try:
+        for fd_entry in disclosure_state.pending_downloads(conn, filing_types, year=CURRENT_YEAR):
+            disclosure_id = fd_entry.doc_id
+            response, document_type = get_response(disclosure_id, fd_entry.filing_type)
+            
+            if response is not None and document_type is not None:
+                path_to_file = get_disclosure(response, document_type, fd_index.full_name(fd_entry), disclosure_id)
+                disclosure_state.mark_downloaded(conn, disclosure_id, path=path_to_file)
+                successful_downloads += 1
+                if document_type == 'stock_purchases':
+                    ptr_paths.append(path_to_file)
+            else:
+                disclosure_state.mark_downloaded(conn, disclosure_id, success=False)
+                failed_downloads += 1
+                print(f"⚠️ Skipping {disclosure_id} due to download failure")
+    finally:
+        conn.close()
 
+    pipeline_metrics.count('pdfs_downloaded', successful_downloads)
+    pipeline_metrics.count('pdfs_download_failed', failed_downloads)
     print(f"\n📊 DOWNLOAD SUMMARY:")
     print(f"   ✅ Successful: {successful_downloads} files")
     print(f"   ❌ Failed: {failed_downloads} files")
-    
-    for message in messages_list:
-        print(message)
-
-    return messages_list
+    return ptr_paths
 
 
 def run_historical():
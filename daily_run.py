@@ -1,21 +1,25 @@
 import compare_dates
+import fd_index
+import http_cache
 import load_trades
+import pdf_downloader
+import pipeline_metrics
+import trade_cube
+import trade_store
 from data_utils import bot_token, my_channel_id
 import utils
+import atexit
+import glob
 import os
 import sys
-import time
-import io
 import requests
-import zipfile
-from datetime import datetime
 
 import asyncio
 import telegram
 
 
 def download_and_extract_year_data(year):
-    """Download congressional data for a specific year and extract TXT/XML files"""
+    """Download congressional data for a specific year and extract its TXT index"""
     print(f"📥 Downloading {year} congressional data...")
     
     # Create year-specific folder in financial_disclosures
@@ -24,23 +28,21 @@ def download_and_extract_year_data(year):
         os.makedirs(year_folder)
     
     # Download year's ZIP file
-    financial_disclosures_url = f"https://disclosures-clerk.house.gov/public_disc/financial-pdfs/{year}FD.zip"
+    financial_disclosures_url = f"{fd_index.FINANCIAL_PDFS_URL}/{year}FD.zip"
     
     try:
-        response = requests.get(financial_disclosures_url, timeout=30)
+        response = http_cache.conditional_get(financial_disclosures_url)
         
-        if response.status_code == 200:
-            # Extract ZIP contents directly to year folder (TXT and XML files)
-            z = zipfile.ZipFile(io.BytesIO(response.content))
-            z.extractall(year_folder)
+        if response.status_code in (200, 304):
+            # Extract only the TXT index to the year folder, the XML copy is never read.
+            # Also on a 304: the cached zip may have been downloaded by compare_dates
+            txt_file = fd_index.extract_index(response.path, year_folder)
             
-            # Count extracted files
-            extracted_files = os.listdir(year_folder)
-            txt_files = [f for f in extracted_files if f.endswith('.txt')]
-            xml_files = [f for f in extracted_files if f.endswith('.xml')]
-            
-            print(f"   ✅ Extracted {len(txt_files)} TXT and {len(xml_files)} XML files to {year_folder}")
-            return year_folder, txt_files
+            if response.changed:
+                print(f"   ✅ Extracted {txt_file} to {year_folder}")
+            else:
+                print(f"   ℹ️ {year} data unchanged since last download, extracted {txt_file} to {year_folder}")
+            return year_folder, [txt_file]
         else:
             print(f"   ❌ Failed to download - Status code {response.status_code}")
             return None, []
@@ -53,8 +55,12 @@ def download_and_extract_year_data(year):
         return None, []
 
 
-def download_pdfs_from_txt(year_folder, txt_files, year):
-    """Read TXT file and download individual PDFs to stock_purchases/{year}/"""
+def download_pdfs_from_txt(year_folder, txt_files, year, filing_types=None):
+    """Read TXT file and download individual PDFs to stock_purchases/{year}/
+
+    Only the filing types in filing_types are downloaded (PTRs by default, see fd_index),
+    each straight from the URL tree its FilingType lives in.
+    """
     print(f"📄 Processing TXT files to download PDFs for {year}...")
     
     # Create year-specific folder in stock_purchases
@@ -62,102 +68,36 @@ def download_pdfs_from_txt(year_folder, txt_files, year):
     if not os.path.exists(stock_folder):
         os.makedirs(stock_folder)
     
-    # Get existing PDF files to avoid duplicates
-    existing_files = set()
-    if os.path.exists(stock_folder):
-        existing_files = {f for f in os.listdir(stock_folder) if f.endswith('.pdf')}
-    
-    successful_downloads = 0
-    failed_downloads = 0
-    skipped_downloads = 0
-    
-    # Process each TXT file
+    # Collect one download job per disclosure, PDFs already on disk are skipped by the downloader
+    jobs = []
     for txt_file in txt_files:
         txt_path = os.path.join(year_folder, txt_file)
         print(f"   📋 Reading {txt_file}...")
         
         try:
-            with open(txt_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            print(f"   📊 Found {len(lines)} disclosure entries")
+            entries = fd_index.read_fd_index(txt_path)
+            selected_entries = fd_index.select_entries(entries, filing_types)
+            print(f"   📊 Found {len(entries)} disclosure entries, {len(selected_entries)} to download")
             
-            for line in lines:
-                try:
-                    # Parse the tab-separated line
-                    entry = line.strip().split('\t')
-                    if len(entry) >= 9:
-                        disclosure_id = entry[8].strip()
-                        full_name = entry[1] + entry[2]
-                        
-                        # Create filename with full name + disclosure ID (like original)
-                        full_name = (entry[1] + entry[2]).replace('"', '')  # Remove quotes if any
-                        pdf_filename = f"{full_name}_{disclosure_id}.pdf"
-                        
-                        # Check if PDF already exists
-                        if pdf_filename in existing_files:
-                            skipped_downloads += 1
-                            continue
-                        
-                        # Download the PDF using existing functions
-                        response, document_type = get_response(disclosure_id, year)
-                        
-                        if response is not None and document_type is not None:
-                            # Save PDF to stock_purchases/{year}/
-                            pdf_path = os.path.join(stock_folder, pdf_filename)
-                            with open(pdf_path, 'wb') as pdf_file:
-                                pdf_file.write(response.content)
-                            
-                            successful_downloads += 1
-                            existing_files.add(pdf_filename)  # Update set to avoid re-downloading
-                        else:
-                            failed_downloads += 1
-                            
-                except Exception as e:
-                    print(f"   ⚠️ Error processing entry: {e}")
-                    failed_downloads += 1
+            for entry in selected_entries:
+                pdf_path = os.path.join(stock_folder, fd_index.pdf_file_name(entry))
+                jobs.append(pdf_downloader.DownloadJob(entry.doc_id, [fd_index.document_url(entry, year)], pdf_path))
                     
         except Exception as e:
             print(f"   ❌ Error reading {txt_file}: {e}")
     
-    print(f"   ✅ Downloaded {successful_downloads} new PDFs to {stock_folder}")
-    if skipped_downloads > 0:
-        print(f"   ⏭️ Skipped {skipped_downloads} existing PDFs")
-    if failed_downloads > 0:
-        print(f"   ❌ Failed to download {failed_downloads} PDFs")
-    
-    return successful_downloads
+    results = pdf_downloader.download_pdfs(jobs)
+    return sum(result.status == 'downloaded' for result in results)
 
 
-# Import the helper functions from compare_dates
-def get_response(disclosure_id, year, max_retries=3, timeout=30):
-    """Get response for a disclosure ID (adapted from compare_dates.py)"""
-    base_urls = [
-        "https://disclosures-clerk.house.gov/public_disc/ptr-pdfs/",
-        "https://disclosures-clerk.house.gov/public_disc/financial-pdfs/"
-    ]
-    
-    for attempt in range(max_retries):
-        for i, base_url in enumerate(base_urls):
-            try:
-                url = f"{base_url}{year}/{disclosure_id}.pdf"
-                response = requests.get(url, timeout=timeout)
-                
-                if response.status_code == 200:
-                    document_type = "ptr" if i == 0 else "financial"
-                    return response, document_type
-                    
-            except requests.exceptions.RequestException:
-                continue
-        
-        if attempt < max_retries - 1:
-            time.sleep(1)  # Wait before retry
-    
-    return None, None
+def process_year_data(year, workers=None):
+    """Parse the PDFs of a specific year into the cumulative trade store and the year's CSV
 
-
-def process_year_data(year):
-    """Process PDFs for a specific year and return complete trading data with representative names"""
+    Trades are streamed from the parser into the store in batches (see load_trades.store_trades),
+    tagged with representative names and tickers. PDFs are parsed across a process pool of
+    `workers` processes (parse_workers setting by default). Returns the StoredTrades, or None
+    when no trade was found.
+    """
     print(f"🔄 Processing {year} trading data...")
     
     stock_folder = os.path.join('stock_purchases', str(year))
@@ -167,64 +107,23 @@ def process_year_data(year):
         return None
     
     # Get PDFs from year folder
-    pdf_files = [f for f in os.listdir(stock_folder) if f.endswith('.pdf')]
-    
-    if not pdf_files:
-        print(f"   ❌ No PDF files found for {year}")
-        return None
-    
-    print(f"   📄 Found {len(pdf_files)} PDF files")
-    
-    # Use the complete processing logic from load_trades.py that includes representative names
-    import glob
-    import pandas as pd
-    from read_pdf import read_pdf
-    from data_utils import formatted_invested_amount_dict
-    
-    year_path = os.path.join('stock_purchases', str(year), "*pdf")
-    year_pdfs = glob.glob(year_path)
+    year_pdfs = sorted(glob.glob(os.path.join(stock_folder, "*pdf")))
     
     if not year_pdfs:
-        print(f"   ❌ No PDFs found to process for {year}")
+        print(f"   ❌ No PDF files found for {year}")
         return None
     
-    # Process PDFs with complete data extraction (same logic as get_and_format_all_trades)
-    all_trades_df = pd.DataFrame()
-    processed_count = 0
+    print(f"   📄 Found {len(year_pdfs)} PDF files")
     
-    for pdf_path in year_pdfs:
-        try:
-            df = read_pdf(pdf_path)
-            if df is not None and not df.empty:
-                # Extract representative name from filename (same as load_trades.py)
-                representative_name = pdf_path.split(sep='\\')[-1].split(sep='_')[0]
-                df.insert(0, 'representative_name', representative_name)
-                all_trades_df = pd.concat([all_trades_df, df], ignore_index=True)
-                processed_count += 1
-        except Exception as e:
-            print(f"   ⚠️ Error processing {os.path.basename(pdf_path)}: {e}")
+    # Process PDFs with complete data extraction (same logic as get_and_format_all_trades),
+    # each batch going to the store partitions as soon as it is parsed
+    year_output_path = os.path.join('stock_purchases', f'trades_{year}.csv')
+    stored = load_trades.store_trades(load_trades.iter_trades(year_pdfs, workers=workers), csv_path=year_output_path)
     
-    if not all_trades_df.empty:
-        print(f"   ✅ Processed {processed_count} PDFs, found {len(all_trades_df)} trading records")
-        
-        # Format investment amounts into min_amount and max_amount (same as load_trades.py)
-        try:
-            all_trades_df['formatted_inv_amount'] = all_trades_df['invested_amount'].str.split('-').str[0].str.strip().map(formatted_invested_amount_dict)
-            all_trades_df['min_amount'] = all_trades_df['formatted_inv_amount'].str.split('-').str[0].astype(float)
-            all_trades_df['max_amount'] = all_trades_df['formatted_inv_amount'].str.split('-').str[1].astype(float)
-            
-            # Add transaction_year column for analysis
-            all_trades_df['purchase_date'] = pd.to_datetime(all_trades_df['purchase_date'], errors='coerce')
-            all_trades_df['transaction_year'] = all_trades_df['purchase_date'].dt.year
-            
-            # Drop intermediate columns
-            all_trades_df.drop(['formatted_inv_amount'], inplace=True, axis=1)
-            
-            print(f"   ✅ Formatted investment amounts and added representative names")
-        except Exception as e:
-            print(f"   ⚠️ Warning: Could not format investment amounts: {e}")
-        
-        return all_trades_df
+    if stored.rows:
+        print(f"   ✅ Processed {stored.pdfs} PDFs, stored {stored.rows} trading records")
+        print(f"   💾 Saved the {year} dataset to {year_output_path}")
+        return stored
     else:
         print(f"   ❌ No valid trading data found for {year}")
         return None
@@ -267,10 +166,16 @@ if __name__ == '__main__':
     
     print(f"\n🎯 Processing congressional data for year: {target_year}")
     print("=" * 50)
+
+    # Stage timings and counters go to pipeline_metrics, written on every exit
+    # including the early ones below
+    pipeline_metrics.start_run('daily_run')
+    atexit.register(pipeline_metrics.write_metrics)
     
     # Step 1: Download and extract TXT/XML files
     print(f"\n📥 Step 1: Downloading and extracting {target_year} data...")
-    year_folder, txt_files = download_and_extract_year_data(target_year)
+    with pipeline_metrics.stage('download_index'):
+        year_folder, txt_files = download_and_extract_year_data(target_year)
     
     if not year_folder or not txt_files:
         print(f"❌ Failed to download data or no TXT files found for {target_year}")
@@ -278,43 +183,34 @@ if __name__ == '__main__':
     
     # Step 2: Download PDFs from TXT file entries
     print(f"\n📄 Step 2: Downloading PDFs from TXT file entries...")
-    new_files = download_pdfs_from_txt(year_folder, txt_files, target_year)
+    with pipeline_metrics.stage('download_pdfs'):
+        new_files = download_pdfs_from_txt(year_folder, txt_files, target_year)
     
     if new_files == 0:
         print(f"ℹ️ No new PDFs downloaded for {target_year}")
     
-    # Step 3: Process year-specific data
-    print(f"\n🔄 Step 3: Processing {target_year} trading data...")
-    year_trades = process_year_data(target_year)
+    # Step 3: Parse the year's PDFs into the cumulative multi-year trade store.
+    # Every disclosure is upserted, so re-parsed or corrected filings replace their rows;
+    # only the disclosures whose rows changed are written, and the cube follows them.
+    print(f"\n🔄 Step 3: Processing {target_year} trading data into the trade store...")
+    with pipeline_metrics.stage('parse_pdfs'):
+        stored = process_year_data(target_year)
     
-    if year_trades is None or year_trades.empty:
+    if stored is None:
         print(f"❌ No trading data found for {target_year}")
         sys.exit(1)
     
-    # Step 4: Add ticker symbols
-    print(f"\n🏷️ Step 4: Adding ticker symbols...")
-    trades_with_tickers = load_trades.add_tickers(year_trades)
-    
-    # Step 5: Save year-specific dataset
-    print(f"\n💾 Step 5: Saving {target_year} dataset...")
     year_output_path = os.path.join('stock_purchases', f'trades_{target_year}.csv')
-    trades_with_tickers.to_csv(year_output_path, index=False)
-    
-    print(f"✅ Saved {len(trades_with_tickers)} trading records to {year_output_path}")
-    
-    # Step 6: Create year-specific all_purchases file
-    print(f"\n💾 Step 6: Creating year-specific all_purchases file...")
-    year_all_purchases_path = os.path.join('stock_purchases', 'all_purchases')
-    trades_with_tickers.to_csv(year_all_purchases_path, index=False)
-    
-    print(f"✅ Created all_purchases file with {len(trades_with_tickers)} records for {target_year}")
-    print(f"📁 Year-specific all_purchases: {year_all_purchases_path}")
+    print(f"✅ Upserted {len(stored.changed)} new or changed disclosures into {trade_store.TRADE_STORE}")
+    if stored.removed:
+        print(f"✂️ Removed {len(stored.removed)} disclosures replaced by amendments")
+    print(f"🧊 Updated {stored.cube_rows} aggregate rows in {trade_cube.CUBE_DB}")
     
     print(f"\n🎉 PROCESSING COMPLETE FOR {target_year}!")
     print(f"📁 Year-specific CSV: {year_output_path}")
-    print(f"📁 Year-specific all_purchases: stock_purchases/all_purchases")
-    print(f"\n💡 The all_purchases file now contains only {target_year} data")
-    print(f"💡 Use the exploration notebook to analyze this year's data")
+    print(f"📁 Cumulative trade store: {trade_store.TRADE_STORE}")
+    print(f"\n💡 The trade store holds every year processed so far, load it with trade_store.read_trades()")
+    print(f"💡 Use the exploration notebook to analyze the data")
     
     # Processing complete - no additional daily updates needed
     # The year-specific processing above already handles all PDF downloads and processing
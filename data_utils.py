@@ -4,21 +4,40 @@ load_dotenv()
 bot_token = os.getenv("bot_token")
 my_channel_id = os.getenv('my_channel_id')
 
+# Number of processes used to parse PDFs, defaults to one per core
+parse_workers = int(os.getenv('parse_workers') or os.cpu_count() or 1)
 
+# PDF extractors tried in order by read_pdf, comma separated: 'text' reads the
+# page text only and is much faster, 'table' is the pdfplumber table extraction
+pdf_extractors = tuple((os.getenv('pdf_extractors') or 'text,table').replace(' ', '').split(','))
 
-formatted_invested_amount_dict = {
-   '$1,001': '1001-15000',
-   '\$1,001': '1001-15000',
-    '$15,001': '15001-50000',
-    '\$15,001': '15001-50000',
-    '$50,001': '50001-100000',
-    '\$50,001': '50001-100000',
-    '$100,001': '100001-250000',
-    '\$100,001': '100001-250000',
-    '$250,001': '250001-500000',
-    '\$250,001': '250001-500000',
-    '$500,001': '500001-1000000',
-    '\$500,001': '500001-1000000',
-    '$1,000,001': '1000001-5000000',
-    '\$1,000,001': '1000001-5000000'
-}
\ No newline at end of file
+# Parallel PDF downloads and the shared request rate limit (requests per second)
+download_concurrency = int(os.getenv('download_concurrency') or 8)
+download_rate = float(os.getenv('download_rate') or 5)
+
+# FD index filing types to download, comma separated. P (periodic transaction
+# reports) is the only type the strategy parses, e.g. 'P,O,A' adds annual reports
+download_filing_types = tuple((os.getenv('download_filing_types') or 'P').replace(' ', '').split(','))
+
+# Days a ticker the price provider had no data for (delisted, unknown) is not asked for again
+price_negative_ttl_days = float(os.getenv('price_negative_ttl_days') or 7)
+# Hours before sessions the price provider had not published yet are asked for again
+price_lag_ttl_hours = float(os.getenv('price_lag_ttl_hours') or 12)
+
+# Price downloads: tickers per multi-ticker request and requests running at once
+price_batch_size = int(os.getenv('price_batch_size') or 50)
+price_concurrency = int(os.getenv('price_concurrency') or 4)
+
+# Number of processes backtesting strategy variants in strategy_sweep, defaults to one per core
+sweep_workers = int(os.getenv('sweep_workers') or os.cpu_count() or 1)
+
+# Root of the clerk's public disclosure files (ptr-pdfs/, financial-pdfs/), e.g. the
+# address of a local clerk_server.py for load tests
+clerk_base_url = (os.getenv('clerk_base_url') or 'https://disclosures-clerk.house.gov/public_disc').rstrip('/')
+
+# Seconds one PDF may take to parse before its worker process is killed and the
+# document quarantined (see load_trades.parse_pdfs), 0 for no limit
+parse_timeout = float(os.getenv('parse_timeout') or 120)
+
+# Number of slowest documents listed in the report printed after every bulk parse
+slow_report_size = int(os.getenv('slow_report_size') or 10)
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import fd_index
+from data_utils import download_filing_types
+
+
+# Durable record of every disclosure seen in the FD index, keyed by DocID.
+# Each row remembers when the disclosure was first seen and how far it went
+# through the pipeline (download, then parse), so change detection does not
+# depend on yesterday's extracted index still being around, a missed day or
+# a crash never re-announces old filings, and unfinished work is picked up
+# again on the next run.
+#
+# parse_status of a downloaded PTR goes from 'pending' to 'parsed' once its
+# trades are in the trade store, or to 'empty', 'failed' or 'quarantined' when
+# iter_trades gets no trades out of it. pending_parses() is what is left to
+# parse, with the path each PTR was downloaded to.
+
+STATE_DB = os.path.join('financial_disclosures', 'disclosure_state.db')
+MAX_DOWNLOAD_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS disclosures (
+    doc_id TEXT PRIMARY KEY,
+    year INTEGER NOT NULL,
+    prefix TEXT, last TEXT, first TEXT, suffix TEXT,
+    filing_type TEXT, state_district TEXT, filing_year TEXT, filing_date TEXT,
+    first_seen TEXT NOT NULL,
+    download_status TEXT NOT NULL DEFAULT 'pending',
+    download_attempts INTEGER NOT NULL DEFAULT 0,
+    parse_status TEXT NOT NULL DEFAULT 'pending',
+    updated_at TEXT,
+    path TEXT
+);
+CREATE INDEX IF NOT EXISTS disclosures_first_seen ON disclosures (first_seen);
+CREATE INDEX IF NOT EXISTS disclosures_download_status ON disclosures (download_status);
+"""
+
+_ENTRY_COLUMNS = 'prefix, last, first, suffix, filing_type, state_district, filing_year, filing_date, doc_id'
+# Columns added after the first release, created on databases that predate them
+_ADDED_COLUMNS = {'path': 'TEXT'}
+
+
+def connect(path=STATE_DB):
+    """Open (and create if needed) the state database"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(disclosures)')}
+    for column, column_type in _ADDED_COLUMNS.items():
+        if column not in columns:
+            conn.execute(f'ALTER TABLE disclosures ADD COLUMN {column} {column_type}')
+    return conn
+
+
+def _now():
+    return datetime.now().isoformat(timespec='microseconds')
+
+
+def record_entries(conn, entries, year):
+    """Record FD index entries, returning only the ones never seen before.
+
+    Known DocIDs are ignored by the primary key, so feeding the same index
+    twice, or after a gap of several days, only ever returns genuinely new filings.
+    """
+    seen_at = _now()
+    with conn:
+        conn.executemany(
+            f'INSERT OR IGNORE INTO disclosures (year, first_seen, {_ENTRY_COLUMNS}) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            ((year, seen_at) + tuple(entry) for entry in entries))
+    rows = conn.execute(f'SELECT {_ENTRY_COLUMNS} FROM disclosures WHERE first_seen = ? ORDER BY doc_id',
+                        (seen_at,))
+    return [fd_index.FDEntry(*row) for row in rows]
+
+
+def pending_downloads(conn, filing_types=None, year=None):
+    """Disclosures still to download: never tried, or failed fewer than MAX_DOWNLOAD_ATTEMPTS times.
+    Only the wanted filing types are returned, PTRs by default (see fd_index)."""
+    filing_types = download_filing_types if filing_types is None else filing_types
+    if not filing_types:
+        return []
+    query = (f'SELECT {_ENTRY_COLUMNS} FROM disclosures '
+             "WHERE download_status IN ('pending', 'failed') AND download_attempts < ? "
+             f"AND filing_type IN ({', '.join('?' * len(filing_types))})")
+    params = [MAX_DOWNLOAD_ATTEMPTS, *filing_types]
+    if year is not None:
+        query += ' AND year = ?'
+        params.append(year)
+    rows = conn.execute(query + ' ORDER BY first_seen, doc_id', params)
+    return [fd_index.FDEntry(*row) for row in rows]
+
+
+def pending_parses(conn, year=None):
+    """(doc_id, path) of the PTRs downloaded but not parsed yet"""
+    query = ("SELECT doc_id, path FROM disclosures WHERE download_status = 'downloaded' "
+             "AND parse_status = 'pending' AND filing_type = ? AND path IS NOT NULL")
+    params = [fd_index.PTR_FILING_TYPE]
+    if year is not None:
+        query += ' AND year = ?'
+        params.append(year)
+    return list(conn.execute(query + ' ORDER BY doc_id', params))
+
+
+def mark_downloaded(conn, doc_id, success=True, path=None):
+    with conn:
+        conn.execute('UPDATE disclosures SET download_status = ?, download_attempts = download_attempts + 1, '
+                     'path = COALESCE(?, path), updated_at = ? WHERE doc_id = ?',
+                     ('downloaded' if success else 'failed', path, _now(), doc_id))
+
+
+def mark_parsed(conn, doc_ids, status='parsed'):
+    with conn:
+        conn.executemany('UPDATE disclosures SET parse_status = ?, updated_at = ? WHERE doc_id = ?',
+                         ((status, _now(), doc_id) for doc_id in doc_ids))
+
+
+def record_parse_status(doc_ids, status, path=STATE_DB):
+    """mark_parsed on the state database at path, if there is one (the yearly
+    daily_run never goes through compare_dates and has no state to update)"""
+    doc_ids = list(doc_ids)
+    if not doc_ids or not os.path.exists(path):
+        return
+    conn = connect(path)
+    try:
+        mark_parsed(conn, doc_ids, status)
+    finally:
+        conn.close()
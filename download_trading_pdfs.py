@@ -15,7 +15,9 @@ import os
 import requests
 import pandas as pd
 from datetime import datetime
-import time
+
+import fd_index
+import pdf_downloader
 
 def download_trading_pdfs_for_year(target_year):
     """Download actual trading PDFs for a specific year"""
@@ -30,7 +32,7 @@ def download_trading_pdfs_for_year(target_year):
         print(f"📁 Created folder: {year_folder}")
     
     # First, get the summary file to extract disclosure IDs
-    summary_url = f"https://disclosures-clerk.house.gov/public_disc/financial-pdfs/{target_year}FD.txt"
+    summary_url = f"{fd_index.FINANCIAL_PDFS_URL}/{target_year}FD.txt"
     
     print(f"📋 Downloading {target_year} summary file...")
     
@@ -40,41 +42,27 @@ def download_trading_pdfs_for_year(target_year):
             print(f"❌ Failed to download summary file: HTTP {response.status_code}")
             return False
         
-        # Parse the summary file to get disclosure IDs
+        # Parse the summary file to get disclosure IDs and filing types
         summary_content = response.text
         lines = summary_content.strip().split('\n')
+        entries = [entry for entry in map(fd_index.parse_fd_line, lines) if entry is not None]
         
-        print(f"📊 Found {len(lines)} disclosure entries")
+        print(f"📊 Found {len(entries)} disclosure entries")
         
-        # Extract disclosure IDs and representative names
-        disclosure_data = []
-        for line in lines[1:]:  # Skip header
-            parts = line.split('\t')
-            if len(parts) >= 9:  # Ensure we have enough columns
-                disclosure_id = parts[8].strip()
-                first_name = parts[0].strip()
-                last_name = parts[1].strip()
-                full_name = f"{last_name}{first_name}"
-                disclosure_data.append((disclosure_id, full_name))
+        # Only keep the filing types we parse (PTRs unless configured otherwise)
+        selected_entries = fd_index.select_entries(entries)
         
-        print(f"🎯 Attempting to download {len(disclosure_data)} individual PDFs...")
+        print(f"🎯 Attempting to download {len(selected_entries)} individual PDFs...")
         
-        successful_downloads = 0
-        failed_downloads = 0
+        # Downloads run concurrently, throttled by the shared rate limit to be respectful to the server
+        jobs = [pdf_downloader.DownloadJob(entry.doc_id,
+                                           [fd_index.document_url(entry, target_year)],
+                                           os.path.join(year_folder, fd_index.pdf_file_name(entry)))
+                for entry in selected_entries]
+        results = pdf_downloader.download_pdfs(jobs, skip_existing=False)
         
-        for i, (disclosure_id, full_name) in enumerate(disclosure_data):
-            if i % 10 == 0:
-                print(f"   ⏳ Progress: {i}/{len(disclosure_data)} PDFs...")
-            
-            # Try to download the PDF
-            success = download_individual_pdf(disclosure_id, full_name, target_year, year_folder)
-            if success:
-                successful_downloads += 1
-            else:
-                failed_downloads += 1
-            
-            # Small delay to be respectful to the server
-            time.sleep(0.5)
+        successful_downloads = sum(result.status == 'downloaded' for result in results)
+        failed_downloads = sum(result.status == 'failed' for result in results)
         
         print(f"\n📊 DOWNLOAD SUMMARY:")
         print(f"   ✅ Successful: {successful_downloads} PDFs")
@@ -93,33 +81,6 @@ def download_trading_pdfs_for_year(target_year):
         print(f"❌ Error downloading summary file: {e}")
         return False
 
-def download_individual_pdf(disclosure_id, full_name, year, year_folder):
-    """Download an individual congressional trading PDF"""
-    
-    # Try both PTR and financial disclosure URLs
-    urls_to_try = [
-        f'https://disclosures-clerk.house.gov/public_disc/ptr-pdfs/{year}/{disclosure_id}.pdf',
-        f'https://disclosures-clerk.house.gov/public_disc/financial-pdfs/{year}/{disclosure_id}.pdf'
-    ]
-    
-    for url in urls_to_try:
-        try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                # Save the PDF
-                filename = f"{full_name}_{disclosure_id}.pdf"
-                filepath = os.path.join(year_folder, filename)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                return True
-                
-        except Exception:
-            continue
-    
-    return False
-
 def main():
     """Main function to handle command line arguments"""
     
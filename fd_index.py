@@ -0,0 +1,100 @@
+import io
+import os
+import shutil
+import zipfile
+from collections import namedtuple
+
+from data_utils import clerk_base_url, download_filing_types
+
+
+# Reads the yearly {year}FD.txt index published by the disclosures-clerk website
+# and routes each document straight to the URL it lives at, based on its
+# FilingType, instead of probing both URL trees for every DocID.
+#
+# Columns of the tab separated index:
+# Prefix  Last  First  Suffix  FilingType  StateDst  Year  FilingDate  DocID
+#
+# FilingType 'P' is a periodic transaction report (the stock trades we parse),
+# stored under ptr-pdfs/. Every other type (annual reports, amendments,
+# candidate reports, extensions...) is stored under financial-pdfs/.
+
+# The clerk website by default, see the clerk_base_url setting
+BASE_URL = clerk_base_url
+PTR_PDFS_URL = f'{BASE_URL}/ptr-pdfs'
+FINANCIAL_PDFS_URL = f'{BASE_URL}/financial-pdfs'
+
+PTR_FILING_TYPE = 'P'
+
+FDEntry = namedtuple('FDEntry', ['prefix', 'last', 'first', 'suffix', 'filing_type',
+                                 'state_district', 'year', 'filing_date', 'doc_id'])
+
+
+def parse_fd_line(line):
+    """Parse one tab separated line of the index, None for the header or malformed lines"""
+    fields = [field.strip() for field in line.rstrip('\r\n').split('\t')]
+    if len(fields) < 9 or fields[8] in ('', 'DocID'):
+        return None
+    return FDEntry(*fields[:9])
+
+
+def read_fd_index(path):
+    """All entries of a {year}FD.txt file"""
+    with open(path, 'r', encoding='utf-8-sig') as txt_file:
+        return [entry for entry in map(parse_fd_line, txt_file) if entry is not None]
+
+
+def index_member_name(zip_file, suffix='.txt'):
+    """Name of the {year}FD.txt (or .xml) member of an opened FD.zip"""
+    for name in zip_file.namelist():
+        if name.lower().endswith(suffix):
+            return name
+    raise KeyError(f'No {suffix} member in the archive')
+
+
+def extract_index(zip_path, folder, suffix='.txt'):
+    """Extract only the index member of an FD.zip into folder, returning the extracted file name.
+    The member is copied in chunks, the rest of the archive is never read."""
+    os.makedirs(folder, exist_ok=True)
+    with zipfile.ZipFile(zip_path) as zip_file:
+        member = index_member_name(zip_file, suffix)
+        file_name = os.path.basename(member)
+        tmp_path = os.path.join(folder, file_name + '.tmp')
+        with zip_file.open(member) as source, open(tmp_path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        os.replace(tmp_path, os.path.join(folder, file_name))
+    return file_name
+
+
+def iter_zip_index(zip_path):
+    """Yield the entries of the index straight out of an FD.zip, without extracting anything"""
+    with zipfile.ZipFile(zip_path) as zip_file:
+        with zip_file.open(index_member_name(zip_file)) as member:
+            for line in io.TextIOWrapper(member, encoding='utf-8-sig'):
+                entry = parse_fd_line(line)
+                if entry is not None:
+                    yield entry
+
+
+def full_name(entry):
+    """Last + first name, as used in PDF file names"""
+    return (entry.last + entry.first).replace('"', '')
+
+
+def pdf_file_name(entry):
+    return f'{full_name(entry)}_{entry.doc_id}.pdf'
+
+
+def is_ptr(entry):
+    return entry.filing_type == PTR_FILING_TYPE
+
+
+def document_url(entry, year):
+    base_url = PTR_PDFS_URL if is_ptr(entry) else FINANCIAL_PDFS_URL
+    return f'{base_url}/{year}/{entry.doc_id}.pdf'
+
+
+def select_entries(entries, filing_types=None):
+    """Keep the entries of the wanted filing types, the download_filing_types setting by default (PTRs only)"""
+    filing_types = download_filing_types if filing_types is None else filing_types
+    return [entry for entry in entries if entry.filing_type in filing_types]
+
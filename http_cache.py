@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+
+import requests
+import pipeline_metrics
+
+
+# Small HTTP cache for files that are re-polled but rarely change, like the
+# yearly {year}FD.zip index. The body is kept on disk together with the ETag
+# and Last-Modified headers of the response, which are sent back as
+# If-None-Match / If-Modified-Since on the next request. When the server
+# answers 304 Not Modified nothing is downloaded.
+#
+# One cache entry is shared by every caller of the same URL, so a 304 only
+# means the body did not change since some caller downloaded it, not that this
+# caller has seen it. Callers always process the cached body at path, on a 304
+# as well as on a 200, and keep that processing idempotent.
+
+CACHE_FOLDER = os.path.join('cache', 'http')
+CHUNK_SIZE = 1024 * 1024
+
+# path is the cached body on disk (None if there is none),
+# changed is True only when a new body was downloaded by this request
+CachedResponse = namedtuple('CachedResponse', ['status_code', 'path', 'changed'])
+
+
+def _cache_key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+
+
+def _metadata_path(url, cache_folder):
+    return os.path.join(cache_folder, _cache_key(url) + '.json')
+
+
+def body_path(url, cache_folder=CACHE_FOLDER):
+    """Where the cached body of url is stored"""
+    return os.path.join(cache_folder, _cache_key(url) + '.body')
+
+
+def load_metadata(url, cache_folder=CACHE_FOLDER):
+    path = _metadata_path(url, cache_folder)
+    if not os.path.exists(path) or not os.path.exists(body_path(url, cache_folder)):
+        return {}
+    with open(path, 'r', encoding='utf-8') as metadata_file:
+        return json.load(metadata_file)
+
+
+def _save_metadata(url, response, cache_folder):
+    metadata = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+    tmp_path = _metadata_path(url, cache_folder) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as metadata_file:
+        json.dump(metadata, metadata_file)
+    os.replace(tmp_path, _metadata_path(url, cache_folder))
+
+
+def conditional_headers(metadata):
+    headers = {}
+    if metadata.get('etag'):
+        headers['If-None-Match'] = metadata['etag']
+    if metadata.get('last_modified'):
+        headers['If-Modified-Since'] = metadata['last_modified']
+    return headers
+
+
+def conditional_get(url, cache_folder=CACHE_FOLDER, timeout=30):
+    """GET url, revalidating the cached copy if there is one.
+
+    Returns a CachedResponse: on 200 the new body is cached and changed is True,
+    on 304 the cached body is reused and changed is False. Either way the caller
+    processes the body at path, which another caller may have downloaded. Any
+    other status leaves the cache untouched. Network errors are raised as
+    requests exceptions.
+    """
+    os.makedirs(cache_folder, exist_ok=True)
+    metadata = load_metadata(url, cache_folder)
+    cached_body = body_path(url, cache_folder)
+
+    start = time.perf_counter()
+    with requests.get(url, headers=conditional_headers(metadata), timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and metadata:
+            pipeline_metrics.record_request(time.perf_counter() - start, 304)
+            return CachedResponse(304, cached_body, False)
+
+        if response.status_code != 200:
+            pipeline_metrics.record_request(time.perf_counter() - start, response.status_code)
+            return CachedResponse(response.status_code, cached_body if metadata else None, False)
+
+        # Stream the body to disk in chunks rather than holding it all in memory
+        n_bytes = 0
+        tmp_path = cached_body + '.tmp'
+        with open(tmp_path, 'wb') as body_file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                body_file.write(chunk)
+                n_bytes += len(chunk)
+        os.replace(tmp_path, cached_body)
+        _save_metadata(url, response, cache_folder)
+        pipeline_metrics.record_request(time.perf_counter() - start, 200, n_bytes)
+
+    return CachedResponse(200, cached_body, True)
@@ -0,0 +1,219 @@
+import json
+import os
+from collections import defaultdict
+
+import pandas as pd
+from amount_codec import amount_midpoint
+from backtest import RESULT_COLUMNS
+from disclosure_state import STATE_DB
+from price_store import NOT_TRADABLE, PRICE_STORE, last_complete_session, read_bars, update_prices
+from trade_store import TRADE_STORE, read_trades, stored_disclosure_ids
+
+
+# The strategy run forward one day at a time, without replaying its history.
+# The portfolio state is a small JSON file:
+#
+#   cash, holdings         ticker -> shares held since the last rebalance
+#   last_prices            ticker -> last known close of every held or pending ticker
+#   last_price_date        last trading day processed
+#   pending                week -> ticker -> amount bought by representatives,
+#                          for the buys disclosed that week
+#   applied_disclosures    disclosure ids whose buys were already added (a new
+#                          state starts with everything stored so far)
+#
+# New disclosures are the ones of the trade store not applied yet, so filings
+# stored by any run (daily_run, an earlier daily_update that crashed before
+# saving the state) are picked up. Each update adds their buys to the pending
+# weights of the current week, then walks the price bars newer than last_price_date. As
+# in the backtest (and the README: week 1 disclosures, week 2 rebalance), the
+# first trading day of a later week sells everything and buys the pending
+# weights, in proportion to the mid-point amounts. Each processed day appends
+# one row to the history CSV.
+#
+# Only the disclosure ids of the store, the new trades and the newest bars of
+# the tickers held or pending are read, so a daily update costs
+# O(disclosures + new trades + tickers held), not O(trade and price history).
+
+PORTFOLIO_STATE = os.path.join('cache', 'live_portfolio.json')
+PORTFOLIO_HISTORY = os.path.join('cache', 'live_portfolio_history.csv')
+HISTORY_COLUMNS = RESULT_COLUMNS + ['rebalanced']
+
+
+def new_state(initial_capital=100000, start_date=None, applied_disclosures=()):
+    """Empty portfolio, in cash, whose first processed trading day is after start_date (default today).
+    The buys of applied_disclosures are never added."""
+    start = pd.Timestamp(start_date or pd.Timestamp.today()).normalize()
+    return {
+        'initial_capital': float(initial_capital),
+        'cash': float(initial_capital),
+        'holdings': {},
+        'last_prices': {},
+        'last_price_date': str(start.date()),
+        'pending': {},
+        'applied_disclosures': sorted(applied_disclosures),
+    }
+
+
+def load_state(path=PORTFOLIO_STATE, initial_capital=100000, trade_root=TRADE_STORE):
+    """The saved state, or a new one that leaves out the disclosures already in the trade store"""
+    if not os.path.exists(path):
+        return new_state(initial_capital, applied_disclosures=stored_disclosure_ids(trade_root))
+    with open(path, 'r', encoding='utf-8') as state_file:
+        state = json.load(state_file)
+    if 'applied_disclosures' not in state:
+        # Saved before disclosures were tracked, whatever is stored was seen already
+        state['applied_disclosures'] = sorted(stored_disclosure_ids(trade_root))
+    return state
+
+
+def save_state(state, path=PORTFOLIO_STATE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def add_disclosed_buys(state, trades_df, as_of=None):
+    """Add the buys of newly disclosed trades to the pending weights of the as_of week.
+    Returns the number of buys added."""
+    if trades_df.empty:
+        return 0
+    buys = trades_df[trades_df['buy_sell_flag'].str.strip().str.contains('P', na=False)]
+    buys = buys[buys['ticker'].notna() & ~buys['ticker'].isin(NOT_TRADABLE)]
+    amounts = amount_midpoint(buys).groupby(buys['ticker']).sum()
+
+    week = str(pd.Timestamp(as_of or pd.Timestamp.today()).to_period('W'))
+    pending = state['pending'].setdefault(week, {})
+    for ticker, amount in amounts.items():
+        pending[ticker] = pending.get(ticker, 0.0) + float(amount)
+    return len(buys)
+
+
+def _rebalance(state, date):
+    """Sell everything priced and buy the pending weights of the weeks before date's week"""
+    week = pd.Timestamp(date).to_period('W')
+    due = [pending_week for pending_week in state['pending'] if pd.Period(pending_week, 'W') < week]
+    if not due:
+        return False
+    amounts = defaultdict(float)
+    for pending_week in due:
+        for ticker, amount in state['pending'].pop(pending_week).items():
+            amounts[ticker] += amount
+
+    prices = state['last_prices']
+    holdings = state['holdings']
+    total_value = state['cash'] + sum(shares * prices[ticker] for ticker, shares in holdings.items() if ticker in prices)
+    for ticker in [ticker for ticker in holdings if ticker in prices]:
+        state['cash'] += holdings.pop(ticker) * prices[ticker]
+
+    total_amount = sum(amounts.values())
+    for ticker, amount in amounts.items():
+        if ticker in prices and amount > 0:
+            target_value = total_value * amount / total_amount
+            holdings[ticker] = holdings.get(ticker, 0.0) + target_value / prices[ticker]
+            state['cash'] -= target_value
+    return True
+
+
+def apply_new_bars(state, store=PRICE_STORE, provider=None, end_date=None, history_path=PORTFOLIO_HISTORY):
+    """Bring the store up to date for held and pending tickers after last_price_date,
+    then process every new trading day up to the last complete session (today's bar is
+    processed on the next update, once final). Returns the history rows of those days."""
+    start = pd.Timestamp(state['last_price_date']) + pd.Timedelta(days=1)
+    end = min(pd.Timestamp(end_date or pd.Timestamp.today()).normalize(), last_complete_session())
+    tickers = set(state['holdings'])
+    for pending in state['pending'].values():
+        tickers.update(pending)
+    if start > end or not tickers:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    available = update_prices(tickers, start, end, store, provider)
+    closes = {ticker: read_bars(ticker, store, ['Close'], start)['Close'].loc[:end] for ticker in available}
+    closes = {ticker: prices for ticker, prices in closes.items() if not prices.empty}
+    if not closes:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    new_bars = pd.concat(closes, axis=1).sort_index()
+
+    rows = []
+    for date, bar in new_bars.iterrows():
+        state['last_prices'].update(bar.dropna().to_dict())
+        rebalanced = _rebalance(state, date)
+        prices = state['last_prices']
+        positions_value = sum(shares * prices[ticker] for ticker, shares in state['holdings'].items()
+                              if ticker in prices)
+        portfolio_value = state['cash'] + positions_value
+        rows.append({'date': date, 'portfolio_value': portfolio_value, 'cash': state['cash'],
+                     'positions_value': positions_value,
+                     'total_return_pct': (portfolio_value / state['initial_capital'] - 1) * 100,
+                     'rebalanced': rebalanced})
+        state['last_price_date'] = str(date.date())
+
+    # Prices of tickers neither held nor pending any more are not needed
+    needed = set(state['holdings']).union(*state['pending'].values())
+    state['last_prices'] = {ticker: price for ticker, price in state['last_prices'].items() if ticker in needed}
+
+    history_df = pd.DataFrame(rows).set_index('date')
+    if history_path:
+        os.makedirs(os.path.dirname(history_path) or '.', exist_ok=True)
+        history_df.to_csv(history_path, mode='a', header=not os.path.exists(history_path))
+    return history_df
+
+
+def add_new_disclosures(state, as_of=None, trade_root=TRADE_STORE):
+    """Add the buys of the stored disclosures the state has not applied yet. Returns the number of buys added."""
+    new_ids = stored_disclosure_ids(trade_root) - set(state['applied_disclosures'])
+    if not new_ids:
+        return 0
+    n_buys = add_disclosed_buys(state, read_trades(trade_root, categorical=False, disclosure_ids=new_ids), as_of)
+    state['applied_disclosures'] = sorted(set(state['applied_disclosures']) | new_ids)
+    return n_buys
+
+
+def update_portfolio(state_path=PORTFOLIO_STATE, store=PRICE_STORE, provider=None, as_of=None,
+                     history_path=PORTFOLIO_HISTORY, trade_root=TRADE_STORE):
+    """One daily step: add the buys of the new disclosures of the trade store, process the new
+    price bars, save the state"""
+    state = load_state(state_path, trade_root=trade_root)
+    n_buys = add_new_disclosures(state, as_of, trade_root)
+    history_df = apply_new_bars(state, store, provider, as_of, history_path)
+    save_state(state, state_path)
+
+    print(f"📬 {n_buys} new buys pending, {len(history_df)} new trading days processed")
+    if not history_df.empty:
+        last = history_df.iloc[-1]
+        print(f"💼 Portfolio on {history_df.index[-1].date()}: ${last['portfolio_value']:,.2f} "
+              f"({last['total_return_pct']:.2f}%), {len(state['holdings'])} positions, ${state['cash']:,.2f} cash")
+    return state
+
+
+def daily_update(filing_types=None, state_path=PORTFOLIO_STATE, state_db=STATE_DB):
+    """Find today's new disclosures, download them, parse every PTR still pending in the disclosure
+    state into the trade store, and update the live portfolio with the stored disclosures it has
+    not applied yet. Each step starts from what the previous ones left on disk, so filings
+    downloaded by another run or left over by a crash are picked up on the next update."""
+    import compare_dates
+    import disclosure_state
+    import load_trades
+
+    if not os.path.exists(state_path):
+        # Saved before anything is parsed, so today's filings count as new
+        save_state(load_state(state_path), state_path)
+
+    messages_list, new_entries_list = compare_dates.compare_today_yesterday(state_db)
+    compare_dates.download_pending(filing_types, state_db)
+    conn = disclosure_state.connect(state_db)
+    try:
+        pending = disclosure_state.pending_parses(conn)
+    finally:
+        conn.close()
+    ptr_paths = [path for doc_id, path in pending if os.path.exists(path)]
+    stored = load_trades.store_trades(load_trades.iter_trades(ptr_paths, state_db=state_db), state_db=state_db)
+    print(f"💾 Stored {stored.rows} trades from {stored.pdfs} of {len(ptr_paths)} pending PTRs")
+    for message in messages_list:
+        print(message)
+    return update_portfolio(state_path)
+
+
+if __name__ == '__main__':
+    daily_update()
@@ -1,14 +1,349 @@
 import glob
+import multiprocessing
 import os
+import time
+from collections import Counter, defaultdict, namedtuple
+from multiprocessing.connection import wait
+
 import pandas as pd
-from read_pdf import read_pdf
-from data_utils import formatted_invested_amount_dict
+import pdfplumber
+import pipeline_metrics
+import trade_cube
+import trade_store
+from disclosure_state import STATE_DB, record_parse_status
+from pdf_triage import QuarantinedPDF, add_to_quarantine, read_triaged_pdf, skip_quarantined
+from parse_cache import cached_read_pdf, evict_cache
+from read_pdf import page_count
+from ticker_resolver import get_resolver
+from amount_codec import decode_amounts
+from data_utils import parse_timeout, parse_workers, slow_report_size
+from trade_cube import CUBE_DB
+from trade_store import TRADE_STORE
+
+# The slowest documents of the last bulk parse, see iter_trades
+SLOW_DOCUMENTS_REPORT = os.path.join('cache', 'slow_documents.csv')
+SLOW_REPORT_COLUMNS = ['file_name', 'seconds', 'pages', 'seconds_per_page', 'status']
+# What store_trades wrote: PDFs with trades, rows stored, disclosures new or changed and removed
+# (replaced by amendments), and cube rows recomputed
+StoredTrades = namedtuple('StoredTrades', ['pdfs', 'rows', 'changed', 'removed', 'cube_rows'])
+
+
+def get_representative_name(path):
+    """Representative name is the part of the PDF file name before the disclosure id"""
+    return os.path.basename(path).split(sep='_')[0]
+
+
+def get_disclosure_id(path):
+    """Disclosure id is the part of the PDF file name after the last underscore"""
+    return os.path.splitext(os.path.basename(path))[0].split(sep='_')[-1]
+
+
+def _parse_one_pdf(path, use_cache=True):
+    """Parse a single PDF, catching errors so one bad file never takes down the pool.
+    Returns (path, trades_df, error, seconds spent)."""
+    start = time.perf_counter()
+    try:
+        df = cached_read_pdf(path, reader=read_triaged_pdf) if use_cache else read_triaged_pdf(path)
+        return path, df, None, time.perf_counter() - start
+    except Exception as e:
+        return path, None, e, time.perf_counter() - start
+
+
+def _budget_worker(conn, use_cache):
+    """Parse the paths received on conn one by one, until None is received"""
+    for path in iter(conn.recv, None):
+        conn.send(_parse_one_pdf(path, use_cache))
+
+
+def _pdf_pages(path):
+    try:
+        with pdfplumber.open(path) as pdf:
+            return page_count(pdf)
+    except Exception:
+        return None
+
+
+def _parse_in_workers(paths, workers, budget, use_cache):
+    """parse_pdfs over worker processes, killed when a document takes more than budget seconds
+    (no limit if budget is 0).
+
+    Each worker gets one document at a time through its own pipe, so the one running
+    over budget is known, terminated and replaced by a fresh process; the document is
+    reported as a QuarantinedPDF with a 'timeout' reason. A worker that dies is replaced
+    the same way. Results are yielded in the order of paths, with at most 4 documents
+    per worker dispatched ahead of the next one to yield, so memory stays flat however
+    many paths are given.
+    """
+    def start_worker():
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_budget_worker, args=(child_conn, use_cache), daemon=True)
+        process.start()
+        child_conn.close()
+        return parent_conn, process
+
+    idle = [start_worker() for _ in range(min(workers, len(paths)))]
+    busy = {}  # conn -> (process, index of the path, start time)
+    results = {}
+    next_index = next_yield = 0
+    try:
+        while next_yield < len(paths):
+            while idle and next_index < min(len(paths), next_yield + 4 * workers):
+                conn, process = idle.pop()
+                conn.send(paths[next_index])
+                busy[conn] = (process, next_index, time.perf_counter())
+                next_index += 1
+
+            while next_yield in results:
+                yield results.pop(next_yield)
+                next_yield += 1
+            if not busy:
+                continue
+
+            timeout = None
+            if budget:
+                deadline = min(start for _, _, start in busy.values()) + budget
+                timeout = max(0.0, deadline - time.perf_counter())
+            for conn in wait(list(busy), timeout=timeout):
+                process, index, start = busy.pop(conn)
+                try:
+                    results[index] = conn.recv()
+                    idle.append((conn, process))
+                except EOFError:
+                    # The worker died (segfault, out of memory), replace it
+                    results[index] = (paths[index], None, RuntimeError('parse worker died'),
+                                      time.perf_counter() - start)
+                    process.join()
+                    idle.append(start_worker())
+
+            now = time.perf_counter()
+            for conn, (process, index, start) in list(busy.items()):
+                if budget and now - start >= budget:
+                    process.terminate()
+                    process.join()
+                    conn.close()
+                    del busy[conn]
+                    error = QuarantinedPDF(f'timeout: parse over {budget:g}s', _pdf_pages(paths[index]))
+                    results[index] = (paths[index], None, error, now - start)
+                    idle.append(start_worker())
+    finally:
+        for conn, process in idle:
+            conn.send(None)
+        for conn, (process, _, _) in busy.items():
+            process.terminate()
+        for process in [process for _, process in idle] + [process for process, _, _ in busy.values()]:
+            process.join()
+
+
+def parse_pdfs(paths, workers=None, use_cache=True, budget=None):
+    """Yield (path, trades_df, error, seconds) for every PDF, in the same order as paths.
+
+    With workers > 1 the PDFs are spread over worker processes, pdfplumber being
+    CPU-bound; workers=None uses the parse_workers setting from data_utils.
+    Only a few PDFs per worker are in flight at once, so memory stays flat
+    however many paths are given. Unchanged PDFs are served from the parse
+    cache unless use_cache=False.
+
+    A document taking more than budget seconds (parse_timeout setting by default,
+    0 for no limit) has its worker killed and comes back with a QuarantinedPDF
+    'timeout' error, so one pathological PDF never stalls the run. The budget is
+    enforced with worker processes even when workers=1; with workers=1 and no
+    budget the PDFs are parsed in this process.
+    """
+    workers = parse_workers if workers is None else workers
+    budget = parse_timeout if budget is None else budget
+
+    if paths and (budget or (workers > 1 and len(paths) > 1)):
+        yield from _parse_in_workers(paths, max(workers, 1), budget, use_cache)
+    else:
+        for path in paths:
+            yield _parse_one_pdf(path, use_cache)
+
+    if use_cache:
+        evict_cache()
+
+
+def slow_documents(timings, n=None):
+    """The n slowest of the (path, seconds, pages, status) timings, as a frame of SLOW_REPORT_COLUMNS"""
+    n = slow_report_size if n is None else n
+    report = pd.DataFrame(timings, columns=['path', 'seconds', 'pages', 'status']).nlargest(n, 'seconds')
+    report['pages'] = pd.to_numeric(report['pages'])
+    report.insert(0, 'file_name', report.pop('path').map(os.path.basename))
+    report['seconds_per_page'] = report['seconds'] / report['pages'].where(report['pages'] > 0)
+    return report[SLOW_REPORT_COLUMNS].reset_index(drop=True)
+
+
+def report_slow_documents(timings, n=None, path=SLOW_DOCUMENTS_REPORT):
+    """Print the n slowest documents and write them to the slow documents report"""
+    report = slow_documents(timings, n)
+    if report.empty:
+        return report
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    report.to_csv(path, index=False)
+    print(f"   🐌 {len(report)} slowest PDFs (see {path}):")
+    for row in report.itertuples(index=False):
+        pages = '?' if pd.isna(row.pages) else int(row.pages)
+        per_page = '' if pd.isna(row.seconds_per_page) else f", {row.seconds_per_page:.2f}s/page"
+        print(f"      {row.file_name}: {row.seconds:.2f}s, {pages} pages{per_page} ({row.status})")
+    return report
+
+
+def iter_trades(paths, workers=None, use_cache=True, state_db=STATE_DB):
+    """Yield one trades DataFrame per parsed PDF, tagged with the representative name,
+    the disclosure id and the row position within the filing (together, a stable key
+    for each trade). PDFs that fail to parse are reported and skipped, and a count of
+    the read_pdf extractor that handled each document and the slowest documents (see
+    report_slow_documents) are printed at the end.
+
+    PDFs listed in the quarantine manifest are not opened at all, and the ones
+    failing triage (scanned, handwritten or malformed, see pdf_triage) or running
+    over the parse_timeout budget are added to it. PDFs, pages and trades parsed,
+    PDFs parsed by each extractor, PDFs served from the parse cache, the failures
+    by reason and the parse times are recorded in pipeline_metrics.
+
+    Disclosures without trades get their parse status recorded in the disclosure
+    state ('empty', 'failed' or 'quarantined'); the ones yielded are marked 'parsed'
+    by the caller once their trades are stored (see store_trades)."""
+    extractor_counts = Counter()
+    quarantined = []
+    parse_statuses = defaultdict(list)  # status -> disclosure ids
+    timings = []
+    kept_paths = skip_quarantined(paths)
+    pipeline_metrics.count('pdfs_skipped_quarantined', len(paths) - len(kept_paths))
+    try:
+        for path, df, error, seconds in parse_pdfs(kept_paths, workers=workers, use_cache=use_cache):
+            pipeline_metrics.observe('parse_seconds', seconds)
+            if isinstance(error, QuarantinedPDF):
+                timings.append((path, seconds, error.pages, f'quarantined: {error}'))
+                print(f"   🚧 Quarantined {path}: {error}")
+                quarantined.append((path, error))
+                parse_statuses['quarantined'].append(get_disclosure_id(path))
+                # 'malformed: PdfminerException' is counted as 'malformed', to keep the reasons few
+                pipeline_metrics.count('parse_failures', reason=error.reason.split(':')[0])
+                continue
+            if error is not None:
+                timings.append((path, seconds, None, f'error: {type(error).__name__}'))
+                print(f"   ⚠️ Error processing {path}: {error}")
+                pipeline_metrics.count('parse_failures', reason=type(error).__name__)
+                parse_statuses['failed'].append(get_disclosure_id(path))
+                continue
+            timings.append((path, seconds, df.attrs.get('pages'), 'cached' if df.attrs.get('cached') else 'parsed'))
+            extractor_counts[df.attrs.get('extractor', 'unknown')] += 1
+            if df.attrs.get('cached'):
+                pipeline_metrics.count('pdfs_cache_hits')
+            else:
+                pipeline_metrics.count('pdfs_parsed')
+                pipeline_metrics.count('pdfs_by_extractor', extractor=df.attrs.get('extractor', 'unknown'))
+                pipeline_metrics.count('pages_parsed', df.attrs.get('pages', 0))
+            pipeline_metrics.count('trades_parsed', len(df))
+            if df.empty:
+                parse_statuses['empty'].append(get_disclosure_id(path))
+                continue
+            df.insert(0, 'representative_name', get_representative_name(path))
+            df['disclosure_id'] = get_disclosure_id(path)
+            df['filing_row'] = range(len(df))
+            yield df
+    finally:
+        add_to_quarantine(quarantined)
+        for status, doc_ids in parse_statuses.items():
+            record_parse_status(doc_ids, status, state_db)
+
+    if extractor_counts:
+        summary = ', '.join(f"{count} {name}" for name, count in extractor_counts.most_common())
+        print(f"   🧾 PDFs per extractor: {summary}")
+    report_slow_documents(timings)
+
+
+def format_invested_amounts(trades_df, drop_raw=True):
+    """Make sure the numeric min_amount / max_amount columns are there.
+    read_pdf decodes amounts at extraction already, only frames read back from
+    older CSV files still need their invested_amount strings decoded here."""
+    if 'amount_code' not in trades_df.columns:
+        amounts_df = decode_amounts(trades_df['invested_amount'])
+        trades_df[amounts_df.columns] = amounts_df
+    if drop_raw:
+        trades_df.drop(['invested_amount'], inplace=True, axis=1)
+    return trades_df
+
+
+def _batches(trade_frames, batch_rows):
+    """Group trade frames in lists of about batch_rows rows, never splitting a frame"""
+    batch, batch_size = [], 0
+    for df in trade_frames:
+        batch.append(df)
+        batch_size += len(df)
+        if batch_size >= batch_rows:
+            yield batch
+            batch, batch_size = [], 0
+    if batch:
+        yield batch
+
+
+def _store_batch(frames, csv_file, root, cube_path, update_cube, state_db):
+    """Format, map and upsert one batch of trade frames, see store_trades"""
+    with pipeline_metrics.stage('map_tickers'):
+        batch_df = add_tickers(format_invested_amounts(pd.concat(frames, ignore_index=True), drop_raw=False))
+        pipeline_metrics.count('trades_mapped', int(batch_df['ticker'].notna().sum()) if not batch_df.empty else 0)
+        pipeline_metrics.count('trades_unmapped', int(batch_df['ticker'].isna().sum()) if not batch_df.empty else 0)
+    if batch_df.empty:
+        return 0, trade_store.UpsertResult(0, set(), set()), 0
+
+    if csv_file is not None:
+        # The year CSVs have always carried the transaction year
+        batch_df.assign(transaction_year=batch_df['purchase_date'].dt.year).to_csv(
+            csv_file, header=(csv_file.tell() == 0), index=False)
+
+    with pipeline_metrics.stage('update_store'):
+        upserted = trade_store.upsert_trades(batch_df, root)
+        pipeline_metrics.count('trades_upserted', int(batch_df['disclosure_id'].isin(upserted.changed).sum()))
+    cube_rows = 0
+    if update_cube:
+        with pipeline_metrics.stage('update_cube'):
+            cube_rows = trade_cube.update_cube(batch_df[batch_df['disclosure_id'].isin(upserted.changed)],
+                                               cube_path, removed_ids=upserted.removed)
+            pipeline_metrics.count('cube_rows_recomputed', cube_rows)
+    record_parse_status(batch_df['disclosure_id'].unique(), 'parsed', state_db)
+    return len(batch_df), upserted, cube_rows
+
+
+def store_trades(trade_frames, csv_path=None, batch_rows=50000, root=TRADE_STORE, cube_path=CUBE_DB,
+                 state_db=STATE_DB):
+    """Stream trade frames (e.g. from iter_trades) into the trade store, in batches of about
+    batch_rows rows so that memory stays flat however many PDFs are ingested.
+
+    Each batch gets its amounts formatted and its tickers mapped (add_tickers), and is
+    upserted into the store partitions (trade_store.upsert_trades); the trade cube is
+    updated with the disclosures the batch changed or removed, and the disclosures are
+    marked parsed in the disclosure state. The cube is rebuilt once at the end when it
+    did not exist yet. With csv_path the mapped trades are also written to that CSV file.
+
+    Returns a StoredTrades totalled over the batches."""
+    cube_exists = os.path.exists(cube_path)
+    n_pdfs = n_rows = cube_rows = 0
+    changed, removed = set(), set()
+    csv_file = open(csv_path, 'w', newline='', encoding='utf-8') if csv_path else None
+    try:
+        for batch in _batches(trade_frames, batch_rows):
+            stored_rows, upserted, recomputed = _store_batch(batch, csv_file, root, cube_path, cube_exists, state_db)
+            n_pdfs += len(batch)
+            n_rows += stored_rows
+            cube_rows += recomputed
+            changed.update(upserted.changed)
+            removed.update(upserted.removed)
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+
+    if not cube_exists and n_rows:
+        with pipeline_metrics.stage('update_cube'):
+            cube_rows = trade_cube.rebuild_cube(root, cube_path)
+            pipeline_metrics.count('cube_rows_recomputed', cube_rows)
+    return StoredTrades(n_pdfs, n_rows, changed - removed, removed, cube_rows)
 
 
 def get_specific_trades(business_date):
     """Get trades for a specific date - works with both date folders and year folders"""
     path_to_folder = os.path.join('stock_purchases', business_date, "*pdf")
-    daily_trades = glob.glob(path_to_folder)
+    daily_trades = sorted(glob.glob(path_to_folder))
     
     # If no PDFs found in date folder, check if it's in a year folder
     if not daily_trades:
@@ -16,39 +351,27 @@ def get_specific_trades(business_date):
         try:
             year = business_date.split('_')[-1]
             year_path = os.path.join('stock_purchases', year, "*pdf")
-            daily_trades = glob.glob(year_path)
+            daily_trades = sorted(glob.glob(year_path))
             print(f"📅 Looking for {business_date} trades in year folder {year}/")
         except:
             print(f"⚠️ Could not find trades for {business_date}")
     
-    # daily_trades.remove('stock_purchases\\05_23_2025\\WhitesidesGeorge_20027982.pdf')
-    # daily_trades.remove('stock_purchases\\05_23_2025\\DoggettLloyd_20030285.pdf')
-
-    all_stocks_df = pd.DataFrame()
-    for path in daily_trades:
-        df = read_pdf(path)
-        representative_name = path.split(sep='\\')[-1].split(sep='_')[0]
-        df.insert(0, 'representative_name', representative_name)
-        all_stocks_df = pd.concat([all_stocks_df, df])
-
-    if all_stocks_df.empty:
+    trade_frames = list(iter_trades(daily_trades))
+    if not trade_frames:
         print('Document probably filled manually, to check')
         return pd.DataFrame()
 
-    all_stocks_df['formatted_inv_amount'] = all_stocks_df['invested_amount'].str.split('-').str[0].str.strip().map(formatted_invested_amount_dict)
-    all_stocks_df['min_amount'] = all_stocks_df['formatted_inv_amount'].str.split('-').str[0].astype(float)
-    all_stocks_df['max_amount'] = all_stocks_df['formatted_inv_amount'].str.split('-').str[1].astype(float)
-    all_stocks_df.drop(['invested_amount', 'formatted_inv_amount'], inplace=True, axis=1)
-
+    all_stocks_df = format_invested_amounts(pd.concat(trade_frames))
     return all_stocks_df.reset_index(drop=True)
 
-def get_and_format_all_trades():
+def all_pdf_paths():
+    """Every PDF of the stock_purchases subdirectories (year and date folders), sorted"""
     doc_paths = []
     
     # Check if stock_purchases directory exists
     if not os.path.exists('stock_purchases'):
         print("⚠️ stock_purchases directory not found. Run historical download first.")
-        return pd.DataFrame()
+        return []
     
     stock_purchases = os.listdir('stock_purchases')
     
@@ -66,41 +389,45 @@ def get_and_format_all_trades():
             doc_paths += glob.glob(path)
             print(f"📁 Found {len(glob.glob(path))} PDFs in {entry}/")
 
-    # For the time being, removing whitesides and doggett as their files are poorly formatted
-    files_to_remove = ['WhitesidesGeorge_20027982.pdf', 'DoggettLloyd_20030285.pdf']
-    for file in files_to_remove:
-        path = os.path.join('stock_purchases', '05_23_2025', file)
-        if os.path.exists(path):
-            doc_paths.remove(path)
+    doc_paths.sort()
+    return doc_paths
 
+
+def store_all_trades(workers=None, batch_rows=50000):
+    """Parse every PDF of stock_purchases straight into the trade store, batch by batch (see store_trades)"""
+    doc_paths = all_pdf_paths()
+    print(f"\n📊 STORING {len(doc_paths)} TOTAL PDFs FROM ALL YEARS...")
+    stored = store_trades(iter_trades(doc_paths, workers=workers), batch_rows=batch_rows)
+    print(f"✅ Stored {stored.rows} trading records from {stored.pdfs} PDFs, "
+          f"{len(stored.changed)} new or changed disclosures, {len(stored.removed)} replaced by amendments")
+    return stored
+
+
+def get_and_format_all_trades(workers=None):
+    doc_paths = all_pdf_paths()
+    if not doc_paths:
+        return pd.DataFrame()
     print(f"\n📊 PROCESSING {len(doc_paths)} TOTAL PDFs FROM ALL YEARS...")
     
-    all_trades_df = pd.DataFrame()
+    # Collect the per-PDF frames and concatenate once at the end,
+    # rather than copying the growing result for every PDF
+    trade_frames = []
     processed_count = 0
-    
-    for path in doc_paths:
-        try:
-            df = read_pdf(path)
-            representative_name = path.split(sep='\\')[-1].split(sep='_')[0]
-            df.insert(0, 'representative_name', representative_name)
-            all_trades_df = pd.concat([all_trades_df, df])
-            processed_count += 1
-            
-            if processed_count % 50 == 0:  # Progress indicator
-                print(f"   ⏳ Processed {processed_count}/{len(doc_paths)} PDFs...")
-                
-        except Exception as e:
-            print(f"   ⚠️ Error processing {path}: {e}")
-            continue
+
+    for df in iter_trades(doc_paths, workers=workers):
+        trade_frames.append(df)
+        processed_count += 1
+
+        if processed_count % 50 == 0:  # Progress indicator
+            print(f"   ⏳ Processed {processed_count}/{len(doc_paths)} PDFs...")
+
+    all_trades_df = pd.concat(trade_frames) if trade_frames else pd.DataFrame()
 
     if not all_trades_df.empty:
         print(f"\n✅ Successfully processed {processed_count} PDFs")
         print(f"📈 Extracted {len(all_trades_df)} total trading records")
         
-        all_trades_df['formatted_inv_amount'] = all_trades_df['invested_amount'].str.split('-').str[0].str.strip().map(formatted_invested_amount_dict)
-        all_trades_df['min_amount'] = all_trades_df['formatted_inv_amount'].str.split('-').str[0].astype(float)
-        all_trades_df['max_amount'] = all_trades_df['formatted_inv_amount'].str.split('-').str[1].astype(float)
-        all_trades_df.drop(['invested_amount', 'formatted_inv_amount'], inplace=True, axis=1)
+        format_invested_amounts(all_trades_df)
     else:
         print("❌ No trading data extracted from PDFs")
 
@@ -111,13 +438,16 @@ def add_tickers(trades_df):
     trades_with_tickers = pd.DataFrame()
 
     if not trades_copy.empty:
-        path_to_csv = os.path.join('mappings', 'all_stocks.csv')
-        name_to_ticker_mapping = pd.read_csv(path_to_csv, header=None).rename(columns={
-            0: 'stock_name', 1: 'ticker', 2: 'comment'})
-
-        trades_with_tickers = trades_copy.merge(name_to_ticker_mapping[['stock_name', 'ticker']],on='stock_name', how='left')
+        # One bulk lookup over the distinct stock names (see ticker_resolver)
+        resolver = get_resolver()
+        trades_with_tickers = trades_copy
+        trades_with_tickers['ticker'] = resolver.resolve(trades_copy['stock_name'])
+        n_learned = resolver.save_learned()
+        if n_learned:
+            print(f"🔎 Learned {n_learned} new stock name mappings")
         
-        # Handle malformed dates more gracefully
+        # Handle malformed dates more gracefully, the raw values are kept for the report below
+        raw_purchase_dates = trades_with_tickers['purchase_date'].copy()
         print(f"Converting {len(trades_with_tickers)} purchase dates...")
         trades_with_tickers['purchase_date'] = pd.to_datetime(
             trades_with_tickers['purchase_date'], 
@@ -130,7 +460,7 @@ def add_tickers(trades_df):
         if invalid_dates.sum() > 0:
             print(f"⚠️ Warning: {invalid_dates.sum()} records with invalid dates will be excluded")
             print("Sample invalid date values:")
-            invalid_samples = trades_copy.loc[invalid_dates, 'purchase_date'].unique()[:5]
+            invalid_samples = raw_purchase_dates[invalid_dates].unique()[:5]
             for sample in invalid_samples:
                 print(f"  - '{sample}'")
             
@@ -141,66 +471,6 @@ def add_tickers(trades_df):
     return trades_with_tickers
 
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+if __name__ == '__main__':
+    # python load_trades.py: (re)build the trade store from every downloaded PDF
+    store_all_trades()
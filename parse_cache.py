@@ -0,0 +1,95 @@
+import hashlib
+import os
+import time
+
+import pandas as pd
+from data_utils import pdf_extractors
+from read_pdf import read_pdf, PARSER_VERSION
+
+
+# On-disk cache of parsed trade tables. Entries are keyed by the SHA-256 of
+# the PDF bytes and the read_pdf extractors used, and stamped with
+# read_pdf.PARSER_VERSION, so an unchanged document is only ever parsed once
+# per extractor list, and bumping the version after a change to format_row /
+# format_table makes every old entry stale.
+
+CACHE_FOLDER = os.path.join('cache', 'parsed_pdfs')
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+CACHE_SUFFIX = '.pkl'
+TMP_SUFFIX = '.tmp'
+# Temp files older than this were left by a killed worker, younger ones are still being written
+STALE_TMP_SECONDS = 24 * 3600
+
+
+def pdf_digest(file_name):
+    """SHA-256 of the PDF bytes, read in chunks"""
+    sha = hashlib.sha256()
+    with open(file_name, 'rb') as pdf:
+        for chunk in iter(lambda: pdf.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def cache_path(digest, cache_folder=CACHE_FOLDER, extractors=None):
+    extractors = pdf_extractors if extractors is None else extractors
+    return os.path.join(cache_folder, f"{digest}_{'-'.join(extractors)}_{PARSER_VERSION}{CACHE_SUFFIX}")
+
+
+def cached_read_pdf(file_name, cache_folder=CACHE_FOLDER, reader=read_pdf, extractors=None):
+    """Same as reader(file_name, extractors) (read_pdf by default, extractors being the
+    pdf_extractors setting by default), but serves unchanged documents from the parse cache,
+    flagged with df.attrs['cached'] = True. Errors raised by reader are passed on and nothing
+    is cached for the document."""
+    extractors = pdf_extractors if extractors is None else tuple(extractors)
+    path = cache_path(pdf_digest(file_name), cache_folder, extractors)
+    if os.path.exists(path):
+        try:
+            df = pd.read_pickle(path)
+            os.utime(path)  # Mark as recently used for eviction
+            df.attrs['cached'] = True
+            return df
+        except Exception:
+            pass  # Corrupt entry, parse again and overwrite it
+
+    df = reader(file_name, extractors)
+    os.makedirs(cache_folder, exist_ok=True)
+    # Write to a temp file and rename, so parallel workers never read half an entry
+    tmp_path = f'{path}.{os.getpid()}{TMP_SUFFIX}'
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    return df
+
+
+def evict_cache(max_bytes=MAX_CACHE_BYTES, cache_folder=CACHE_FOLDER):
+    """Drop entries from older parser versions, then least recently used ones until under max_bytes.
+    Temp files of entries being written are left alone, unless older than STALE_TMP_SECONDS."""
+    if not os.path.exists(cache_folder):
+        return 0
+
+    current_suffix = f'_{PARSER_VERSION}{CACHE_SUFFIX}'
+    entries = []
+    removed = 0
+    for entry in os.scandir(cache_folder):
+        if not entry.is_file():
+            continue
+        if entry.name.endswith(TMP_SUFFIX):
+            if time.time() - entry.stat().st_mtime > STALE_TMP_SECONDS:
+                os.remove(entry.path)
+                removed += 1
+            continue
+        if not entry.name.endswith(current_suffix):
+            os.remove(entry.path)
+            removed += 1
+            continue
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        os.remove(path)
+        total_bytes -= size
+        removed += 1
+
+    return removed
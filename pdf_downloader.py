@@ -0,0 +1,168 @@
+import asyncio
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import pipeline_metrics
+from data_utils import download_concurrency, download_rate
+
+
+# Concurrent PDF download engine shared by daily_run and download_trading_pdfs.
+# Requests go through a bounded pool of worker threads driven from asyncio,
+# and all of them draw from one token bucket so the clerk website never sees
+# more than `rate` requests per second, whatever the concurrency.
+
+# urls are tried in order until one returns 200, the content is saved to path
+DownloadJob = namedtuple('DownloadJob', ['disclosure_id', 'urls', 'path'])
+DownloadResult = namedtuple('DownloadResult', ['disclosure_id', 'path', 'url', 'status', 'n_bytes'])
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second, in bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def write_atomically(path, content):
+    """Write to a temp file next to path and rename it, so a crash never leaves a truncated PDF"""
+    tmp_path = f'{path}.part'
+    with open(tmp_path, 'wb') as tmp_file:
+        tmp_file.write(content)
+    os.replace(tmp_path, path)
+
+
+_thread_local = threading.local()
+
+
+def _get_session():
+    # requests.Session is not thread-safe, so each worker thread keeps its own
+    if not hasattr(_thread_local, 'session'):
+        _thread_local.session = requests.Session()
+    return _thread_local.session
+
+
+def _fetch(url, timeout):
+    start = time.perf_counter()
+    try:
+        response = _get_session().get(url, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        pipeline_metrics.record_request(time.perf_counter() - start, type(e).__name__)
+        raise
+    pipeline_metrics.record_request(time.perf_counter() - start, response.status_code, len(response.content))
+    return response.status_code, response.content
+
+
+async def _download_one(job, loop, executor, bucket, semaphore, timeout, max_retries):
+    """Download one job. Any error (e.g. an OSError writing the file on a full disk) fails
+    this job only, the other downloads and their results are kept."""
+    try:
+        return await _try_download(job, loop, executor, bucket, semaphore, timeout, max_retries)
+    except Exception as e:
+        print(f"   ❌ Error downloading {job.disclosure_id}: {e}")
+        return DownloadResult(job.disclosure_id, job.path, None, 'failed', 0)
+
+
+async def _try_download(job, loop, executor, bucket, semaphore, timeout, max_retries):
+    async with semaphore:
+        for attempt in range(max_retries):
+            retry = False
+            for url in job.urls:
+                await bucket.acquire()
+                try:
+                    status_code, content = await loop.run_in_executor(executor, _fetch, url, timeout)
+                except requests.exceptions.RequestException:
+                    retry = True
+                    continue
+
+                if status_code == 200:
+                    await loop.run_in_executor(executor, write_atomically, job.path, content)
+                    return DownloadResult(job.disclosure_id, job.path, url, 'downloaded', len(content))
+                if status_code != 404:
+                    retry = True  # Server side trouble, worth another go
+
+            if not retry or attempt == max_retries - 1:
+                break
+            await asyncio.sleep(2 ** attempt)
+
+    return DownloadResult(job.disclosure_id, job.path, None, 'failed', 0)
+
+
+async def download_pdfs_async(jobs, concurrency=None, rate=None, timeout=30, max_retries=3, progress_every=50):
+    """Download every job concurrently, returning one DownloadResult per job in job order"""
+    concurrency = concurrency or download_concurrency
+    rate = rate or download_rate
+
+    loop = asyncio.get_running_loop()
+    bucket = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        tasks = [asyncio.ensure_future(_download_one(job, loop, executor, bucket, semaphore, timeout, max_retries))
+                 for job in jobs]
+        for done_count, task in enumerate(asyncio.as_completed(tasks), start=1):
+            await task
+            if done_count % progress_every == 0:
+                elapsed = time.monotonic() - start
+                print(f"   ⏳ Progress: {done_count}/{len(jobs)} PDFs ({done_count / elapsed:.1f} PDFs/s)")
+
+    return [task.result() for task in tasks]
+
+
+def download_pdfs(jobs, concurrency=None, rate=None, timeout=30, max_retries=3, skip_existing=True):
+    """Download jobs with bounded parallelism and a shared rate limit, then print a summary.
+
+    Returns the list of DownloadResult, jobs whose file already exists being marked 'skipped'.
+    """
+    ordered = [None] * len(jobs)
+    to_download = []
+    for i, job in enumerate(jobs):
+        if skip_existing and os.path.exists(job.path):
+            ordered[i] = DownloadResult(job.disclosure_id, job.path, None, 'skipped', 0)
+        else:
+            to_download.append(i)
+
+    start = time.monotonic()
+    if to_download:
+        downloaded = asyncio.run(download_pdfs_async([jobs[i] for i in to_download],
+                                                     concurrency, rate, timeout, max_retries))
+        for i, result in zip(to_download, downloaded):
+            ordered[i] = result
+    elapsed = time.monotonic() - start
+
+    n_downloaded = sum(result.status == 'downloaded' for result in ordered)
+    n_failed = sum(result.status == 'failed' for result in ordered)
+    n_skipped = sum(result.status == 'skipped' for result in ordered)
+    n_bytes = sum(result.n_bytes for result in ordered)
+    pipeline_metrics.count('pdfs_downloaded', n_downloaded)
+    pipeline_metrics.count('pdfs_download_failed', n_failed)
+    pipeline_metrics.count('pdfs_skipped', n_skipped)
+
+    print(f"   ✅ Downloaded {n_downloaded} PDFs ({n_bytes / 1e6:.1f} MB) in {elapsed:.1f}s")
+    if elapsed > 0 and n_downloaded:
+        print(f"   🚀 Throughput: {n_downloaded / elapsed:.1f} PDFs/s, {n_bytes / 1e6 / elapsed:.2f} MB/s")
+    if n_skipped:
+        print(f"   ⏭️ Skipped {n_skipped} existing PDFs")
+    if n_failed:
+        print(f"   ❌ Failed to download {n_failed} PDFs")
+
+    return ordered
@@ -0,0 +1,126 @@
+import csv
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+
+import pdfplumber
+from pdfminer.psexceptions import PSException
+from pdfplumber.utils.exceptions import MalformedPDFException, PdfminerException
+from read_pdf import iter_pdf_pages, page_count, read_pdf
+
+
+# Cheap look at a PDF before it goes through full extraction. Scanned and
+# handwritten PTRs have no text layer, or only the text of the blank form,
+# and parsing them page by page only ever ends in "Document probably filled
+# manually". Triage opens the document and reads the text of its first page
+# only, and documents failing it are recorded in a quarantine manifest
+# (mappings/quarantine.csv) that bulk runs skip without opening them again.
+# Entries can be added to the manifest by hand, or removed to retry a document.
+
+QUARANTINE_MANIFEST = os.path.join('mappings', 'quarantine.csv')
+MANIFEST_COLUMNS = ['file_name', 'reason', 'pages', 'chars', 'quarantined_at']
+
+# Fewer characters than this on the first page means there is no real text layer
+MIN_TEXT_CHARS = 50
+# Transaction and notification dates, typed on every electronic filing
+DATE_PATTERN = re.compile(r'\d{1,2}/\d{1,2}/\d{4}')
+
+Triage = namedtuple('Triage', ['ok', 'reason', 'pages', 'chars'])
+
+# Errors of a document that cannot be parsed. Anything else (the file could not be
+# read, out of memory...) is not the document's fault and is never quarantined.
+PARSE_ERRORS = (PSException, PdfminerException, MalformedPDFException)
+
+
+class QuarantinedPDF(Exception):
+    """Raised instead of parsing a document that failed triage"""
+
+    def __init__(self, reason, pages=None, chars=None):
+        super().__init__(reason, pages, chars)
+        self.reason = reason
+        self.pages = pages
+        self.chars = chars
+
+    def __str__(self):
+        return self.reason
+
+
+def classify_pdf(file_name):
+    """Triage a PDF from its page count and the text of its first page.
+    Errors other than PARSE_ERRORS are raised, to be reported as ordinary per-file errors."""
+    try:
+        with pdfplumber.open(file_name) as pdf:
+            pages = page_count(pdf)
+            first_page = next((page for _, page in iter_pdf_pages(pdf, stop_at_table_end=False)), None)
+            if first_page is None:
+                return Triage(False, 'malformed: no pages', 0, 0)
+            text = first_page.text
+            # Only a page without a text layer needs its layout, to tell scans from blank pages
+            has_images = len(text.strip()) < MIN_TEXT_CHARS and bool(first_page.layout.images)
+    except PARSE_ERRORS as e:
+        return Triage(False, f'malformed: {type(e).__name__}', None, None)
+
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        reason = 'image only: no text layer' if has_images else 'empty: no text on first page'
+        return Triage(False, reason, pages, len(text))
+    if not DATE_PATTERN.search(text):
+        return Triage(False, 'filled by hand: no typed dates', pages, len(text))
+    return Triage(True, '', pages, len(text))
+
+
+def read_triaged_pdf(file_name, extractors=None):
+    """read_pdf for documents passing triage, QuarantinedPDF for the others"""
+    triage = classify_pdf(file_name)
+    if not triage.ok:
+        raise QuarantinedPDF(triage.reason, triage.pages, triage.chars)
+    return read_pdf(file_name, extractors)
+
+
+def load_quarantine(manifest=QUARANTINE_MANIFEST):
+    """File name -> reason of every quarantined document"""
+    if not os.path.exists(manifest):
+        return {}
+    with open(manifest, 'r', newline='', encoding='utf-8') as manifest_file:
+        return {row['file_name']: row['reason'] for row in csv.DictReader(manifest_file)}
+
+
+def add_to_quarantine(quarantined, manifest=QUARANTINE_MANIFEST):
+    """Append (path, QuarantinedPDF) pairs to the manifest, keyed by file name"""
+    if not quarantined:
+        return
+    write_header = not os.path.exists(manifest)
+    quarantined_at = datetime.now().isoformat(timespec='seconds')
+    with open(manifest, 'a', newline='', encoding='utf-8') as manifest_file:
+        writer = csv.writer(manifest_file)
+        if write_header:
+            writer.writerow(MANIFEST_COLUMNS)
+        for path, error in quarantined:
+            writer.writerow([os.path.basename(path), error.reason, error.pages, error.chars, quarantined_at])
+
+
+def skip_quarantined(paths, manifest=QUARANTINE_MANIFEST):
+    """Paths whose file is not in the quarantine manifest"""
+    quarantine = load_quarantine(manifest)
+    kept = [path for path in paths if os.path.basename(path) not in quarantine]
+    if len(kept) < len(paths):
+        print(f"   🚧 Skipping {len(paths) - len(kept)} quarantined PDFs (see {manifest})")
+    return kept
+
+
+def release_quarantined(reason_prefix, manifest=QUARANTINE_MANIFEST):
+    """Remove the documents whose reason starts with reason_prefix from the manifest, so the
+    next bulk run tries them again, e.g. 'timeout' after raising the parse_timeout setting.
+    Returns the released file names."""
+    if not os.path.exists(manifest):
+        return []
+    with open(manifest, 'r', newline='', encoding='utf-8') as manifest_file:
+        rows = list(csv.DictReader(manifest_file))
+    released = [row['file_name'] for row in rows if row['reason'].startswith(reason_prefix)]
+    tmp_path = manifest + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as manifest_file:
+        writer = csv.DictWriter(manifest_file, fieldnames=MANIFEST_COLUMNS)
+        writer.writeheader()
+        writer.writerows(row for row in rows if not row['reason'].startswith(reason_prefix))
+    os.replace(tmp_path, manifest)
+    return released
@@ -0,0 +1,208 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import numpy as np
+
+
+# Per-stage metrics of the pipeline runs (daily_run.py, compare_dates.run),
+# next to the emoji progress messages, to tell which stage a slow night spent
+# its time in. A run is split in named stages (`with stage('parse'):`), and
+# everything recorded while a stage is open is attributed to it:
+#
+# - wall time of the stage, with and without the stages nested in it
+# - counters, e.g. bytes downloaded, PDFs and pages parsed, parse failures by reason
+# - request latencies (seconds), with the request counts per HTTP status
+#
+# Stages nest: a stage opened inside another one (load_trades.store_trades'
+# map_tickers / update_store inside daily_run's parse_pdfs) records it as its
+# parent, and its time is taken out of the parent's own time. Each stage has
+# its total seconds (children included) and its self seconds (without them);
+# the self seconds of all stages add up to the run's wall time, so summaries,
+# rates and the Prometheus stage_seconds series use those.
+#
+# write_metrics() appends one JSON line per stage to METRICS_LOG (the history,
+# for tracking regressions over nights) and rewrites METRICS_PROM, a Prometheus
+# text file of the last run for a local scraper (e.g. node_exporter's textfile
+# collector). Counters also get a per second rate in the JSON lines, which
+# gives PDFs/s, pages/s and bytes/s of each stage.
+#
+# Recording is cheap and thread safe (the download threads record their own
+# requests), and does nothing but accumulate in memory until write_metrics().
+
+METRICS_FOLDER = os.path.join('cache', 'metrics')
+METRICS_LOG = os.path.join(METRICS_FOLDER, 'pipeline_metrics.jsonl')
+METRICS_PROM = os.path.join(METRICS_FOLDER, 'pipeline_metrics.prom')
+PROM_PREFIX = 'congress_pipeline'
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+# Stage of whatever is recorded outside a `with stage(...)` block
+DEFAULT_STAGE = 'other'
+
+_lock = threading.Lock()
+_run = {}
+
+
+def _new_stage():
+    return {'seconds': 0.0, 'child_seconds': 0.0, 'parent': None, 'counters': Counter(),
+            'latencies': defaultdict(list)}
+
+
+def _reset(name):
+    _run.clear()
+    _run.update(name=name, started_at=datetime.now().isoformat(timespec='seconds'), stages={},
+                current=DEFAULT_STAGE)
+
+
+def start_run(name):
+    """Forget what was recorded so far and start recording the run name"""
+    with _lock:
+        _reset(name)
+
+
+def _stage_metrics(name):
+    if not _run:
+        _reset('pipeline')
+    return _run['stages'].setdefault(name, _new_stage())
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Attribute the wall time of the block, and everything recorded in it, to the stage name.
+    Inside another stage, the block's time is taken out of that parent's self time."""
+    with _lock:
+        metrics = _stage_metrics(name)
+        previous, _run['current'] = _run['current'], name
+        nested = previous not in (DEFAULT_STAGE, name)
+        if nested and metrics['parent'] is None:
+            metrics['parent'] = previous
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            elapsed = time.perf_counter() - start
+            _stage_metrics(name)['seconds'] += elapsed
+            if nested:
+                _stage_metrics(previous)['child_seconds'] += elapsed
+            _run['current'] = previous
+
+
+def _key(metric, labels):
+    return (metric, tuple(sorted((label, str(value)) for label, value in labels.items())))
+
+
+def count(metric, value=1, **labels):
+    """Add value to the counter metric of the current stage, e.g. count('parse_failures', reason='empty')"""
+    with _lock:
+        _stage_metrics(_run.get('current', DEFAULT_STAGE))['counters'][_key(metric, labels)] += value
+
+
+def observe(metric, seconds):
+    """Record one latency of metric in the current stage"""
+    with _lock:
+        _stage_metrics(_run.get('current', DEFAULT_STAGE))['latencies'][metric].append(seconds)
+
+
+def record_request(seconds, status, n_bytes=0):
+    """One HTTP request: its latency, its status (or exception name) and the bytes received"""
+    with _lock:
+        metrics = _stage_metrics(_run.get('current', DEFAULT_STAGE))
+        metrics['latencies']['request_seconds'].append(seconds)
+        metrics['counters'][_key('requests', {'status': status})] += 1
+        metrics['counters'][_key('bytes_downloaded', {})] += n_bytes
+
+
+def _metric_name(metric, labels):
+    return metric + ('{' + ','.join(f'{label}={value}' for label, value in labels) + '}' if labels else '')
+
+
+def stage_records():
+    """One dict per stage of the current run, as written to METRICS_LOG"""
+    with _lock:
+        records = []
+        for name, metrics in _run.get('stages', {}).items():
+            seconds = metrics['seconds'] - metrics['child_seconds']
+            counters = {_metric_name(metric, labels): value
+                        for (metric, labels), value in sorted(metrics['counters'].items())}
+            rates = {metric: value / seconds for (metric, labels), value in sorted(metrics['counters'].items())
+                     if not labels and seconds > 0}
+            latencies = {}
+            for metric, values in metrics['latencies'].items():
+                values = np.asarray(values)
+                latencies[metric] = {'count': len(values), 'mean': float(values.mean()),
+                                     'p50': float(np.percentile(values, 50)),
+                                     'p95': float(np.percentile(values, 95)), 'max': float(values.max())}
+            records.append({'run': _run['name'], 'started_at': _run['started_at'], 'stage': name,
+                            'parent': metrics['parent'], 'seconds': round(seconds, 6),
+                            'total_seconds': round(metrics['seconds'], 6), 'counters': counters,
+                            'rates': {metric: round(rate, 3) for metric, rate in rates.items()},
+                            'latencies': latencies})
+        return records
+
+
+def _prom_labels(labels):
+    return '{' + ','.join(f'{label}="{str(value).replace(chr(34), chr(39))}"' for label, value in labels) + '}'
+
+
+def prometheus_text():
+    """The metrics of the current run in the Prometheus text exposition format"""
+    run_labels = [('run', _run.get('name', 'pipeline'))]
+    lines = [f'# TYPE {PROM_PREFIX}_last_run_timestamp_seconds gauge',
+             f'{PROM_PREFIX}_last_run_timestamp_seconds{_prom_labels(run_labels)} {time.time():.0f}',
+             f'# TYPE {PROM_PREFIX}_stage_seconds gauge']
+    total_lines = [f'# TYPE {PROM_PREFIX}_stage_total_seconds gauge']
+    counters, histograms = defaultdict(list), defaultdict(list)
+    with _lock:
+        for name, metrics in _run.get('stages', {}).items():
+            stage_labels = run_labels + [('stage', name)]
+            self_seconds = metrics['seconds'] - metrics['child_seconds']
+            lines.append(f'{PROM_PREFIX}_stage_seconds{_prom_labels(stage_labels)} {self_seconds:.6f}')
+            total_lines.append(f'{PROM_PREFIX}_stage_total_seconds{_prom_labels(stage_labels)} '
+                               f'{metrics["seconds"]:.6f}')
+            for (metric, labels), value in sorted(metrics['counters'].items()):
+                counters[metric].append(f'{PROM_PREFIX}_{metric}_total{_prom_labels(stage_labels + list(labels))}'
+                                        f' {value}')
+            for metric, values in metrics['latencies'].items():
+                values = np.sort(values)
+                for bucket in LATENCY_BUCKETS + ['+Inf']:
+                    n = len(values) if bucket == '+Inf' else int(np.searchsorted(values, bucket, side='right'))
+                    histograms[metric].append(f'{PROM_PREFIX}_{metric}_bucket'
+                                              f'{_prom_labels(stage_labels + [("le", bucket)])} {n}')
+                histograms[metric].append(f'{PROM_PREFIX}_{metric}_sum{_prom_labels(stage_labels)} '
+                                          f'{values.sum():.6f}')
+                histograms[metric].append(f'{PROM_PREFIX}_{metric}_count{_prom_labels(stage_labels)} {len(values)}')
+    lines += total_lines
+    for metric, metric_lines in counters.items():
+        lines += [f'# TYPE {PROM_PREFIX}_{metric}_total counter'] + metric_lines
+    for metric, metric_lines in histograms.items():
+        lines += [f'# TYPE {PROM_PREFIX}_{metric} histogram'] + metric_lines
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(log_path=METRICS_LOG, prom_path=METRICS_PROM):
+    """Append the stages of the current run to the JSON lines log and rewrite the Prometheus file"""
+    records = stage_records()
+    if not records:
+        return 0
+    os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as log_file:
+        for record in records:
+            log_file.write(json.dumps(record) + '\n')
+
+    # Written next to the target and renamed, so the scraper never reads half a file
+    os.makedirs(os.path.dirname(prom_path) or '.', exist_ok=True)
+    tmp_path = prom_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as prom_file:
+        prom_file.write(prometheus_text())
+    os.replace(tmp_path, prom_path)
+
+    # Self seconds, which add up to the run's wall time
+    summary = ', '.join(f"{record['stage']}{' (in ' + record['parent'] + ')' if record['parent'] else ''} "
+                        f"{record['seconds']:.1f}s" for record in records)
+    print(f"📈 Stage timings: {summary} (metrics in {log_path})")
+    return len(records)
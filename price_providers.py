@@ -0,0 +1,186 @@
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from data_utils import price_batch_size, price_concurrency
+
+
+# Where price_store gets daily bars from. Every provider answers
+# fetch_many(tickers, start, end) with a PriceFetch:
+#   bars      ticker -> DataFrame of daily bars indexed by date (empty: no data)
+#   failures  ticker -> error message, for tickers that still failed after retries
+# so one bad ticker never hides the others, and "no data" (delisted, unknown)
+# can be told apart from "could not ask" (network trouble).
+#
+# Tickers are split in batches of batch_size, fetched by up to `concurrency`
+# threads at once, each batch being retried with exponential backoff. A batch
+# that keeps failing is retried ticker by ticker to isolate the bad ones.
+# A provider that gets some tickers of a batch but not others raises
+# TickerErrors: the bars it got are kept and only the failed tickers are retried.
+# YahooProvider asks for a whole batch in one multi-ticker request,
+# OfflineProvider and FixtureProvider need no network at all.
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+PriceFetch = namedtuple('PriceFetch', ['bars', 'failures'])
+
+
+class TickerErrors(Exception):
+    """Some tickers of a batch failed: errors is ticker -> message, bars holds the other tickers"""
+
+    def __init__(self, bars, errors):
+        super().__init__(', '.join(f'{ticker}: {error}' for ticker, error in errors.items()))
+        self.bars = bars
+        self.errors = errors
+
+
+def _empty_bars():
+    return pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name='date'), dtype=float)
+
+
+class PriceProvider:
+    """Base provider: subclasses implement fetch_batch for a list of tickers"""
+
+    def __init__(self, concurrency=None, batch_size=None, max_retries=3, retry_delay=1.0):
+        if max_retries < 1:
+            raise ValueError(f'max_retries must be at least 1, got {max_retries}')
+        self.concurrency = concurrency or price_concurrency
+        self.batch_size = batch_size or price_batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def fetch_batch(self, tickers, start, end):
+        """ticker -> bars for every ticker of the batch, raising on failure (TickerErrors when
+        only some tickers failed)"""
+        raise NotImplementedError
+
+    def _fetch_with_retries(self, tickers, start, end):
+        bars = {}
+        for attempt in range(self.max_retries):
+            try:
+                bars.update(self.fetch_batch(tickers, start, end))
+                return bars, {}
+            except TickerErrors as e:
+                bars.update(e.bars)
+                tickers = [ticker for ticker in tickers if ticker in e.errors]
+                error = e
+            except Exception as e:
+                error = e
+            if attempt < self.max_retries - 1:
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+        if isinstance(error, TickerErrors):
+            return bars, dict(error.errors)
+        if len(tickers) == 1:
+            return bars, {tickers[0]: f'{type(error).__name__}: {error}'}
+        # Ask for the tickers one by one, so a single bad one does not fail the whole batch
+        failures = {}
+        for ticker in tickers:
+            ticker_bars, ticker_failures = self._fetch_with_retries([ticker], start, end)
+            bars.update(ticker_bars)
+            failures.update(ticker_failures)
+        return bars, failures
+
+    def fetch_many(self, tickers, start, end):
+        """Bars of every ticker over [start, end], dates included"""
+        tickers = list(tickers)
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        bars, failures = {}, {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for batch_bars, batch_failures in executor.map(
+                    lambda batch: self._fetch_with_retries(batch, start, end), batches):
+                bars.update(batch_bars)
+                failures.update(batch_failures)
+        return PriceFetch(bars, failures)
+
+
+# yf.download keeps its results and errors in module globals (yfinance.shared),
+# so two downloads at once would mix up their tickers: they go one at a time,
+# each one fetching its batch over yfinance's own threads
+_yahoo_lock = threading.Lock()
+# yfinance errors that mean "no data for this symbol", not "could not ask"
+_YAHOO_NO_DATA = re.compile(r'delisted|no (price )?data found|no timezone found', re.IGNORECASE)
+
+
+class YahooProvider(PriceProvider):
+    """Yahoo Finance through yfinance, one multi-ticker download per batch"""
+
+    def fetch_batch(self, tickers, start, end):
+        import yfinance as yf
+        from yfinance import shared
+        with _yahoo_lock:
+            # yfinance's end date is exclusive
+            data = yf.download(tickers, start=start, end=end + timedelta(days=1), group_by='ticker',
+                               auto_adjust=True, threads=True, progress=False)
+            yahoo_errors = {ticker.upper(): str(error) for ticker, error in getattr(shared, '_ERRORS', {}).items()}
+
+        bars, errors = {}, {}
+        for ticker in tickers:
+            error = yahoo_errors.get(ticker.upper())
+            if isinstance(data.columns, pd.MultiIndex):
+                ticker_bars = data[ticker] if ticker in data.columns.get_level_values(0) else None
+            else:
+                ticker_bars = data if not data.empty else None
+            if error is not None and not _YAHOO_NO_DATA.search(error):
+                errors[ticker] = error
+            elif ticker_bars is not None:
+                bars[ticker] = ticker_bars.dropna(how='all')
+            elif error is not None:
+                bars[ticker] = _empty_bars()
+            else:
+                errors[ticker] = 'missing from the download'
+        if errors:
+            raise TickerErrors(bars, errors)
+        return bars
+
+
+class OfflineProvider(PriceProvider):
+    """Prices read from a local CSV or Parquet file, for deterministic runs without network.
+
+    The file is in long format, one row per ticker and date: a date and a ticker
+    column plus any of Open/High/Low/Close/Volume (Close at least).
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        prices = pd.read_parquet(path) if os.path.splitext(path)[1] == '.parquet' else pd.read_csv(path)
+        prices['date'] = pd.to_datetime(prices['date'])
+        self.prices = {ticker: ticker_prices.set_index('date').drop(columns='ticker').sort_index()
+                       for ticker, ticker_prices in prices.groupby('ticker')}
+
+    def fetch_batch(self, tickers, start, end):
+        return {ticker: self.prices[ticker].loc[start:end] if ticker in self.prices else _empty_bars()
+                for ticker in tickers}
+
+
+class FixtureProvider(PriceProvider):
+    """Deterministic synthetic prices per ticker on business days, for tests and offline runs.
+    Tickers starting with 'DELISTED' have no data, tickers starting with 'ERROR' always fail."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('retry_delay', 0)
+        super().__init__(**kwargs)
+
+    def fetch_batch(self, tickers, start, end):
+        failing = [ticker for ticker in tickers if ticker.startswith('ERROR')]
+        if failing:
+            raise ConnectionError(f'fixture failure for {failing}')
+        return {ticker: self.fixture_bars(ticker, start, end) for ticker in tickers}
+
+    @staticmethod
+    def fixture_bars(ticker, start, end):
+        if ticker.startswith('DELISTED'):
+            return _empty_bars()
+        dates = pd.bdate_range(start, end, name='date')
+        # Prices depend on the ticker and the date only, so any two ranges line up
+        day_numbers = (dates - pd.Timestamp('2000-01-01')).days.to_numpy()
+        seed = sum(ord(char) for char in ticker)
+        close = 50 + seed % 200 + 10 * np.sin(day_numbers / (20 + seed % 30)) + (day_numbers % 7) * 0.1
+        return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                             'Volume': 1000000.0}, index=dates)
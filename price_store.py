@@ -0,0 +1,187 @@
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pandas as pd
+from data_utils import price_lag_ttl_hours, price_negative_ttl_days
+from price_providers import BAR_COLUMNS, YahooProvider
+
+
+# On-disk store of daily price bars, one Parquet file per ticker, so that the
+# backtest only downloads what it has never seen before.
+#
+# cache/prices/AAPL.parquet        Open/High/Low/Close/Volume indexed by date
+# cache/prices/coverage.json       ticker -> [first, last] date already fetched
+# cache/prices/unknown.json        ticker -> when the provider last had nothing for it
+# cache/prices/lagging.json        ticker -> [first session missing at the tail, when last asked]
+#
+# Each ticker covers one contiguous date range. A request outside of it only
+# fetches the missing head and/or tail, and a request inside it never goes to
+# the network. Requests stop at the last complete session, as today's bar still
+# moves, and a successful fetch covers the whole requested range: weekends,
+# holidays and halted or delisted tickers are not asked for again. When the
+# provider has not published the last few sessions yet, they are asked for
+# again once price_lag_ttl_hours have passed. Tickers the provider knows
+# nothing about (delisted, renamed, not a stock) are remembered for
+# price_negative_ttl_days and not asked again.
+#
+# Bars come from a price_providers.PriceProvider, Yahoo by default. Tickers
+# missing the same range are asked for in one batched fetch_many call; tickers
+# that failed are reported and left for the next run.
+
+PRICE_STORE = os.path.join('cache', 'prices')
+# Ticker values of the mapping that are not tradable
+NOT_TRADABLE = {'', 'out of scope'}
+# Missing sessions at the tail beyond this are a halt or a delisting, not a lagging provider
+MAX_LAG_SESSIONS = 5
+
+
+def _bars_path(ticker, store):
+    return os.path.join(store, f"{ticker.replace('/', '_')}.parquet")
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as json_file:
+        return json.load(json_file)
+
+
+def _save_json(data, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _normalize_bars(bars):
+    """Timezone-naive, midnight-normalized dates, store columns only"""
+    bars = bars.reindex(columns=BAR_COLUMNS)
+    index = pd.DatetimeIndex(bars.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    bars.index = index.normalize().rename('date')
+    return bars[~bars.index.duplicated(keep='last')].astype(float)
+
+
+def read_bars(ticker, store=PRICE_STORE, columns=None, start=None):
+    """Stored bars of a ticker, from start on when given (only the row groups needed are read)"""
+    path = _bars_path(ticker, store)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns or BAR_COLUMNS, index=pd.DatetimeIndex([], name='date'))
+    filters = [('date', '>=', pd.Timestamp(start))] if start is not None else None
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def missing_ranges(covered, start, end):
+    """Date ranges of [start, end] outside the covered [first, last] range"""
+    if covered is None:
+        return [(start, end)]
+    first, last = (pd.Timestamp(date) for date in covered)
+    ranges = []
+    if start < first:
+        ranges.append((start, first - timedelta(days=1)))
+    if end > last:
+        ranges.append((last + timedelta(days=1), end))
+    return ranges
+
+
+def last_complete_session(now=None):
+    """Last day whose daily bar is final: yesterday, as today's bar moves until the close"""
+    return pd.Timestamp(now or datetime.now()).normalize() - pd.Timedelta(days=1)
+
+
+def update_prices(tickers, start_date, end_date, store=PRICE_STORE, provider=None):
+    """Fetch and store whatever is missing for tickers over [start_date, end_date].
+    Returns the tickers that have stored prices."""
+    provider = provider or YahooProvider()
+    start = pd.Timestamp(start_date).normalize()
+    end = min(pd.Timestamp(end_date).normalize(), last_complete_session())
+
+    os.makedirs(store, exist_ok=True)
+    coverage_path = os.path.join(store, 'coverage.json')
+    unknown_path = os.path.join(store, 'unknown.json')
+    lagging_path = os.path.join(store, 'lagging.json')
+    coverage = _load_json(coverage_path)
+    unknown = _load_json(unknown_path)
+    lagging = _load_json(lagging_path)
+    unknown_until = datetime.now() - timedelta(days=price_negative_ttl_days)
+    lagging_until = datetime.now() - timedelta(hours=price_lag_ttl_hours)
+
+    tickers = sorted({ticker for ticker in tickers if isinstance(ticker, str)} - NOT_TRADABLE)
+    # Tickers missing the same date range are fetched together, in batches
+    requests = defaultdict(list)
+    for ticker in tickers:
+        if ticker in unknown and datetime.fromisoformat(unknown[ticker]) > unknown_until:
+            continue
+        ranges = missing_ranges(coverage.get(ticker), start, end) if start <= end else []
+        if ticker in lagging and datetime.fromisoformat(lagging[ticker][1]) <= lagging_until:
+            # Ask again for the sessions the provider had not published yet
+            lag_start = pd.Timestamp(lagging[ticker][0])
+            if lag_start <= end:
+                ranges = [(range_start, range_end) for range_start, range_end in ranges
+                          if range_end < lag_start] + [(lag_start, end)]
+        for missing_range in ranges:
+            requests[missing_range].append(ticker)
+
+    fetched = defaultdict(list)
+    failures = {}
+    tail_asked = set()
+    for (range_start, range_end), range_tickers in requests.items():
+        result = provider.fetch_many(range_tickers, range_start, range_end)
+        failures.update(result.failures)
+        if range_end == end:
+            tail_asked.update(range_tickers)
+        for ticker, bars in result.bars.items():
+            fetched[ticker].append(_normalize_bars(bars))
+
+    for ticker, new_bars in fetched.items():
+        if ticker in failures:
+            continue  # Coverage has to stay one contiguous range, try again next time
+        if ticker not in coverage and all(bars.empty for bars in new_bars):
+            # Never had any data for it: most likely delisted or not a stock
+            unknown[ticker] = datetime.now().isoformat(timespec='seconds')
+            continue
+        bars = pd.concat([read_bars(ticker, store), *new_bars]).sort_index()
+        bars = bars[~bars.index.duplicated(keep='last')]
+        bars.to_parquet(_bars_path(ticker, store))
+        unknown.pop(ticker, None)
+        first, last = coverage.get(ticker, [start, end])
+        last = max(pd.Timestamp(last), end)
+        coverage[ticker] = [str(min(pd.Timestamp(first), start).date()), str(last.date())]
+        next_session = bars.index.max() + timedelta(days=1) if not bars.empty else None
+        if next_session is None or not 0 < len(pd.bdate_range(next_session, last)) <= MAX_LAG_SESSIONS:
+            lagging.pop(ticker, None)
+        elif ticker in tail_asked or ticker not in lagging:
+            lagging[ticker] = [str(next_session.date()), datetime.now().isoformat(timespec='seconds')]
+
+    _save_json(coverage, coverage_path)
+    _save_json(unknown, unknown_path)
+    _save_json(lagging, lagging_path)
+
+    available = [ticker for ticker in tickers if ticker in coverage]
+    n_requested = sum(len(range_tickers) for range_tickers in requests.values())
+    print(f"   💾 Prices for {len(available)} tickers, {n_requested} ticker ranges fetched from the provider")
+    for ticker, error in sorted(failures.items()):
+        print(f"   ⚠️ {ticker}: could not fetch prices: {error}")
+    return available
+
+
+def price_panel(tickers, start_date, end_date, store=PRICE_STORE, column='Close'):
+    """Aligned date x ticker panel of stored prices, built with a single concat,
+    forward filled, without the tickers that have no prices at all"""
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize()
+    series = {ticker: read_bars(ticker, store, [column], start)[column].loc[:end] for ticker in tickers}
+    series = {ticker: prices for ticker, prices in series.items() if not prices.empty}
+    if not series:
+        return pd.DataFrame()
+    panel = pd.concat(series, axis=1).sort_index().ffill()
+    return panel.dropna(axis=1, how='all')
+
+
+def load_prices(tickers, start_date, end_date, store=PRICE_STORE, provider=None):
+    """Bring the store up to date for tickers, then return their price panel"""
+    available = update_prices(tickers, start_date, end_date, store, provider)
+    return price_panel(available, start_date, end_date, store)
@@ -1,5 +1,16 @@
+import re
+
 import pandas as pd
 import pdfplumber
+from pdfminer.pdfdevice import PDFTextDevice
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+from pdfminer.utils import apply_matrix_pt
+from pdfplumber.page import Page
+from amount_codec import AMOUNT_UNKNOWN, decode_amounts
+from data_utils import pdf_extractors
 # from data_utils import possible_left_ranges
 
 
@@ -8,7 +19,17 @@ import pdfplumber
 # There are many if clauses in the format_table and format_row
 # functions, as the pdf generated by the disclosures-clerk website
 # do not have uniform formatting so that the pdfplumber
-# app has trouble
+# app has trouble.
+# Most electronic filings are read much faster from the page text
+# alone, taken straight from pdfminer, the table extraction being kept
+# as the fallback for pages whose text does not fit the row grammar.
+
+# Bump whenever format_row / format_table / the extractors / read_pdf change what they return
+# (columns, values or attrs),
+# so that parse_cache entries written by the old logic are ignored
+PARSER_VERSION = 7
+
+COLUMN_NAMES = ['stock_name', 'buy_sell_flag', 'purchase_date', 'notification_date', 'invested_amount']
 
 def format_row(text, page_number):
     flags = [' S ', ' P ', ' E ']
@@ -25,22 +46,14 @@ def format_row(text, page_number):
     stock_name = text[0][3:] if (text[0][:2] in ['JT', 'DC', 'SP']) else text[0]
     purchase_date = text[1][shift:10 + shift]
     notification_date = text[1][shift + 11:shift + 21]
-    rest = (text[1][shift + 21:]).split('-')
-    invested_amount = rest[0] + '- \$'
-    if len(rest) < 2:
-        invested_amount = rest[0].split('\n')[0]
-    else:
-        for char in rest[1]:
-            if char.isnumeric():
-                invested_amount += char
-            else:
-                pass
+    # Raw amount text, decoded by amount_codec once the whole pdf is read
+    invested_amount = text[1][shift + 21:]
 
     purchase_info = [stock_name, buy_sell_flag + partial_flag, purchase_date, notification_date, invested_amount]
     return purchase_info
 
 
-def format_table(table, page_number):
+def format_table_rows(table, page_number):
     formatted_table = []
     expected_columns = ['ID', 'Owner', 'Asset', 'Transaction\nType', 'Date',
                         'Notification\nDate', 'Amount', 'Cap.\nGains >\n$200?']
@@ -59,32 +72,241 @@ def format_table(table, page_number):
             buy_sell_flag = row[3]
             purchase_date = row[4]
             notification_date = row[5]
-            invested_amount = '' if (row[6] is None) else row[6].split('$')
-            left_range = '' if (invested_amount=='') else float(invested_amount[1][:-2].strip().replace(',', ''))
-            if (len(invested_amount) < 3) or (left_range < 1001):
-                invested_amount = left_range
-            else:
-                invested_amount = '\$' + invested_amount[1][:-1] + '\$' + invested_amount[2]
+            invested_amount = '' if (row[6] is None) else row[6]
             purchase_info = [stock_name, buy_sell_flag, purchase_date, notification_date, invested_amount]
         elif ('$' not in row[0]):
             continue
         else:
             purchase_info = format_row(row[0], page_number)
         formatted_table.append(purchase_info)
-    column_names = ['stock_name', 'buy_sell_flag', 'purchase_date', 'notification_date', 'invested_amount']
-    return pd.DataFrame(columns=column_names, data=formatted_table)
+    return formatted_table
+
+
+def format_table(table, page_number):
+    return pd.DataFrame(columns=COLUMN_NAMES, data=format_table_rows(table, page_number))
+
+
+# Text stream backend: one transaction per line of the page text, e.g.
+# "SP Apple Inc. (AAPL) [ST] P 01/05/2025 01/20/2025 $1,001 -"
+# (the rest of the amount and of a long asset name wrap onto the next lines,
+# the lower bound of the amount is all amount_codec needs)
+TEXT_ROW_PATTERN = re.compile(
+    r'^(?:\d+\s+)?(?:(?:SP|JT|DC)\s+)?(?P<asset>\S.*?)\s+(?P<flag>[PSE](?: \(partial\))?)\s+'
+    r'(?P<date>\d{2}/\d{2}/\d{4})\s+(?P<notified>\d{2}/\d{2}/\d{4})\s+'
+    r'(?P<amount>(?:\$|Over|Spouse).*)$', re.MULTILINE)
+# Any line holding a transaction: two dates next to each other
+DATE_PAIR_PATTERN = re.compile(r'\d{2}/\d{2}/\d{4}\s+\d{2}/\d{2}/\d{4}')
+
+# Sections that only come after the transaction table: the IPO question, the
+# certification and the digital signature. Matched on the page text or, when
+# only the layout was read, on its characters without spaces, hence the \s*. Per transaction
+# "Filing Status" lines sit inside the table, so they are no end marker.
+END_OF_TABLE_PATTERN = re.compile(
+    r'I\s*P\s*O\s*:|Initial\s*Public\s*Offerings|Certification\s*and\s*Signature|'
+    r'I\s*certify\s*that|Digitally\s*Signed', re.IGNORECASE)
+
+
+# Text runs closer than this (in points) share a line / a word, as in pdfplumber's extract_text
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+
+class TextRunDevice(PDFTextDevice):
+    """pdfminer device keeping every string shown on a page as one (y, x0, x1, text) run,
+    without the per-character layout objects a pdfplumber Page builds"""
+
+    def begin_page(self, page, ctm):
+        super().begin_page(page, ctm)
+        self.runs = []
+
+    def render_string_horizontal(self, seq, matrix, pos, font, fontsize, scaling, charspace,
+                                 wordspace, rise, dxscale, ncs, graphicstate):
+        x, y = pos
+        needcharspace = False
+        for obj in seq:
+            if isinstance(obj, (int, float)):
+                x -= obj * dxscale
+                needcharspace = True
+            elif isinstance(obj, bytes):
+                start = x
+                chars = []
+                for cid in font.decode(obj):
+                    if needcharspace:
+                        x += charspace
+                    try:
+                        chars.append(font.to_unichr(cid))
+                    except PDFUnicodeNotDefined:
+                        chars.append(f'(cid:{cid})')
+                    x += font.char_width(cid) * fontsize * scaling
+                    if cid == 32 and wordspace:
+                        x += wordspace
+                    needcharspace = True
+                x0, y0 = apply_matrix_pt(matrix, (start, y))
+                x1, _ = apply_matrix_pt(matrix, (x, y))
+                self.runs.append((y0, x0, x1, ''.join(chars)))
+        return x, y
+
+
+def runs_to_text(runs):
+    """Text of a page from its runs: one line per baseline, top to bottom, words
+    separated by single spaces"""
+    lines = []
+    for run in sorted(runs, key=lambda run: -run[0]):
+        if lines and lines[-1][0][0] - run[0] <= Y_TOLERANCE:
+            lines[-1].append(run)
+        else:
+            lines.append([run])
+    text_lines = []
+    for line in lines:
+        parts = []
+        previous_x1 = None
+        for _, x0, x1, text in sorted(line, key=lambda run: run[1]):
+            if previous_x1 is not None and x0 - previous_x1 > X_TOLERANCE:
+                parts.append(' ')
+            parts.append(text)
+            previous_x1 = x1
+        text_lines.append(' '.join(''.join(parts).split()))
+    return '\n'.join(text_lines)
+
+
+class LazyPage:
+    """One page of an open pdf. The text backend only needs its text, read straight
+    from pdfminer, the pdfplumber Page (chars, lines, tables) is built on first use of layout."""
 
+    def __init__(self, pdf, page_obj, page_number, doctop, interpreter):
+        self.pdf = pdf
+        self.page_obj = page_obj
+        self.page_number = page_number
+        self.doctop = doctop
+        self.interpreter = interpreter
+        self._text = None
+        self._layout = None
 
-def read_pdf(file_name):
-    full_table_df = pd.DataFrame()
+    @property
+    def text(self):
+        if self._text is None:
+            self.interpreter.process_page(self.page_obj)
+            self._text = runs_to_text(self.interpreter.device.runs)
+        return self._text
+
+    @property
+    def layout(self):
+        if self._layout is None:
+            self._layout = Page(self.pdf, self.page_obj, page_number=self.page_number,
+                                initial_doctop=self.doctop)
+        return self._layout
+
+    def table_has_ended(self):
+        """True when the page holds one of the sections printed after the transaction table,
+        matched on the text if it was read, on the characters of the layout otherwise"""
+        text = self._text if self._text is not None else ''.join(char['text'] for char in self.layout.chars)
+        return END_OF_TABLE_PATTERN.search(text) is not None
+
+    def close(self):
+        if self._layout is not None:
+            self._layout.close()
+
+
+def page_count(pdf):
+    """Number of pages of the document, read from its page tree without opening any page"""
+    return resolve1(pdf.doc.catalog['Pages']).get('Count', 0)
+
+
+def iter_pdf_pages(pdf, stop_at_table_end=True):
+    """Yield (page_number, LazyPage), opening pages one at a time straight from the
+    document instead of building every page up front through pdf.pages, and
+    dropping each page's parsed objects before the next one. Unless
+    stop_at_table_end=False, nothing after the page where the transaction
+    table ends is opened."""
+    interpreter = PDFPageInterpreter(pdf.rsrcmgr, TextRunDevice(pdf.rsrcmgr))
+    doctop = 0
+    for page_number, page_obj in enumerate(PDFPage.create_pages(pdf.doc)):
+        page = LazyPage(pdf, page_obj, page_number + 1, doctop, interpreter)
+        x0, y0, x1, y1 = page_obj.mediabox
+        doctop += abs(y1 - y0)
+        yield page_number, page
+        ended = stop_at_table_end and page.table_has_ended()
+        page.close()
+        if ended:
+            break
+
+
+def parse_text_rows(text):
+    """Rows of one page of text, None if a transaction line does not fit the row grammar"""
+    rows = [[match['asset'], match['flag'], match['date'], match['notified'], match['amount']]
+            for match in TEXT_ROW_PATTERN.finditer(text)]
+    if len(rows) != len(DATE_PAIR_PATTERN.findall(text)):
+        return None
+    return rows
+
+
+def text_page_rows(page, page_number):
+    """Fast backend reading the page text only: rows of the page, [] when it holds no
+    transaction, None if a transaction line does not fit the row grammar"""
+    return parse_text_rows(page.text)
+
+
+def table_page_rows(page, page_number):
+    """Table backend, slower but copes with the irregular layouts of format_table_rows:
+    rows of the page, [] when it has no table"""
+    layout = page.layout
+    table = layout.extract_table(table_settings={
+        'explicit_horizontal_lines': [layout.height - 70]
+    })
+    return format_table_rows(table, page_number) if table else []
+
+
+# Page backends by name, see the pdf_extractors setting
+PAGE_EXTRACTORS = {
+    'text': text_page_rows,
+    'table': table_page_rows,
+}
+
+
+def iter_pdf_records(pdf, extractors):
+    """Yield (page_number, rows, extractor) for every page of an open pdf, rows being lists
+    of values in COLUMN_NAMES order. Only one page is held at a time. Each page is read by
+    the extractors in order until one does not return None, so a page the text backend
+    cannot read falls back to the table one on its own, while a page without transactions
+    is not read again. The last extractor's result is always used."""
+    for page_number, page in iter_pdf_pages(pdf):
+        for name in extractors:
+            rows = PAGE_EXTRACTORS[name](page, page_number)
+            if rows is not None:
+                break
+        yield page_number, rows or [], name
+
+
+def extract_records(file_name, extractors=None):
+    """Rows of the pdf (lists of values in COLUMN_NAMES order), the name of the
+    extractor that produced them and the page count of the document.
+    Pages are read by the extractors in order (the pdf_extractors setting by default,
+    see iter_pdf_records), the extractor reported being the last one any page needed.
+    A document yielding no rows at all is read again from the next extractor on."""
+    extractors = pdf_extractors if extractors is None else extractors
     with pdfplumber.open(file_name) as pdf:
-        for page_number, page in enumerate(pdf.pages):
-            table = page.extract_table(table_settings={
-                'explicit_horizontal_lines': [page.height - 70]
-            })
-            if table:
-                formatted_table_df = format_table(table, page_number)
-            else:
-                formatted_table_df = pd.DataFrame()
-            full_table_df = pd.concat([full_table_df, formatted_table_df])
-    return full_table_df.reset_index(drop=True)
\ No newline at end of file
+        pages = page_count(pdf)
+        for first in range(len(extractors)):
+            rows, used = [], {extractors[first]}
+            for _, page_rows, name in iter_pdf_records(pdf, extractors[first:]):
+                rows.extend(page_rows)
+                used.add(name)
+            if rows:
+                break
+    return rows, max(used, key=extractors.index), pages
+
+
+def read_pdf(file_name, extractors=None):
+    """Transactions of the pdf, with invested_amount decoded into amount_code / min_amount / max_amount.
+    The extractor that handled the document and its page count are recorded in
+    trades_df.attrs['extractor'] and trades_df.attrs['pages']."""
+    rows, extractor, pages = extract_records(file_name, extractors)
+    trades_df = pd.DataFrame(columns=COLUMN_NAMES, data=rows)
+    amounts_df = decode_amounts(trades_df['invested_amount'])
+    unknown = (amounts_df['amount_code'] == AMOUNT_UNKNOWN).sum()
+    if unknown:
+        print(f'Could not read {unknown} amounts in {file_name}')
+    trades_df[amounts_df.columns] = amounts_df
+    trades_df.attrs['extractor'] = extractor
+    trades_df.attrs['pages'] = pages
+    return trades_df
@@ -0,0 +1,174 @@
+import itertools
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from backtest import run_backtest
+from data_utils import sweep_workers
+
+
+# Runs many variants of the congressional strategy at once. A grid of
+# parameters is expanded into every combination, each one turned into its own
+# weights pivot and backtested with backtest.run_backtest on a process pool.
+#
+# The price panel is copied once into a shared memory block that every worker
+# maps without copying, and the buys are sent once per worker, so a task only
+# carries its StrategyParams. Results come back as one summary row per variant.
+#
+# The notebook's strategy is StrategyParams() with the defaults below: weekly
+# rebalance on the purchase date, weights proportional to the mid-point amount,
+# each week's buys held until the next rebalance.
+
+StrategyParams = namedtuple('StrategyParams', [
+    'rebalance',       # pandas period frequency of the rebalances: 'W', 'M', 'Q'
+    'weighting',       # 'amount' (mid-point amount), 'log_amount' or 'equal'
+    'holding_periods', # number of rebalance periods a buy stays in the target weights
+    'entry_date',      # 'purchase_date', or 'notification_date' to trade only once the filing is public
+    'entry_lag_days',  # days added to the entry date
+    'representatives', # tuple of representative names to follow, None for all
+    'tickers',         # tuple of tickers to trade, None for all
+], defaults=['W', 'amount', 1, 'purchase_date', 0, None, None])
+
+WEIGHTINGS = {
+    'amount': lambda amounts: amounts,
+    'log_amount': np.log1p,
+    'equal': lambda amounts: np.ones(len(amounts)),
+}
+
+SUMMARY_COLUMNS = ['total_return_pct', 'annualized_return_pct', 'volatility_pct', 'sharpe_ratio',
+                   'max_drawdown_pct', 'n_rebalances', 'n_trades']
+
+
+def param_grid(**grid):
+    """Every combination of the given StrategyParams values, e.g.
+    param_grid(rebalance=['W', 'M'], weighting=['equal', 'amount'])"""
+    names = list(grid)
+    return [StrategyParams(**dict(zip(names, values))) for values in itertools.product(*grid.values())]
+
+
+def build_weights(df_buys, params):
+    """Period x ticker target weights of a strategy variant, rows summing to 1.
+    df_buys is the notebook's buys frame (ticker, avg_investment, dates)."""
+    buys = df_buys
+    if params.representatives is not None:
+        buys = buys[buys['representative_name'].isin(params.representatives)]
+    if params.tickers is not None:
+        buys = buys[buys['ticker'].isin(params.tickers)]
+    entry = pd.to_datetime(buys[params.entry_date], errors='coerce') + pd.Timedelta(days=params.entry_lag_days)
+    valid = entry.notna().to_numpy()
+    if not valid.any():
+        return pd.DataFrame()
+
+    scores = pd.DataFrame({
+        'period': entry[valid].dt.to_period(params.rebalance),
+        'ticker': buys['ticker'].to_numpy()[valid],
+        'score': WEIGHTINGS[params.weighting](buys['avg_investment'].to_numpy(dtype=float)[valid]),
+    })
+    scores = scores.pivot_table(index='period', columns='ticker', values='score', aggfunc='sum', fill_value=0)
+
+    if params.holding_periods > 1:
+        # Buys keep counting for holding_periods rebalances, including periods without new buys
+        full_range = pd.period_range(scores.index.min(), scores.index.max(), freq=scores.index.freq)
+        scores = scores.reindex(full_range, fill_value=0).rolling(params.holding_periods, min_periods=1).sum()
+    scores = scores[scores.sum(axis=1) > 0]
+    return scores.div(scores.sum(axis=1), axis=0)
+
+
+def summarize(results_df, initial_capital=100000):
+    """Performance metrics of a backtest, computed as in the notebook's calculate_detailed_metrics"""
+    if results_df.empty:
+        return dict.fromkeys(SUMMARY_COLUMNS[:5], np.nan)
+    values = results_df['portfolio_value']
+    final_value = values.iloc[-1]
+    years = (results_df.index[-1] - results_df.index[0]).days / 365.25
+    annualized = ((final_value / initial_capital) ** (1 / years) - 1) * 100 if years > 0 else 0.0
+    daily_returns = values.pct_change().dropna()
+    volatility = daily_returns.std() * np.sqrt(252) * 100 if len(daily_returns) > 1 else 0.0
+    return {
+        'total_return_pct': (final_value / initial_capital - 1) * 100,
+        'annualized_return_pct': annualized,
+        'volatility_pct': volatility,
+        'sharpe_ratio': (annualized / 100 - 0.02) / (volatility / 100) if volatility > 0 else 0.0,
+        'max_drawdown_pct': ((values - values.cummax()) / values.cummax()).min() * 100,
+    }
+
+
+def evaluate(params, df_buys, price_data, initial_capital=100000):
+    weights = build_weights(df_buys, params)
+    results_df = run_backtest(weights, price_data, initial_capital, verbose=False) if not weights.empty \
+        else pd.DataFrame()
+    summary = summarize(results_df, initial_capital)
+    summary['n_rebalances'] = len(weights)
+    summary['n_trades'] = int((weights > 0).to_numpy().sum())
+    return summary
+
+
+# Worker side: the price panel is a view on the shared memory block
+_worker_state = {}
+
+
+def _init_worker(shm_name, shape, dates, tickers, df_buys, initial_capital):
+    block = shared_memory.SharedMemory(name=shm_name)
+    prices = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+    _worker_state.update(block=block, df_buys=df_buys, initial_capital=initial_capital,
+                         price_data=pd.DataFrame(prices, index=pd.DatetimeIndex(dates), columns=tickers, copy=False))
+
+
+def _evaluate_in_worker(params):
+    return evaluate(params, _worker_state['df_buys'], _worker_state['price_data'], _worker_state['initial_capital'])
+
+
+def run_sweep(df_buys, price_data, variants, workers=None, initial_capital=100000):
+    """Backtest every StrategyParams of variants, returning one summary row per variant.
+
+    workers=None uses the sweep_workers setting from data_utils, workers=1 runs in process.
+    """
+    workers = sweep_workers if workers is None else workers
+    columns = ['representative_name', 'ticker', 'avg_investment', 'purchase_date', 'notification_date']
+    df_buys = df_buys[[column for column in columns if column in df_buys.columns]]
+    start = time.perf_counter()
+
+    if workers <= 1 or len(variants) <= 1:
+        summaries = [evaluate(params, df_buys, price_data, initial_capital) for params in variants]
+    else:
+        prices = np.ascontiguousarray(price_data.to_numpy(dtype=np.float64))
+        block = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+        try:
+            np.ndarray(prices.shape, dtype=np.float64, buffer=block.buf)[:] = prices
+            initargs = (block.name, prices.shape, price_data.index.to_numpy(), list(price_data.columns),
+                        df_buys, initial_capital)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+                summaries = list(executor.map(_evaluate_in_worker, variants, chunksize=max(1, len(variants) // (4 * workers))))
+        finally:
+            block.close()
+            block.unlink()
+
+    summary_df = pd.concat([pd.DataFrame(variants, columns=StrategyParams._fields),
+                            pd.DataFrame(summaries, columns=SUMMARY_COLUMNS)], axis=1)
+    print(f"🧪 Backtested {len(variants)} variants in {time.perf_counter() - start:.1f}s")
+    return summary_df.sort_values('sharpe_ratio', ascending=False, ignore_index=True)
+
+
+if __name__ == '__main__':
+    # python strategy_sweep.py [workers]: sweep over synthetic buys and fixture prices
+    from backtest import synthetic_inputs
+    weights, prices = synthetic_inputs(100)
+    rng = np.random.default_rng(0)
+    n_buys = 5000
+    purchase_dates = prices.index[rng.integers(len(prices), size=n_buys)]
+    synthetic_buys = pd.DataFrame({
+        'representative_name': rng.choice(['RepA', 'RepB', 'RepC', 'RepD'], n_buys),
+        'ticker': rng.choice(prices.columns, n_buys),
+        'avg_investment': rng.choice([8000.5, 32500.5, 75000.5, 175000.5], n_buys),
+        'purchase_date': purchase_dates,
+        'notification_date': purchase_dates + pd.to_timedelta(rng.integers(1, 45, n_buys), unit='D'),
+    })
+    variants = param_grid(rebalance=['W', 'M'], weighting=list(WEIGHTINGS), holding_periods=[1, 2, 4],
+                          entry_date=['purchase_date', 'notification_date'], entry_lag_days=[0, 2],
+                          representatives=[None, ('RepA', 'RepB')])
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(run_sweep(synthetic_buys, prices, variants, workers=workers).head(10).to_string())
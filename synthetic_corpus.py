@@ -0,0 +1,145 @@
+import argparse
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+from fd_index import PTR_FILING_TYPE
+from synthetic_data import ROWS_PER_PAGE, stock_names, synthetic_ptr_trades, write_pdf, write_ptr_pdf
+
+
+# Generates a stand-in for the clerk website's public files, for load tests
+# that must not touch disclosures-clerk.house.gov (see clerk_server.py):
+#
+# corpus/financial-pdfs/2025FD.zip         2025FD.txt index (and an XML copy)
+# corpus/financial-pdfs/2025FD.txt         the same index, as download_trading_pdfs reads it
+# corpus/ptr-pdfs/2025/20012345.pdf        periodic transaction reports (FilingType P)
+# corpus/financial-pdfs/2025/10012345.pdf  every other filing type
+#
+# PTRs hold 1 to 60 trades of stocks from the ticker mapping, in the layout
+# written by synthetic_data.write_ptr_pdf. A share of them is irregular: one
+# asset runs into its transaction type in the page text, so the pages holding
+# it only read with read_pdf's table fallback. Another share is malformed the
+# way real ones are: scanned (a page image, no text layer), filled by hand (no
+# typed dates) or truncated (an unreadable file), which pdf_triage should
+# quarantine.
+
+INDEX_COLUMNS = ['Prefix', 'Last', 'First', 'Suffix', 'FilingType', 'StateDst', 'Year', 'FilingDate', 'DocID']
+OTHER_FILING_TYPES = ['O', 'A', 'C', 'D', 'X', 'W', 'T']
+MALFORMED_KINDS = ['scanned', 'handwritten', 'truncated']
+# Longest asset name printed flush against its transaction type, wider ones would leave the asset cell
+MAX_FLUSH_NAME = 30
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore',
+              'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Lewis']
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah']
+STATES = ['CA', 'TX', 'FL', 'NY', 'PA', 'IL', 'OH', 'GA', 'NC', 'MI']
+
+
+def synthetic_index(year, n_filings, ptr_share=0.6, n_members=440, seed=0):
+    """FD index entries of a year, as a frame with the INDEX_COLUMNS"""
+    rng = np.random.default_rng(seed)
+    members = rng.integers(0, len(LAST_NAMES) * len(FIRST_NAMES), n_members)
+    filers = members[rng.integers(0, n_members, n_filings)]
+    is_ptr = rng.random(n_filings) < ptr_share
+    filing_dates = pd.Timestamp(year, 1, 1) + pd.to_timedelta(rng.integers(0, 365, n_filings), unit='D')
+    doc_ids = np.where(is_ptr, 20000000, 10000000) + year % 100 * 100000 + np.arange(n_filings)
+    return pd.DataFrame({
+        'Prefix': 'Hon.',
+        'Last': np.array(LAST_NAMES)[filers // len(FIRST_NAMES)],
+        'First': np.array(FIRST_NAMES)[filers % len(FIRST_NAMES)],
+        'Suffix': '',
+        'FilingType': np.where(is_ptr, PTR_FILING_TYPE, rng.choice(OTHER_FILING_TYPES, n_filings)),
+        'StateDst': [f'{STATES[filer % len(STATES)]}{filer % 30 + 1:02d}' for filer in filers],
+        'Year': str(year),
+        'FilingDate': [f'{date.month}/{date.day}/{date.year}' for date in filing_dates],
+        'DocID': doc_ids.astype(str),
+    })
+
+
+def write_index(index_df, year, folder):
+    """Write {year}FD.txt and {year}FD.zip (txt + xml members) into folder"""
+    txt = index_df.to_csv(sep='\t', index=False, lineterminator='\r\n', columns=INDEX_COLUMNS)
+    rows = ''.join('<Member>' + ''.join(f'<{column}>{value}</{column}>' for column, value in zip(INDEX_COLUMNS, row))
+                   + '</Member>' for row in index_df[INDEX_COLUMNS].itertuples(index=False))
+    with open(os.path.join(folder, f'{year}FD.txt'), 'w', encoding='utf-8', newline='') as txt_file:
+        txt_file.write(txt)
+    with zipfile.ZipFile(os.path.join(folder, f'{year}FD.zip'), 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(f'{year}FD.txt', txt)
+        zip_file.writestr(f'{year}FD.xml', f'<?xml version="1.0" encoding="utf-8"?><FinancialDisclosure>{rows}'
+                                           f'</FinancialDisclosure>')
+
+
+def write_malformed_pdf(path, kind, trades_df):
+    if kind == 'scanned':
+        # The whole page is an image, there is no text layer
+        write_pdf(path, [([], [], [(40, 100, 532, 640)])])
+    elif kind == 'handwritten':
+        # The blank form's printed text, without any typed transaction
+        write_pdf(path, [([], [(40, 750, 'Periodic Transaction Report'), (40, 700, 'Asset Transaction Type Date '
+                                                                          'Notification Date Amount'),
+                               (40, 680, 'Filer Status: Member  State/District:'),
+                               (40, 70, 'Certification and Signature')])])
+    else:
+        write_ptr_pdf(path, trades_df)
+        with open(path, 'r+b') as pdf_file:
+            pdf_file.truncate(os.path.getsize(path) // 3)
+
+
+def generate_corpus(root, years, n_filings, ptr_share=0.6, malformed_share=0.05, irregular_share=0.05, seed=0):
+    """Write the index and documents of every year under root. Returns the number of PDFs per kind."""
+    names = stock_names()
+    counts = {'ptr': 0, 'irregular': 0, 'other': 0, **dict.fromkeys(MALFORMED_KINDS, 0)}
+    for year in years:
+        rng = np.random.default_rng(seed + year)
+        index_df = synthetic_index(year, n_filings, ptr_share, seed=seed + year)
+        financial_folder = os.path.join(root, 'financial-pdfs')
+        os.makedirs(os.path.join(financial_folder, str(year)), exist_ok=True)
+        os.makedirs(os.path.join(root, 'ptr-pdfs', str(year)), exist_ok=True)
+        write_index(index_df, year, financial_folder)
+
+        for entry in index_df.itertuples(index=False):
+            filer_name = f'{entry.Prefix} {entry.First} {entry.Last}'
+            if entry.FilingType != PTR_FILING_TYPE:
+                write_pdf(os.path.join(financial_folder, str(year), f'{entry.DocID}.pdf'),
+                          [([], [(40, 750, 'Financial Disclosure Report'), (40, 735, f'Filing ID #{entry.DocID}'),
+                                 (40, 720, f'Name: {filer_name}')])])
+                counts['other'] += 1
+                continue
+
+            # Most PTRs report a handful of trades, a few report dozens
+            n_trades = int(min(1 + rng.geometric(0.25), ROWS_PER_PAGE * 3 + 6))
+            trades_df = synthetic_ptr_trades(n_trades, seed=int(entry.DocID), names=names,
+                                             start=f'{year}-01-01', end=f'{year}-12-31')
+            path = os.path.join(root, 'ptr-pdfs', str(year), f'{entry.DocID}.pdf')
+            flush_rows = np.flatnonzero(trades_df['stock_name'].str.len() <= MAX_FLUSH_NAME)[:1]
+            if rng.random() < malformed_share:
+                kind = MALFORMED_KINDS[rng.integers(len(MALFORMED_KINDS))]
+                write_malformed_pdf(path, kind, trades_df)
+                counts[kind] += 1
+            elif rng.random() < irregular_share and len(flush_rows):
+                write_ptr_pdf(path, trades_df, filer_name=filer_name, doc_id=entry.DocID, flush_rows=flush_rows)
+                counts['irregular'] += 1
+            else:
+                write_ptr_pdf(path, trades_df, filer_name=filer_name, doc_id=entry.DocID)
+                counts['ptr'] += 1
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic clerk disclosure corpus')
+    parser.add_argument('root', help='output folder, served by clerk_server.py')
+    parser.add_argument('--years', type=int, nargs='+', default=[2025])
+    parser.add_argument('--filings', type=int, default=1000, help='index entries per year')
+    parser.add_argument('--ptr-share', type=float, default=0.6, help='share of periodic transaction reports')
+    parser.add_argument('--malformed-share', type=float, default=0.05, help='share of malformed PTRs')
+    parser.add_argument('--irregular-share', type=float, default=0.05,
+                        help='share of PTRs only the table extractor reads in full')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate_corpus(args.root, args.years, args.filings, args.ptr_share, args.malformed_share,
+                             args.irregular_share, args.seed)
+    summary = ', '.join(f'{count} {kind}' for kind, count in counts.items())
+    print(f"🏭 Wrote {sum(counts.values())} PDFs to {args.root}: {summary}")
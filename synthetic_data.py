@@ -0,0 +1,201 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+from pdfminer.fontmetrics import FONT_METRICS
+from amount_codec import AMOUNT_CODES
+from ticker_resolver import MAPPING_PATH
+
+
+# Deterministic stand-ins for the real inputs, so the pipeline can be run and
+# timed offline: trades frames shaped like load_trades output, price panels,
+# and PTR PDFs written in the layout of the clerk's electronic filings (a ruled
+# transaction table, header repeated on every page, the IPO and certification
+# sections after it), which both read_pdf extractors handle.
+#
+# The PDFs are written by hand with the standard Helvetica font, nothing else
+# is needed to produce them. Pages can also hold gray images, standing in for
+# the scans of paper filings.
+
+TABLE_HEADER = ['ID', 'Owner', 'Asset', 'Transaction\nType', 'Date', 'Notification\nDate', 'Amount',
+                'Cap.\nGains >\n$200?']
+# Left edge of every column, and the right edge of the table
+COLUMN_X = [40, 70, 110, 300, 350, 410, 470, 540, 580]
+ROWS_PER_PAGE = 18
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+FONT_SIZE = 8
+# Side of the gray images, in pixels
+IMAGE_PIXELS = 64
+FLAGS = ['P', 'S', 'S (partial)', 'E']
+FLAG_WEIGHTS = [0.55, 0.25, 0.15, 0.05]
+OWNERS = ['', 'SP', 'JT', 'DC']
+_RANGES = [AMOUNT_CODES[code] for code in range(1, 10)]
+_RANGE_WEIGHTS = np.array([0.55, 0.25, 0.1, 0.05, 0.02, 0.015, 0.01, 0.004, 0.001])
+
+
+def stock_names(path=MAPPING_PATH):
+    """Purchase names of the ticker mapping, as they appear in the filings"""
+    with open(path, 'r', newline='', encoding='utf-8') as mapping_file:
+        return [row['purchase name'] for row in csv.DictReader(mapping_file) if row['purchase name']]
+
+
+def synthetic_trades(n_trades, n_representatives=200, start='2022-01-01', end='2024-12-31', seed=0, names=None):
+    """Trades frame shaped like the output of load_trades (before add_tickers)"""
+    rng = np.random.default_rng(seed)
+    names = names or stock_names()
+    codes = rng.choice(len(_RANGES), n_trades, p=_RANGE_WEIGHTS / _RANGE_WEIGHTS.sum())
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    purchase_dates = start + pd.to_timedelta(rng.integers(0, (end - start).days + 1, n_trades), unit='D')
+    notification_dates = purchase_dates + pd.to_timedelta(rng.integers(1, 45, n_trades), unit='D')
+    n_disclosures = max(1, n_trades // 5)
+    disclosure_ids = 20000000 + rng.integers(0, n_disclosures, n_trades)
+    return pd.DataFrame({
+        'representative_name': np.array([f'Member{i:03d}' for i in range(n_representatives)])[
+            disclosure_ids % n_representatives],
+        'stock_name': np.array(names, dtype=object)[rng.integers(0, len(names), n_trades)],
+        'buy_sell_flag': rng.choice(FLAGS, n_trades, p=FLAG_WEIGHTS),
+        'purchase_date': purchase_dates.strftime('%m/%d/%Y'),
+        'notification_date': notification_dates.strftime('%m/%d/%Y'),
+        'invested_amount': [_RANGES[code][2] for code in codes],
+        'disclosure_id': disclosure_ids.astype(str),
+        'filing_row': np.arange(n_trades) % 5,
+    })
+
+
+def synthetic_prices(n_tickers, start='2022-01-01', end='2024-12-31'):
+    """Business day close panel of n_tickers fixture tickers (see price_providers.FixtureProvider)"""
+    from price_providers import FixtureProvider
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    return pd.DataFrame({f'T{i:04d}': FixtureProvider.fixture_bars(f'T{i:04d}', start, end)['Close']
+                         for i in range(n_tickers)})
+
+
+def _pdf_text(text):
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+def _text_width(text):
+    """Width of text in points, in Helvetica at FONT_SIZE"""
+    widths = FONT_METRICS['Helvetica'][1]
+    return sum(widths.get(char, 556) for char in text) * FONT_SIZE / 1000
+
+
+def _page_stream(lines, strings, images=()):
+    """Content stream drawing line segments (x1, y1, x2, y2), strings (x, y, text)
+    and images (x, y, width, height), the images being named Im0, Im1..."""
+    commands = ['0.5 w']
+    commands += [f'{x1} {y1} m {x2} {y2} l S' for x1, y1, x2, y2 in lines]
+    commands += [f'BT /F1 {FONT_SIZE} Tf {x} {y} Td {_pdf_text(text)} Tj ET' for x, y, text in strings]
+    commands += [f'q {width} 0 0 {height} {x} {y} cm /Im{i} Do Q' for i, (x, y, width, height) in enumerate(images)]
+    return '\n'.join(commands).encode('latin-1', 'replace')
+
+
+def _image_object():
+    """A gray IMAGE_PIXELS square image XObject, a noisy pattern like a scanned page"""
+    pixels = bytes((x * 7 + y * 13 + (x * y) % 31) % 256 for y in range(IMAGE_PIXELS) for x in range(IMAGE_PIXELS))
+    return (b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray '
+            b'/BitsPerComponent 8 /Length %d >>\nstream\n' % (IMAGE_PIXELS, IMAGE_PIXELS, len(pixels))
+            + pixels + b'\nendstream')
+
+
+def _table_page(rows, top=700, row_height=30, flush_rows=()):
+    """Lines and strings of one page of the transaction table, rows being lists of cell texts.
+    The asset of the rows in flush_rows is printed flush against the transaction type
+    cell, the way filings without cell padding are, so their text runs the two together."""
+    lines, strings = [], []
+    y = top
+    for row_number, row in enumerate([TABLE_HEADER] + rows):
+        lines.append((COLUMN_X[0], y + 12, COLUMN_X[-1], y + 12))
+        for column, (x, cell) in enumerate(zip(COLUMN_X, row)):
+            for i, cell_line in enumerate(cell.split('\n')):
+                cell_x = x + 2
+                if column == 2 and row_number - 1 in flush_rows:
+                    cell_x = max(cell_x, round(COLUMN_X[3] - 0.5 - _text_width(cell_line), 2))
+                strings.append((cell_x, y - i * 9, cell_line))
+        y -= row_height
+    lines.append((COLUMN_X[0], y + 12, COLUMN_X[-1], y + 12))
+    lines += [(x, top + 12, x, y + 12) for x in COLUMN_X]
+    return lines, strings, y
+
+
+def write_pdf(path, pages):
+    """Write a PDF whose pages are (lines, strings) pairs or (lines, strings, images)
+    triples, see _page_stream"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>']
+    page_ids = []
+    for lines, strings, *images in pages:
+        images = images[0] if images else []
+        xobjects = []
+        for i in range(len(images)):
+            objects.append(_image_object())
+            xobjects.append(b'/Im%d %d 0 R' % (i, len(objects)))
+        stream = _page_stream(lines, strings, images)
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        resources = b'/Font << /F1 3 0 R >>' + (b' /XObject << %s >>' % b' '.join(xobjects) if xobjects else b'')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+                       b'/Resources << %s >> >>' % (PAGE_WIDTH, PAGE_HEIGHT, len(objects), resources))
+        page_ids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % page_id for page_id in page_ids), len(page_ids))
+
+    content = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(content)
+    content += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    content += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    content += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as pdf_file:
+        pdf_file.write(content)
+
+
+def write_ptr_pdf(path, trades_df, filer_name='Hon. Jane Doe', doc_id='20000000', flush_rows=()):
+    """Write the trades (COLUMN_NAMES of read_pdf, raw amounts) as a periodic transaction report.
+    The assets of the trades at the positions in flush_rows run into their transaction type
+    in the page text (see _table_page), so that only the table extractor reads their pages."""
+    rows = []
+    for trade in trades_df.itertuples(index=False):
+        low, _, high = trade.invested_amount.partition(' - ')
+        amount = f'{low} -\n{high}' if high else trade.invested_amount
+        owner = getattr(trade, 'owner', '') or ''
+        rows.append(['', owner, trade.stock_name, trade.buy_sell_flag, trade.purchase_date,
+                     trade.notification_date, amount, ''])
+
+    pages = []
+    for first in range(0, max(len(rows), 1), ROWS_PER_PAGE):
+        page_flush_rows = {row - first for row in flush_rows if first <= row < first + ROWS_PER_PAGE}
+        lines, strings, bottom = _table_page(rows[first:first + ROWS_PER_PAGE], flush_rows=page_flush_rows)
+        if not pages:
+            strings += [(40, 750, 'Periodic Transaction Report'), (40, 735, f'Filing ID #{doc_id}'),
+                        (300, 735, f'Name: {filer_name}')]
+        pages.append((lines, strings))
+    # Sections printed after the transaction table, on the last page
+    pages[-1][1].extend([(40, 90, 'Initial Public Offerings'),
+                         (40, 70, 'Certification and Signature'),
+                         (40, 55, f'Digitally Signed: {filer_name}')])
+    write_pdf(path, pages)
+
+
+def synthetic_ptr_trades(n_rows, seed=0, names=None, **kwargs):
+    """Rows of one PTR, in read_pdf's COLUMN_NAMES plus the owner column (kwargs go to synthetic_trades)"""
+    trades_df = synthetic_trades(n_rows, seed=seed, names=names, **kwargs)
+    rng = np.random.default_rng(seed)
+    trades_df['owner'] = rng.choice(OWNERS, n_rows)
+    return trades_df
+
+
+def write_fixture_pdfs(folder, n_pdfs, rows_per_pdf=10, seed=0):
+    """Write n_pdfs PTRs named like the downloaded ones (LastFirst_DocID.pdf), returning their paths"""
+    os.makedirs(folder, exist_ok=True)
+    names = stock_names()
+    paths = []
+    for i in range(n_pdfs):
+        doc_id = str(20000000 + i)
+        path = os.path.join(folder, f'Member{i:03d}Fixture_{doc_id}.pdf')
+        write_ptr_pdf(path, synthetic_ptr_trades(rows_per_pdf, seed=seed + i, names=names), doc_id=doc_id)
+        paths.append(path)
+    return paths
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+from amount_codec import amount_midpoint, decode_amounts
+from trade_cube import trade_cells
+
+
+def test_open_ended_amounts_count_at_their_lower_bound():
+    codes = decode_amounts(pd.Series(['$1,001 - $15,000', 'Over $50,000,000', 'Spouse/DC Over $1,000,000',
+                                      '$12,345.00', 'n/a']))
+    assert codes['amount_code'].tolist() == [1, 10, 11, 12, 0]
+    midpoints = amount_midpoint(codes)
+    assert midpoints[:4].tolist() == [8000.5, 50000001.0, 1000001.0, 12345.0]
+    assert np.isnan(midpoints[4])
+
+
+def test_open_ended_amounts_are_in_the_cube_cells():
+    raw = pd.Series(['Over $50,000,000', 'Spouse/DC Over $1,000,000', '$1,001 - $15,000'])
+    trades_df = pd.concat([pd.DataFrame({
+        'representative_name': 'Doe', 'stock_name': 'Apple Inc.', 'buy_sell_flag': 'P',
+        'purchase_date': '03/04/2024', 'notification_date': '03/10/2024', 'ticker': 'AAPL',
+        'disclosure_id': '20000001', 'filing_row': range(3)}), decode_amounts(raw)], axis=1)
+    cells = trade_cells(trades_df)
+    assert cells['n_trades'].tolist() == [3]
+    assert cells['amount'].tolist() == [50000001.0 + 1000001.0 + 8000.5]
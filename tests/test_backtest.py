@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from amount_codec import amount_midpoint, decode_amounts
+from backtest import check_parity, reference_backtest, run_backtest, RESULT_COLUMNS
+from strategy_sweep import StrategyParams, build_weights
+from synthetic_data import synthetic_prices, synthetic_trades
+
+START, END = '2023-01-01', '2023-12-31'
+
+
+def synthetic_buys(n_trades, tickers, seed=0):
+    """Buys frame as build_weights takes it, over the given tickers"""
+    trades_df = synthetic_trades(n_trades, start=START, end=END, seed=seed, names=['Apple Inc.'])
+    codes = decode_amounts(trades_df['invested_amount'])
+    return pd.DataFrame({
+        'representative_name': trades_df['representative_name'],
+        'ticker': np.random.default_rng(seed).choice(tickers, n_trades),
+        'avg_investment': amount_midpoint(codes),
+        'purchase_date': pd.to_datetime(trades_df['purchase_date'], format='%m/%d/%Y'),
+        'notification_date': pd.to_datetime(trades_df['notification_date'], format='%m/%d/%Y'),
+    })
+
+
+@pytest.fixture(scope='module')
+def prices():
+    prices = synthetic_prices(30, START, END)
+    # Some tickers only list during the year, the engines have to skip them until then
+    for offset, ticker in enumerate(prices.columns[::6]):
+        prices.loc[:prices.index[20 * (offset + 1)], ticker] = np.nan
+    return prices
+
+
+@pytest.mark.parametrize('params', [
+    StrategyParams(),
+    StrategyParams(rebalance='M', weighting='log_amount', holding_periods=3),
+    StrategyParams(weighting='equal', entry_date='notification_date', entry_lag_days=2),
+])
+def test_run_backtest_matches_reference(prices, params):
+    weights = build_weights(synthetic_buys(2000, list(prices.columns)), params)
+    fast = run_backtest(weights, prices, verbose=False)
+    slow = reference_backtest(weights, prices)
+
+    pd.testing.assert_index_equal(fast.index, slow.index)
+    np.testing.assert_allclose(fast[RESULT_COLUMNS].to_numpy(), slow[RESULT_COLUMNS].to_numpy(), rtol=1e-9, atol=1e-6)
+    assert check_parity(weights, prices) <= 1e-9
@@ -0,0 +1,27 @@
+import glob
+import os
+import shutil
+
+import pipeline_metrics
+from conftest import REPO_ROOT
+from load_trades import iter_trades
+from synthetic_corpus import generate_corpus
+from ticker_resolver import MAPPING_PATH
+
+
+def test_irregular_ptrs_fall_back_to_tables_and_scans_are_quarantined(tmp_path, monkeypatch):
+    # The quarantine manifest, parse cache and disclosure state are written in the working folder
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('mappings')
+    shutil.copy(os.path.join(REPO_ROOT, MAPPING_PATH), MAPPING_PATH)
+    counts = generate_corpus('corpus', [2025], 60, ptr_share=1.0, malformed_share=0.2, irregular_share=0.3)
+    assert counts['irregular'] and counts['scanned']
+
+    pipeline_metrics.start_run('test')
+    paths = sorted(glob.glob(os.path.join('corpus', 'ptr-pdfs', '2025', '*.pdf')))
+    frames = list(iter_trades(paths, workers=1, use_cache=False, state_db='state.db'))
+    counters = pipeline_metrics.stage_records()[0]['counters']
+    assert counters['pdfs_by_extractor{extractor=table}'] == counts['irregular']
+    assert counters['pdfs_by_extractor{extractor=text}'] == counts['ptr']
+    assert counters['parse_failures{reason=image only}'] == counts['scanned']
+    assert len(frames) == counts['ptr'] + counts['irregular']
@@ -0,0 +1,88 @@
+import json
+import os
+
+import pandas as pd
+import price_store
+from price_providers import FixtureProvider
+from price_store import last_complete_session, read_bars, update_prices
+
+
+class LaggingProvider(FixtureProvider):
+    """Fixture prices published up to published_until only, recording every range asked for"""
+
+    def __init__(self, published_until, **kwargs):
+        super().__init__(**kwargs)
+        self.published_until = pd.Timestamp(published_until)
+        self.requests = []
+
+    def fetch_batch(self, tickers, start, end):
+        self.requests.append((tuple(tickers), pd.Timestamp(start), pd.Timestamp(end)))
+        return {ticker: self.fixture_bars(ticker, start, min(pd.Timestamp(end), self.published_until))
+                for ticker in tickers}
+
+
+def coverage(store):
+    with open(os.path.join(store, 'coverage.json'), encoding='utf-8') as coverage_file:
+        return json.load(coverage_file)
+
+
+def test_range_already_covered_is_not_fetched_again(tmp_path):
+    store = str(tmp_path)
+    provider = LaggingProvider('2024-12-31')
+    assert update_prices(['AAPL'], '2024-03-01', '2024-03-08', store, provider) == ['AAPL']
+    assert coverage(store)['AAPL'] == ['2024-03-01', '2024-03-08']
+
+    update_prices(['AAPL'], '2024-03-04', '2024-03-06', store, provider)
+    assert len(provider.requests) == 1
+
+
+def test_weekend_end_is_covered_after_one_fetch(tmp_path):
+    store = str(tmp_path)
+    provider = LaggingProvider('2024-12-31')
+    for _ in range(3):
+        update_prices(['AAPL'], '2024-03-04', '2024-03-09', store, provider)  # Ends on a Saturday
+    assert len(provider.requests) == 1
+    assert coverage(store)['AAPL'] == ['2024-03-04', '2024-03-09']
+
+
+def test_lagging_provider_is_asked_again_once_the_ttl_expired(tmp_path, monkeypatch):
+    store = str(tmp_path)
+    provider = LaggingProvider('2024-03-06')
+    update_prices(['AAPL'], '2024-03-01', '2024-03-08', store, provider)
+    assert coverage(store)['AAPL'] == ['2024-03-01', '2024-03-08']
+    assert read_bars('AAPL', store).index.max() == pd.Timestamp('2024-03-06')
+
+    # Within the TTL the missing sessions are not asked for again
+    update_prices(['AAPL'], '2024-03-01', '2024-03-08', store, provider)
+    assert len(provider.requests) == 1
+
+    monkeypatch.setattr(price_store, 'price_lag_ttl_hours', 0)
+    provider.published_until = pd.Timestamp('2024-03-08')
+    update_prices(['AAPL'], '2024-03-01', '2024-03-08', store, provider)
+    assert provider.requests[-1][1:] == (pd.Timestamp('2024-03-07'), pd.Timestamp('2024-03-08'))
+    expected = FixtureProvider.fixture_bars('AAPL', '2024-03-01', '2024-03-08')
+    pd.testing.assert_series_equal(read_bars('AAPL', store)['Close'], expected['Close'], check_freq=False)
+
+    # Caught up: nothing left to ask for, whatever the TTL
+    update_prices(['AAPL'], '2024-03-01', '2024-03-08', store, provider)
+    assert len(provider.requests) == 2
+
+
+def test_todays_bar_is_never_fetched(tmp_path):
+    store = str(tmp_path)
+    today = pd.Timestamp.today().normalize()
+    provider = LaggingProvider(today)
+    update_prices(['AAPL'], today - pd.Timedelta(days=10), today, store, provider)
+    assert pd.Timestamp(coverage(store)['AAPL'][1]) == last_complete_session()
+    assert all(request_end < today for _, _, request_end in provider.requests)
+
+    update_prices(['AAPL'], today - pd.Timedelta(days=10), today, store, provider)
+    assert len(provider.requests) == 1
+
+
+def test_unknown_tickers_are_remembered(tmp_path):
+    store = str(tmp_path)
+    provider = LaggingProvider('2024-12-31')
+    assert update_prices(['AAPL', 'DELISTED1'], '2024-03-01', '2024-03-08', store, provider) == ['AAPL']
+    update_prices(['DELISTED1'], '2024-03-01', '2024-03-08', store, provider)
+    assert len(provider.requests) == 1
@@ -0,0 +1,163 @@
+import difflib
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+
+# Maps the raw asset names parsed out of the PTR PDFs to tickers.
+#
+# The same security shows up under many spellings ("Walt Disney Company (DIS) [ST]",
+# "SP Walt Disney Company", names cut at the end of a table line...), so names
+# are looked up by a normalized key rather than verbatim. Resolution works on the
+# unique names of a frame at once:
+#   1. an explicit "(TICKER)" token in the name wins,
+#   2. then the name exactly as listed in mappings/all_stocks.csv,
+#   3. then the normalized name index built from the same file,
+#   4. then a fuzzy match of the normalized name against that index.
+# Tickers found by 1. and 4. for names the index did not know are appended to
+# mappings/learned_stocks.csv, which is loaded back next time, so each new
+# spelling is only matched once. all_stocks.csv stays the hand curated list.
+
+MAPPING_PATH = os.path.join('mappings', 'all_stocks.csv')
+LEARNED_PATH = os.path.join('mappings', 'learned_stocks.csv')
+MAPPING_COLUMNS = ['purchase name', 'ticker', 'extra_info']
+
+# Similarity (difflib ratio) a fuzzy match needs to be trusted. Candidates must
+# also start with the same word, which keeps "Aeon ... ADR" away from "Haleon ... ADR"
+# and means each name is only compared to a handful of keys however large the index grows
+FUZZY_CUTOFF = 0.9
+
+# Last "(XYZ)" token of the name, e.g. "Apple Inc. - Common Stock (AAPL)" or "(BRK.B)"
+TICKER_PATTERN = re.compile(r'.*\(([A-Z][A-Z0-9]{0,5}(?:[.\-][A-Z])?)\)')
+# Asset type codes such as [ST], [OP], [HN]
+ASSET_TYPE_PATTERN = re.compile(r'\[[A-Z]{2}\]')
+# Filing row id and owner column glued in front of the name: SP (spouse), JT (joint), DC (dependent child)
+OWNER_PATTERN = re.compile(r'^(?:\d{6,}\s+)?(?:SP|JT|DC)\s+')
+# Wording that varies between spellings of the same security
+NOISE_WORDS = re.compile(r'\b(?:THE|COMMON|STOCK|SHARES|ORDINARY|INC|INCORPORATED|CORP|CORPORATION|'
+                         r'CO|COMPANY|LTD|PLC|LLC)\b')
+
+
+def normalize_names(names):
+    """Vectorized normalization of a Series of asset names into lookup keys"""
+    names = names.astype('string').str.strip()
+    names = names.str.replace(OWNER_PATTERN, '', regex=True)
+    names = names.str.replace(ASSET_TYPE_PATTERN, ' ', regex=True)
+    names = names.str.replace(r'\([^)]*\)?', ' ', regex=True)
+    names = names.str.upper().str.replace('&', ' AND ', regex=False)
+    names = names.str.replace(r'[^A-Z0-9 ]', ' ', regex=True)
+    names = names.str.replace(NOISE_WORDS, ' ', regex=True)
+    return names.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def extract_explicit_tickers(names):
+    """Vectorized extraction of the "(TICKER)" token of each name, <NA> where there is none"""
+    return names.astype('string').str.extract(TICKER_PATTERN, expand=False)
+
+
+def _read_mapping(path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=MAPPING_COLUMNS)
+    mapping_df = pd.read_csv(path, dtype=str)
+    mapping_df.columns = MAPPING_COLUMNS[:len(mapping_df.columns)]
+    return mapping_df.dropna(subset=['purchase name', 'ticker'])
+
+
+class TickerResolver:
+    """Normalized name -> ticker index, loaded once and grown as new spellings are matched"""
+
+    def __init__(self, mapping_df, learned_path=LEARNED_PATH):
+        self.learned_path = learned_path
+        self.learned = {}
+        self.exact = {}
+        self.index = {}
+        self._add_to_index(mapping_df['purchase name'], mapping_df['ticker'])
+
+    @classmethod
+    def from_csv(cls, mapping_path=MAPPING_PATH, learned_path=LEARNED_PATH):
+        mapping_df = pd.concat([_read_mapping(mapping_path), _read_mapping(learned_path)], ignore_index=True)
+        return cls(mapping_df, learned_path)
+
+    def _add_to_index(self, names, tickers):
+        self.exact.update(zip(names.str.strip(), tickers.str.strip()))
+        keys_df = pd.DataFrame({'key': normalize_names(names), 'ticker': tickers.str.strip()})
+        keys_df = keys_df[keys_df['key'].str.len() > 0].drop_duplicates()
+        # A key two different tickers share (e.g. share classes cut short) is no use for lookups
+        ambiguous = keys_df['key'].duplicated(keep=False)
+        self.index.update(zip(keys_df.loc[~ambiguous, 'key'], keys_df.loc[~ambiguous, 'ticker']))
+        for key in keys_df.loc[ambiguous, 'key'].unique():
+            self.index.pop(key, None)
+        self._fuzzy_match.cache_clear()
+        self._choices = {}
+        for key in self.index:
+            self._choices.setdefault(key.split(' ', 1)[0], []).append(key)
+
+    @lru_cache(maxsize=None)
+    def _fuzzy_match(self, key):
+        choices = self._choices.get(key.split(' ', 1)[0], [])
+        matches = difflib.get_close_matches(key, choices, n=1, cutoff=FUZZY_CUTOFF)
+        return self.index[matches[0]] if matches else None
+
+    def _learn(self, names, tickers, new, source):
+        """Remember the spellings the index did not know yet"""
+        if not new.any():
+            return
+        self.learned.update((name, (ticker, source)) for name, ticker in zip(names[new], tickers[new]))
+        self._add_to_index(names[new], tickers[new])
+
+    def resolve(self, names):
+        """Tickers for a Series of raw asset names (same index), <NA> when nothing matched.
+        Every step runs once per distinct name, not once per row."""
+        codes, unique_names = pd.factorize(names.astype('string'))
+        unique_names = pd.Series(unique_names, dtype='string')
+        keys = normalize_names(unique_names)
+
+        explicit = extract_explicit_tickers(unique_names)
+        indexed = unique_names.str.strip().map(self.exact).astype('string')
+        indexed = indexed.fillna(keys.map(self.index).astype('string'))
+        tickers = explicit.fillna(indexed)
+        # Spellings carrying their ticker are indexed first, so they can serve the fuzzy matches below
+        self._learn(unique_names, tickers, explicit.notna() & indexed.isna(), 'explicit')
+
+        unresolved = tickers.isna() & (keys.str.len() > 0)
+        fuzzy = pd.Series({i: self._fuzzy_match(keys[i]) for i in unresolved[unresolved].index},
+                          dtype='string')
+        tickers = tickers.fillna(fuzzy)
+        self._learn(unique_names, tickers, unresolved & tickers.notna(), 'fuzzy')
+
+        resolved = tickers.to_numpy()[codes]
+        resolved[codes == -1] = pd.NA
+        return pd.Series(resolved, index=names.index, dtype='string')
+
+    def save_learned(self):
+        """Append the mappings learned since the last save to learned_stocks.csv"""
+        if not self.learned:
+            return 0
+        learned_df = pd.DataFrame([(name, ticker, source) for name, (ticker, source) in self.learned.items()],
+                                  columns=MAPPING_COLUMNS)
+        write_header = not os.path.exists(self.learned_path)
+        learned_df.to_csv(self.learned_path, mode='a', header=write_header, index=False)
+        n_learned = len(self.learned)
+        self.learned = {}
+        return n_learned
+
+
+_resolver = None
+
+
+def get_resolver():
+    """Resolver shared by every call in the process, the mapping files are read only once"""
+    global _resolver
+    if _resolver is None:
+        _resolver = TickerResolver.from_csv()
+    return _resolver
+
+
+def reset_resolver(mapping_path=MAPPING_PATH, learned_path=LEARNED_PATH):
+    """Replace the shared resolver by a fresh one read from the given mapping files, e.g. to
+    forget the fuzzy matches cached so far or to learn into another file. Returns it."""
+    global _resolver
+    _resolver = TickerResolver.from_csv(mapping_path, learned_path)
+    return _resolver
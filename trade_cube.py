@@ -0,0 +1,215 @@
+import os
+import sqlite3
+
+import pandas as pd
+from amount_codec import amount_midpoint
+from price_store import NOT_TRADABLE
+from trade_store import TRADE_STORE, prepare_trades, read_trades
+
+
+# Materialized aggregates of the trades, so reports never scan the whole
+# history: number of trades, summed mid-point / min / max amounts and the
+# smallest and largest amount, per (period, representative, ticker, side) for
+# weekly ('W'), monthly ('M') and yearly ('Y') periods. Periods are stored as
+# their start date (weeks start on Monday), side is the first letter of the
+# buy/sell flag (P, S, E).
+#
+# stock_purchases/trade_cube.db
+#   cells   one row per disclosure and (week, representative, ticker, side)
+#   cube    the aggregates, indexed by ticker and by representative
+#
+# update_cube(trades_df, removed_ids) takes the trades of the disclosures an
+# upsert changed and the disclosures it removed (trade_store.UpsertResult): the
+# cells of those disclosures are replaced or dropped, and only the cube rows
+# whose cells changed are recomputed, so the cost follows the new trades, not
+# the history. Queries go through the cube indexes and cost O(rows returned).
+# rebuild_cube() starts over from the trade store (e.g. after rows without a
+# disclosure id were re-imported).
+
+CUBE_DB = os.path.join('stock_purchases', 'trade_cube.db')
+GRAINS = {'W': 'week', 'M': 'month', 'Y': 'year'}
+KEY_COLUMNS = ['representative_name', 'ticker', 'side']
+CUBE_COLUMNS = ['period', *KEY_COLUMNS, 'n_trades', 'amount', 'min_amount_sum', 'max_amount_sum',
+                'min_amount', 'max_amount']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cells (
+    disclosure_id TEXT NOT NULL,
+    week TEXT NOT NULL, month TEXT NOT NULL, year TEXT NOT NULL,
+    representative_name TEXT NOT NULL, ticker TEXT NOT NULL, side TEXT NOT NULL,
+    n_trades INTEGER NOT NULL, amount REAL, min_amount_sum REAL, max_amount_sum REAL,
+    min_amount REAL, max_amount REAL
+);
+CREATE INDEX IF NOT EXISTS cells_disclosure ON cells (disclosure_id);
+CREATE INDEX IF NOT EXISTS cells_week ON cells (representative_name, ticker, side, week);
+CREATE INDEX IF NOT EXISTS cells_month ON cells (representative_name, ticker, side, month);
+CREATE INDEX IF NOT EXISTS cells_year ON cells (representative_name, ticker, side, year);
+CREATE TABLE IF NOT EXISTS cube (
+    grain TEXT NOT NULL, period TEXT NOT NULL,
+    representative_name TEXT NOT NULL, ticker TEXT NOT NULL, side TEXT NOT NULL,
+    n_trades INTEGER NOT NULL, amount REAL, min_amount_sum REAL, max_amount_sum REAL,
+    min_amount REAL, max_amount REAL,
+    PRIMARY KEY (grain, period, representative_name, ticker, side)
+);
+CREATE INDEX IF NOT EXISTS cube_ticker ON cube (grain, side, ticker, period);
+CREATE INDEX IF NOT EXISTS cube_representative ON cube (grain, side, representative_name, period);
+"""
+
+_CELL_COLUMNS = ['disclosure_id', 'week', 'month', 'year', *KEY_COLUMNS, 'n_trades', 'amount',
+                 'min_amount_sum', 'max_amount_sum', 'min_amount', 'max_amount']
+
+
+def connect(path=CUBE_DB):
+    """Open (and create if needed) the cube database"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def trade_cells(trades_df):
+    """Per disclosure cells of a trades frame. Trades without a disclosure id share the '' disclosure."""
+    df = prepare_trades(trades_df)
+    dates = df['purchase_date']
+    cells = pd.DataFrame({
+        'disclosure_id': df['disclosure_id'].fillna(''),
+        'week': dates.dt.to_period('W').dt.start_time.dt.strftime('%Y-%m-%d'),
+        'month': dates.dt.to_period('M').dt.start_time.dt.strftime('%Y-%m-%d'),
+        'year': dates.dt.strftime('%Y-01-01'),
+        'representative_name': df['representative_name'].fillna(''),
+        'ticker': df['ticker'].fillna(''),
+        'side': df['buy_sell_flag'].str[:1].fillna(''),
+        'amount': amount_midpoint(df),
+        'min_amount': df['min_amount'],
+        'max_amount': df['max_amount'],
+    })
+    grouped = cells.groupby(['disclosure_id', 'week', 'month', 'year', *KEY_COLUMNS], dropna=False)
+    return grouped.agg(n_trades=('amount', 'size'), amount=('amount', 'sum'),
+                       min_amount_sum=('min_amount', 'sum'), max_amount_sum=('max_amount', 'sum'),
+                       min_amount=('min_amount', 'min'), max_amount=('max_amount', 'max')).reset_index()
+
+
+def update_cube(trades_df, path=CUBE_DB, removed_ids=()):
+    """Replace the cells of the disclosures in trades_df, drop the cells of removed_ids (e.g.
+    disclosures replaced by amendments), and recompute the cube rows they touch.
+    Returns the number of cube rows recomputed."""
+    if trades_df.empty and not removed_ids:
+        return 0
+    cells = trade_cells(trades_df) if not trades_df.empty else pd.DataFrame(columns=_CELL_COLUMNS)
+    # Rows without a disclosure id cannot be told apart from earlier ones and are only ever added
+    replaced = sorted((set(cells['disclosure_id']) | set(removed_ids)) - {''})
+
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute("CREATE TEMP TABLE touched (week TEXT, month TEXT, year TEXT, "
+                         "representative_name TEXT, ticker TEXT, side TEXT)")
+            conn.execute("CREATE TEMP TABLE replaced (disclosure_id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT INTO replaced VALUES (?)", [(doc_id,) for doc_id in replaced])
+            conn.execute("INSERT INTO touched SELECT week, month, year, representative_name, ticker, side "
+                         "FROM cells WHERE disclosure_id IN (SELECT disclosure_id FROM replaced)")
+            conn.execute("DELETE FROM cells WHERE disclosure_id IN (SELECT disclosure_id FROM replaced)")
+            conn.executemany(f"INSERT INTO cells ({', '.join(_CELL_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(_CELL_COLUMNS))})",
+                             cells[_CELL_COLUMNS].astype(object).where(cells[_CELL_COLUMNS].notna(), None)
+                             .itertuples(index=False, name=None))
+            conn.executemany("INSERT INTO touched VALUES (?, ?, ?, ?, ?, ?)",
+                             cells[['week', 'month', 'year', *KEY_COLUMNS]].itertuples(index=False, name=None))
+
+            recomputed = 0
+            for grain, column in GRAINS.items():
+                keys = (f"SELECT DISTINCT {column} AS period, representative_name, ticker, side FROM touched")
+                conn.execute(f"DELETE FROM cube WHERE grain = ? AND (period, representative_name, ticker, side) "
+                             f"IN ({keys})", (grain,))
+                recomputed += conn.execute(f"""
+                    INSERT INTO cube
+                    SELECT ?, cells.{column}, cells.representative_name, cells.ticker, cells.side,
+                           SUM(n_trades), SUM(amount), SUM(min_amount_sum), SUM(max_amount_sum),
+                           MIN(min_amount), MAX(max_amount)
+                    FROM ({keys}) AS keys
+                    JOIN cells ON cells.representative_name = keys.representative_name
+                              AND cells.ticker = keys.ticker AND cells.side = keys.side
+                              AND cells.{column} = keys.period
+                    GROUP BY cells.{column}, cells.representative_name, cells.ticker, cells.side
+                    """, (grain,)).rowcount
+            conn.execute("DROP TABLE touched")
+            conn.execute("DROP TABLE replaced")
+    finally:
+        conn.close()
+    return recomputed
+
+
+def rebuild_cube(root=TRADE_STORE, path=CUBE_DB):
+    """Drop the cube and compute it again from every trade of the store"""
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM cells")
+            conn.execute("DELETE FROM cube")
+    finally:
+        conn.close()
+    return update_cube(read_trades(root, categorical=False), path)
+
+
+def query_cube(grain='W', side='P', representatives=None, tickers=None, start_date=None, end_date=None,
+               tradable_only=True, path=CUBE_DB):
+    """Cube rows of a grain and side, optionally for some representatives or tickers and a period range
+    (periods starting within [start_date, end_date]). Tickers without a symbol are left out unless
+    tradable_only=False."""
+    conditions = ['grain = ?', 'side = ?']
+    parameters = [grain, side]
+    for column, values in (('representative_name', representatives), ('ticker', tickers)):
+        if values is not None:
+            values = list(values)
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            parameters += values
+    if tradable_only:
+        conditions.append(f"ticker NOT IN ({', '.join('?' * len(NOT_TRADABLE))})")
+        parameters += sorted(NOT_TRADABLE)
+    if start_date is not None:
+        conditions.append('period >= ?')
+        parameters.append(str(pd.Timestamp(start_date).date()))
+    if end_date is not None:
+        conditions.append('period <= ?')
+        parameters.append(str(pd.Timestamp(end_date).date()))
+
+    conn = connect(path)
+    try:
+        cube_df = pd.read_sql_query(f"SELECT {', '.join(CUBE_COLUMNS)} FROM cube WHERE {' AND '.join(conditions)} "
+                                    f"ORDER BY period, representative_name, ticker", conn, params=parameters)
+    finally:
+        conn.close()
+    cube_df['period'] = pd.to_datetime(cube_df['period'])
+    return cube_df
+
+
+def ticker_totals(side='P', path=CUBE_DB, **filters):
+    """Mid-point amount per ticker over all years, largest first"""
+    cube_df = query_cube('Y', side, path=path, **filters)
+    return cube_df.groupby('ticker')['amount'].sum().sort_values(ascending=False)
+
+
+def representative_activity(side='P', path=CUBE_DB, **filters):
+    """Number of trades and mid-point amount per representative, largest amount first"""
+    cube_df = query_cube('Y', side, path=path, **filters)
+    activity = cube_df.groupby('representative_name')[['n_trades', 'amount']].sum()
+    activity.columns = ['Number of Trades', 'Total Investment']
+    return activity.sort_values('Total Investment', ascending=False)
+
+
+def yearly_summary(side='P', path=CUBE_DB, **filters):
+    """Trades, mid-point amount and active representatives per year"""
+    cube_df = query_cube('Y', side, path=path, **filters)
+    summary = cube_df.groupby(cube_df['period'].dt.year).agg(
+        {'n_trades': 'sum', 'amount': 'sum', 'representative_name': 'nunique'}).round(2)
+    summary.index.name = 'year'
+    summary.columns = ['Total Trades', 'Total Investment', 'Unique Representatives']
+    return summary
+
+
+if __name__ == '__main__':
+    # python trade_cube.py: rebuild the cube from the trade store
+    n_rows = rebuild_cube()
+    print(f"🧊 Rebuilt {CUBE_DB}: {n_rows} cube rows")
@@ -0,0 +1,298 @@
+import csv
+import os
+import shutil
+import sys
+from collections import namedtuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from amount_codec import decode_amounts
+
+
+# Partitioned Parquet dataset of parsed trades, replacing the untyped
+# trades_{year}.csv / all_purchases files as the place the notebooks load from.
+#
+# stock_purchases/trade_store/year=2024/month=5/part-0.parquet
+#
+# Every column has an explicit type (dates are timestamps, names, flags and
+# tickers are dictionary encoded, amounts are floats plus their amount_codec
+# range code), so nothing is re-parsed on load, and readers only touch the
+# columns and year/month partitions they ask for.
+#
+# The FD index does not tell which earlier PTR an amended one replaces, so
+# amendments are recorded explicitly in an amendments manifest
+# (mappings/amendments.csv: disclosure_id, amends_disclosure_id). Once an
+# amending disclosure is stored, the rows of the disclosure it amends are
+# removed, and kept out if that one is parsed again. Entries are added by hand
+# or with add_amendments().
+
+TRADE_STORE = os.path.join('stock_purchases', 'trade_store')
+AMENDMENTS_MANIFEST = os.path.join('mappings', 'amendments.csv')
+AMENDMENT_COLUMNS = ['disclosure_id', 'amends_disclosure_id']
+
+TRADE_SCHEMA = pa.schema([
+    ('representative_name', pa.dictionary(pa.int32(), pa.string())),
+    ('stock_name', pa.string()),
+    ('buy_sell_flag', pa.dictionary(pa.int32(), pa.string())),
+    ('purchase_date', pa.timestamp('ns')),
+    ('notification_date', pa.timestamp('ns')),
+    ('invested_amount', pa.string()),
+    ('amount_code', pa.int8()),
+    ('min_amount', pa.float64()),
+    ('max_amount', pa.float64()),
+    ('ticker', pa.dictionary(pa.int32(), pa.string())),
+    ('disclosure_id', pa.string()),
+    ('filing_row', pa.int32()),
+])
+
+# A trade is identified by its filing and its row position within the filing
+TRADE_KEY = ['disclosure_id', 'filing_row']
+
+# rows: rows upserted, changed: disclosures whose stored rows were added or modified,
+# removed: disclosures whose rows were removed because an amendment replaces them
+UpsertResult = namedtuple('UpsertResult', ['rows', 'changed', 'removed'])
+
+PARTITION_SCHEMA = pa.schema([('year', pa.int16()), ('month', pa.int8())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+_DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d']
+
+
+def _to_datetime(values):
+    """Parse dates written either way the pipeline writes them, unparseable ones become NaT"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    values = values.astype('string').str.strip()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for date_format in _DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=date_format, errors='coerce')
+    return parsed
+
+
+def _nullable_int(arrow_type):
+    return f'Int{arrow_type.bit_width}'
+
+
+def prepare_trades(trades_df):
+    """Cast a trades frame (as produced by daily_run / load_trades or read back from CSV) to the store schema"""
+    df = pd.DataFrame(index=trades_df.index)
+    for field in TRADE_SCHEMA:
+        values = trades_df[field.name] if field.name in trades_df.columns else pd.Series(None, index=trades_df.index)
+        if pa.types.is_timestamp(field.type):
+            df[field.name] = _to_datetime(values)
+        elif pa.types.is_floating(field.type):
+            df[field.name] = pd.to_numeric(values, errors='coerce')
+        elif pa.types.is_integer(field.type):
+            df[field.name] = pd.to_numeric(values, errors='coerce').astype(_nullable_int(field.type))
+        else:
+            df[field.name] = values.astype('string').str.strip()
+
+    invalid_dates = df['purchase_date'].isna()
+    if invalid_dates.any():
+        print(f"⚠️ Skipping {invalid_dates.sum()} records without a valid purchase date")
+        df = df[~invalid_dates]
+
+    df['year'] = df['purchase_date'].dt.year
+    df['month'] = df['purchase_date'].dt.month
+    return df.reset_index(drop=True)
+
+
+def _to_table(prepared_df):
+    schema = pa.schema(list(TRADE_SCHEMA) + list(PARTITION_SCHEMA))
+    return pa.Table.from_pandas(prepared_df, schema=schema, preserve_index=False)
+
+
+def _read_partitions(root, partitions):
+    """Existing rows of the given (year, month) partitions, already in store form"""
+    if not os.path.exists(root) or not partitions:
+        return pd.DataFrame()
+    years = sorted({year for year, _ in partitions})
+    existing_df = open_dataset(root).to_table(filter=ds.field('year').isin(years)).to_pandas()
+    in_partitions = pd.Series(list(zip(existing_df['year'], existing_df['month'])), dtype=object).isin(partitions)
+    existing_df = existing_df[in_partitions.to_numpy()]
+    for name in ('representative_name', 'buy_sell_flag', 'ticker'):
+        existing_df[name] = existing_df[name].astype('string')
+    for field in TRADE_SCHEMA:
+        if pa.types.is_integer(field.type):
+            existing_df[field.name] = existing_df[field.name].astype(_nullable_int(field.type))
+    return existing_df
+
+
+def stored_disclosure_ids(root=TRADE_STORE):
+    """Disclosure ids already in the store, read from that single column"""
+    if not os.path.exists(root):
+        return set()
+    ids = open_dataset(root).to_table(columns=['disclosure_id']).column('disclosure_id')
+    return set(ids.unique().drop_null().to_pylist())
+
+
+def _partitions_holding(root, disclosure_ids):
+    """(year, month) partitions where rows of the given disclosures are currently stored"""
+    if not os.path.exists(root) or not disclosure_ids:
+        return set()
+    table = open_dataset(root).to_table(columns=['year', 'month'],
+                                        filter=ds.field('disclosure_id').isin(list(disclosure_ids)))
+    return set(zip(table.column('year').to_pylist(), table.column('month').to_pylist()))
+
+
+def load_amendments(manifest=AMENDMENTS_MANIFEST):
+    """Amended disclosure id -> id of the disclosure amending it"""
+    if not os.path.exists(manifest):
+        return {}
+    with open(manifest, 'r', newline='', encoding='utf-8') as manifest_file:
+        return {row['amends_disclosure_id']: row['disclosure_id'] for row in csv.DictReader(manifest_file)}
+
+
+def add_amendments(pairs, manifest=AMENDMENTS_MANIFEST):
+    """Record (disclosure_id, amends_disclosure_id) pairs in the amendments manifest"""
+    known = load_amendments(manifest)
+    pairs = [(str(doc_id), str(amended_id)) for doc_id, amended_id in pairs
+             if known.get(str(amended_id)) != str(doc_id)]
+    if not pairs:
+        return 0
+    write_header = not os.path.exists(manifest)
+    with open(manifest, 'a', newline='', encoding='utf-8') as manifest_file:
+        writer = csv.writer(manifest_file)
+        if write_header:
+            writer.writerow(AMENDMENT_COLUMNS)
+        writer.writerows(pairs)
+    return len(pairs)
+
+
+def _fingerprints(df, disclosure_ids):
+    """Disclosure id -> hash of its rows, to tell which disclosures an upsert really changes"""
+    df = df[df['disclosure_id'].isin(disclosure_ids)].sort_values(TRADE_KEY)
+    if df.empty:
+        return {}
+    columns = df[TRADE_SCHEMA.names].astype(str)
+    row_hashes = pd.util.hash_pandas_object(columns, index=False)
+    return row_hashes.groupby(df['disclosure_id'].to_numpy()).agg(lambda hashes: hash(tuple(hashes))).to_dict()
+
+
+def upsert_trades(trades_df, root=TRADE_STORE, amendments=None):
+    """Upsert trades into the cumulative store, keyed by disclosure id and row position.
+
+    Every disclosure present in trades_df replaces all of its previously stored rows,
+    so re-parsed or corrected filings never leave stale rows behind. Disclosures
+    amended by a stored or upserted disclosure (amendments manifest by default, or
+    an amended id -> amending id dict) are removed. Legacy rows without a disclosure
+    id are deduplicated on their full contents. Only the year/month partitions
+    holding affected rows are rewritten, and nothing is written when no disclosure
+    changed. Returns an UpsertResult.
+    """
+    amended_by = load_amendments() if amendments is None else amendments
+    prepared_df = prepare_trades(trades_df)
+    disclosure_ids = set(prepared_df['disclosure_id'].dropna())
+    stored_ids = stored_disclosure_ids(root)
+    present_ids = disclosure_ids | stored_ids
+    superseded = {amended for amended, amending in amended_by.items() if amending in present_ids}
+    prepared_df = prepared_df[~prepared_df['disclosure_id'].isin(superseded)]
+    disclosure_ids -= superseded
+    removed = superseded & stored_ids
+    if prepared_df.empty and not removed:
+        return UpsertResult(0, set(), set())
+
+    partitions = (set(zip(prepared_df['year'], prepared_df['month']))
+                  | _partitions_holding(root, disclosure_ids | removed))
+    existing_df = _read_partitions(root, partitions)
+    changed = set(disclosure_ids)
+    if not existing_df.empty:
+        before = _fingerprints(existing_df, disclosure_ids)
+        after = _fingerprints(prepared_df, disclosure_ids)
+        changed = {doc_id for doc_id in disclosure_ids if before.get(doc_id) != after.get(doc_id)}
+        existing_df = existing_df[~existing_df['disclosure_id'].isin(disclosure_ids | removed)]
+    if not changed and not removed and prepared_df['disclosure_id'].notna().all():
+        return UpsertResult(len(prepared_df), set(), set())
+    merged_df = pd.concat([existing_df, prepared_df], ignore_index=True)
+
+    keyed = merged_df['disclosure_id'].notna()
+    merged_df = pd.concat([
+        merged_df[keyed].drop_duplicates(subset=TRADE_KEY, keep='last'),
+        merged_df[~keyed].drop_duplicates(subset=TRADE_SCHEMA.names),
+    ]).sort_values(['purchase_date', 'disclosure_id', 'filing_row'])
+
+    # Partitions left without rows are rewritten empty rather than kept stale
+    emptied = partitions - set(zip(merged_df['year'], merged_df['month']))
+    for year, month in emptied:
+        shutil.rmtree(os.path.join(root, f'year={year}', f'month={month}'), ignore_errors=True)
+
+    if not merged_df.empty:
+        ds.write_dataset(_to_table(merged_df.reset_index(drop=True)), root, format='parquet',
+                         partitioning=PARTITIONING, existing_data_behavior='delete_matching',
+                         basename_template='part-{i}.parquet')
+    return UpsertResult(len(prepared_df), changed, removed)
+
+
+def _timestamp_scalar(timestamp):
+    return pa.scalar(pd.Timestamp(timestamp).value, pa.timestamp('ns'))
+
+
+def _date_filter(start_date, end_date):
+    expression = None
+    if start_date is not None:
+        start_date = pd.Timestamp(start_date)
+        # The partition bound lets whole years be skipped without opening their files
+        expression = ((ds.field('year') >= start_date.year)
+                      & (ds.field('purchase_date') >= _timestamp_scalar(start_date)))
+    if end_date is not None:
+        end_date = pd.Timestamp(end_date)
+        end_expression = ((ds.field('year') <= end_date.year)
+                          & (ds.field('purchase_date') <= _timestamp_scalar(end_date)))
+        expression = end_expression if expression is None else expression & end_expression
+    return expression
+
+
+def open_dataset(root=TRADE_STORE):
+    return ds.dataset(root, schema=pa.schema(list(TRADE_SCHEMA) + list(PARTITION_SCHEMA)),
+                      format='parquet', partitioning=PARTITIONING)
+
+
+def read_trades(root=TRADE_STORE, columns=None, start_date=None, end_date=None, tickers=None, categorical=True,
+                disclosure_ids=None):
+    """Load trades from the store.
+
+    Only the given columns are read (all trade columns by default), and the
+    purchase date range, ticker and disclosure id lists are pushed down to the
+    Parquet scan.
+    Names, flags and tickers come back as pandas categoricals unless
+    categorical=False (plain strings, e.g. for groupbys that should not
+    expand to every category).
+    """
+    if not os.path.exists(root):
+        return pd.DataFrame(columns=columns or TRADE_SCHEMA.names)
+
+    expression = _date_filter(start_date, end_date)
+    if tickers is not None:
+        ticker_expression = ds.field('ticker').isin(list(tickers))
+        expression = ticker_expression if expression is None else expression & ticker_expression
+    if disclosure_ids is not None:
+        disclosure_expression = ds.field('disclosure_id').isin(list(disclosure_ids))
+        expression = disclosure_expression if expression is None else expression & disclosure_expression
+
+    table = open_dataset(root).to_table(columns=columns or TRADE_SCHEMA.names, filter=expression)
+    trades_df = table.to_pandas()
+    if not categorical:
+        for name in trades_df.select_dtypes('category').columns:
+            trades_df[name] = trades_df[name].astype(object)
+    return trades_df
+
+
+def import_csv(path, root=TRADE_STORE):
+    """Load an existing trades_{year}.csv or all_purchases file into the store"""
+    trades_df = pd.read_csv(path)
+    if 'amount_code' not in trades_df.columns and 'invested_amount' in trades_df.columns:
+        # Written before amounts were decoded at extraction
+        amounts_df = decode_amounts(trades_df['invested_amount'])
+        trades_df[amounts_df.columns] = amounts_df
+    return upsert_trades(trades_df, root).rows
+
+
+if __name__ == '__main__':
+    # python trade_store.py stock_purchases/trades_2023.csv stock_purchases/trades_2024.csv ...
+    for csv_path in sys.argv[1:]:
+        import_csv(csv_path)
+        print(f"💾 Imported {csv_path} into {TRADE_STORE}")